@@ -1,11 +1,79 @@
+import sqlite3
 import sys
 import psycopg2
+import psycopg2.errors
+import psycopg2.pool
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QTabWidget, QMessageBox, QComboBox, QCheckBox
+    QLabel, QLineEdit, QPushButton, QTableView, QAbstractItemView,
+    QTabWidget, QMessageBox, QComboBox, QCheckBox, QProgressBar
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
+
+from db import ConnectionPool, DatabaseSettings, is_connection_error
+from archive_dialog import ArchiveDialog
+from choice_box import ChoiceBox
+from component_tab import ComponentTab
+from conflict_dialog import ConflictDialog
+from dashboard_tab import DashboardTab
+from device_tab import DeviceTab
+from diagnostics import STATS
+from diagnostics_tab import DiagnosticsTab
+from duplicates_dialog import DuplicatesDialog
+from executor import QueryExecutor
+from federated_view import create_federated_view
+from export_dialog import ExportDialog
+from hierarchy_tab import HierarchyTab
+from history_dialog import location_history
+from import_dialog import ImportDialog
+from spec_tab import SpecSearchTab
+from models import LazyQueryModel
+from references import REFERENCES, ReferenceList
+from notifier import ChangeBatcher, ChangeListener
+from repository import (
+    ConflictError, Franchise, FranchiseRepository, Location, LocationRepository, RepositoryError,
+    franchise_query, location_query
+)
+from snapshot import Snapshot, synchronize
+
+
+# Задержка перед поиском, пока пользователь печатает, мс
+SEARCH_DELAY = 300
+
+# Как часто пытаться подключиться к недоступному серверу, мс
+RECONNECT_INTERVAL = 30000
+
+# Сколько символов названия или адреса нужно для поиска похожих записей
+SIMILAR_MIN_LENGTH = 3
+
+# Подписи полей франшизы и локации в окне конфликта изменений
+FRANCHISE_FIELDS = {
+    "name": "Название", "parent_id": "Родительская франшиза", "address": "Адрес",
+    "contact_phone": "Контактный телефон", "email": "Email", "is_active": "Активна",
+}
+
+LOCATION_FIELDS = {
+    "franchise_id": "Франшиза", "name": "Название", "address": "Адрес",
+    "room_number": "Номер помещения", "is_active": "Активна",
+}
+
+
+def similar_franchise_lines(rows):
+    """Описания похожих франшиз для показа пользователю"""
+    return [
+        f"{name} (ID {franchise_id}{', ' + address if address else ''}) - "
+        f"{max(name_score, address_score or 0):.0%}"
+        for franchise_id, name, address, name_score, address_score in rows
+    ]
+
+
+def similar_location_lines(rows):
+    """Описания похожих локаций для показа пользователю"""
+    return [
+        f"{name}, {franchise_name} (ID {location_id}{', ' + address if address else ''}) - "
+        f"{max(name_score, address_score or 0):.0%}"
+        for location_id, franchise_name, name, address, name_score, address_score in rows
+    ]
 
 
 class FranchiseApp(QMainWindow):
@@ -14,8 +82,54 @@ class FranchiseApp(QMainWindow):
         self.setWindowTitle("FCAS")
         self.setGeometry(100, 100, 800, 600)
 
-        # Подключение к БД
-        self.db_connection = self.connect_to_db()
+        # Подключение к БД: соединения открываются при первом запросе
+        self.db_pool = ConnectionPool(DatabaseSettings.from_env())
+        STATS.configure_log(self.db_pool.settings.query_log, self.db_pool.settings.slow_query_ms)
+
+        # Запросы выполняются в фоновых потоках на соединениях из пула
+        self.executor = QueryExecutor(self.db_pool, self)
+
+        # Пока сервер не ответил, франшизы и локации показываются из
+        # локального снимка и доступны только для просмотра
+        self.online = False
+        self.snapshot = self.open_snapshot()
+        self.offline_label = QLabel()
+        self.offline_label.setVisible(False)
+        self.statusBar().addWidget(self.offline_label)
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setInterval(RECONNECT_INTERVAL)
+        self.reconnect_timer.timeout.connect(self.synchronize)
+
+        # Индикатор выполнения запросов
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(120)
+        self.busy_indicator.setVisible(False)
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+        self.executor.busyChanged.connect(self.busy_indicator.setVisible)
+
+        # Меню
+        file_menu = self.menuBar().addMenu("Файл")
+        self.import_action = file_menu.addAction("Импорт...")
+        self.import_action.triggered.connect(self.show_import_dialog)
+        export_action = file_menu.addAction("Экспорт...")
+        export_action.triggered.connect(self.show_export_dialog)
+        self.duplicates_action = file_menu.addAction("Поиск дубликатов...")
+        self.duplicates_action.triggered.connect(self.show_duplicates_dialog)
+        self.archive_action = file_menu.addAction("Архив...")
+        self.archive_action.triggered.connect(self.show_archive_dialog)
+        # Общий просмотр читает региональные базы напрямую, поэтому
+        # доступен и без основного сервера
+        federated_action = file_menu.addAction("Все регионы...")
+        federated_action.triggered.connect(self.show_federated_view)
+        federated_action.setEnabled(bool(self.db_pool.settings.federation))
+        # Окна меню создаются при первом открытии и живут вместе с главным
+        # окном, так что ответы фоновых задач не приходят в удаленное окно
+        self.import_dialog = None
+        self.export_dialog = None
+        self.duplicates_dialog = None
+        self.archive_dialog = None
+        self.federated_view = None
 
         # Главный виджет
         self.main_widget = QWidget()
@@ -39,23 +153,212 @@ class FranchiseApp(QMainWindow):
         self.tabs.addTab(self.location_tab, "Локации")
         self.setup_location_tab()
 
-        # Загружаем начальные данные
+        # Вкладка с иерархией франшиз загружается при первом показе
+        self.hierarchy_tab = HierarchyTab(self.executor)
+        self.tabs.addTab(self.hierarchy_tab, "Иерархия")
+
+        # Вкладка учета оборудования также загружается при первом показе
+        self.device_tab = DeviceTab(self.executor)
+        self.device_tab.devicesChanged.connect(self.hierarchy_tab.invalidate)
+        self.tabs.addTab(self.device_tab, "Оборудование")
+
+        self.spec_tab = SpecSearchTab(self.executor)
+        self.tabs.addTab(self.spec_tab, "Поиск по характеристикам")
+
+        self.component_tab = ComponentTab(self.executor)
+        self.tabs.addTab(self.component_tab, "Компоненты")
+
+        self.dashboard_tab = DashboardTab(self.executor)
+        self.device_tab.devicesChanged.connect(self.dashboard_tab.invalidate)
+        self.tabs.addTab(self.dashboard_tab, "Показатели")
+
+        self.diagnostics_tab = DiagnosticsTab(self.executor)
+        self.tabs.addTab(self.diagnostics_tab, "Диагностика")
+        self.tabs.currentChanged.connect(self.tab_changed)
+
+        # Показываем данные из снимка и сверяем его с сервером
+        self.set_online(False)
         self.load_franchises()
         self.load_locations()
-
-    def connect_to_db(self):
-        """Установка соединения с PostgreSQL"""
+        self.synchronize()
+
+        # Изменения, сделанные другими клиентами, приходят уведомлениями
+        # и применяются к загруженным строкам без перезагрузки таблиц
+        self.change_batcher = ChangeBatcher(self)
+        self.change_batcher.flushed.connect(self.apply_changes)
+        self.change_listener = ChangeListener(self.db_pool.settings, self)
+        self.change_listener.changed.connect(self.change_batcher.add)
+        self.change_listener.reconnected.connect(self.data_imported)
+        self.change_listener.reconnected.connect(self.synchronize)
+        self.change_listener.start()
+
+    def open_snapshot(self):
+        """Открытие локального снимка; без него программа работает только с сервером"""
+        settings = self.db_pool.settings
         try:
-            conn = psycopg2.connect(
-                dbname="fcas",
-                user="postgres",
-                password="postgres",
-                host="localhost"
+            return Snapshot(settings.snapshot_path, settings.dsn)
+        except (OSError, sqlite3.Error):
+            return None
+
+    def synchronize(self):
+        """Дочитывание изменений с сервера в локальный снимок"""
+        settings = self.db_pool.settings
+
+        def sync(connection):
+            if self.snapshot is None:
+                # Снимка нет: только проверяем, что сервер доступен
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+                return 0
+            return synchronize(connection, settings.snapshot_path, settings.dsn)
+
+        self.executor.submit(
+            sync, on_result=lambda _: self.synchronized(),
+            on_error=self.synchronize_failed, key="snapshot_sync"
+        )
+
+    def synchronized(self):
+        """Сервер доступен: при возврате из автономного режима перечитываем таблицы"""
+        if not self.online:
+            self.set_online(True)
+            self.data_imported()
+
+    def synchronize_failed(self, error):
+        if self.is_server_unavailable(error):
+            self.set_online(False)
+            return
+        # Сервер доступен, но снимок обновить не удалось
+        self.synchronized()
+        self.show_db_error("Ошибка при обновлении локального кэша", error)
+
+    def is_server_unavailable(self, error):
+        return is_connection_error(error) or isinstance(error, psycopg2.pool.PoolError)
+
+    def set_online(self, online):
+        """Переключение между работой с сервером и просмотром снимка"""
+        if online:
+            self.reconnect_timer.stop()
+            self.offline_label.setVisible(False)
+        else:
+            self.reconnect_timer.start()
+            synced_at = self.snapshot.synced_at() if self.snapshot is not None else None
+            self.offline_label.setText(
+                f"Нет связи с сервером. Данные на {synced_at}, только просмотр"
+                if synced_at else "Нет связи с сервером"
             )
-            return conn
-        except psycopg2.Error as e:
-            QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к БД:\n{str(e)}")
-            sys.exit(1)
+            self.offline_label.setVisible(True)
+            if self.online:
+                self.online = False
+                self.load_franchises()
+                self.load_locations()
+        self.online = online
+
+        # Без сервера изменения и вкладки, которые читают данные с сервера, недоступны
+        editing_franchise = hasattr(self, "current_franchise_id")
+        self.add_franchise_btn.setEnabled(online and not editing_franchise)
+        self.update_franchise_btn.setEnabled(online and editing_franchise)
+        self.delete_franchise_btn.setEnabled(online and editing_franchise)
+        editing_location = hasattr(self, "current_location_id")
+        self.add_location_btn.setEnabled(online and not editing_location)
+        self.update_location_btn.setEnabled(online and editing_location)
+        self.delete_location_btn.setEnabled(online and editing_location)
+        self.location_history_btn.setEnabled(online and editing_location)
+        self.import_action.setEnabled(online)
+        self.duplicates_action.setEnabled(online)
+        self.archive_action.setEnabled(online)
+        for tab in (self.hierarchy_tab, self.device_tab, self.spec_tab, self.component_tab, self.dashboard_tab):
+            self.tabs.setTabEnabled(self.tabs.indexOf(tab), online)
+
+    def tab_changed(self, index):
+        """Загрузка данных вкладки при ее показе"""
+        widget = self.tabs.widget(index)
+        if hasattr(widget, "load_if_stale"):
+            widget.load_if_stale()
+
+    def show_import_dialog(self):
+        """Импорт записей из файла"""
+        if self.import_dialog is None:
+            self.import_dialog = ImportDialog(self.executor, self)
+            self.import_dialog.imported.connect(self.data_imported)
+        self.import_dialog.exec()
+
+    def show_export_dialog(self):
+        """Выгрузка записей в файл"""
+        if self.export_dialog is None:
+            self.export_dialog = ExportDialog(self.executor, self)
+        self.export_dialog.exec()
+
+    def show_duplicates_dialog(self):
+        """Отчет о группах похожих франшиз или локаций"""
+        if self.duplicates_dialog is None:
+            self.duplicates_dialog = DuplicatesDialog(self.executor, self)
+        self.duplicates_dialog.exec()
+
+    def show_archive_dialog(self):
+        """Поиск в архиве и восстановление записей"""
+        if self.archive_dialog is None:
+            self.archive_dialog = ArchiveDialog(self.executor, self)
+        self.archive_dialog.exec()
+
+    def show_federated_view(self):
+        """Франшизы, локации и устройства всех региональных баз (FCAS_FEDERATION)"""
+        if self.federated_view is None:
+            self.federated_view = create_federated_view(self.db_pool.settings, self)
+            if self.federated_view is None:
+                return
+        self.federated_view.exec()
+
+    def data_imported(self):
+        """Перезагрузка данных после импорта или потери уведомлений"""
+        self.load_franchises()
+        self.load_locations()
+        self.invalidate_tabs()
+
+    def apply_changes(self, changes):
+        """Применение изменений из уведомлений {таблица: множество id}"""
+        franchise_ids = changes.get("franchise", set())
+        location_ids = changes.get("location", set())
+        device_ids = changes.get("device", set())
+
+        if franchise_ids:
+            # Строки дочерних франшиз и локаций содержат название франшизы
+            self.franchise_model.refresh_rows(
+                franchise_ids | set(self.franchise_model.keys(lambda row: row[5] in franchise_ids))
+            )
+            location_ids = location_ids | set(
+                self.location_model.keys(lambda row: row[5] in franchise_ids)
+            )
+            self.load_franchise_choices()
+        if location_ids:
+            self.location_model.refresh_rows(location_ids)
+
+        self.device_tab.apply_changes(franchise_ids, location_ids, device_ids)
+        if franchise_ids or location_ids:
+            # Снимок дочитывает изменения по отметке времени
+            self.synchronize()
+            self.hierarchy_tab.invalidate()
+            self.spec_tab.invalidate()
+            self.component_tab.invalidate()
+            self.dashboard_tab.invalidate()
+        elif device_ids:
+            self.hierarchy_tab.invalidate()
+            self.dashboard_tab.invalidate()
+
+    def invalidate_tabs(self):
+        """Франшизы или локации изменились: вкладки, зависящие от них, устарели"""
+        self.hierarchy_tab.invalidate()
+        self.device_tab.invalidate()
+        self.spec_tab.invalidate()
+        self.component_tab.invalidate()
+        self.dashboard_tab.invalidate()
+
+    def show_db_error(self, message, error):
+        """Сообщение об ошибке запроса к БД"""
+        if self.online and self.is_server_unavailable(error):
+            # Сервер пропал: переходим к просмотру снимка
+            self.set_online(False)
+        QMessageBox.critical(self, "Ошибка", f"{message}:\n{str(error)}")
 
     def setup_franchise_tab(self):
         """Настройка вкладки франшиз"""
@@ -74,8 +377,7 @@ class FranchiseApp(QMainWindow):
         left_form.addWidget(QLabel("Название франшизы:"))
         left_form.addWidget(self.franchise_name)
 
-        self.franchise_parent = QComboBox()
-        self.franchise_parent.addItem("Нет родительской", None)
+        self.franchise_parent = ChoiceBox("Нет родительской")
         left_form.addWidget(QLabel("Родительская франшиза:"))
         left_form.addWidget(self.franchise_parent)
 
@@ -99,6 +401,16 @@ class FranchiseApp(QMainWindow):
         self.franchise_active.setChecked(True)
         right_form.addWidget(self.franchise_active)
 
+        # Похожие франшизы ищутся, пока пользователь печатает
+        self.franchise_similar_label = self.create_similar_label()
+        layout.addWidget(self.franchise_similar_label)
+        self.franchise_similar_timer = QTimer(self)
+        self.franchise_similar_timer.setSingleShot(True)
+        self.franchise_similar_timer.setInterval(SEARCH_DELAY)
+        self.franchise_similar_timer.timeout.connect(self.check_similar_franchises)
+        self.franchise_name.textEdited.connect(self.franchise_similar_timer.start)
+        self.franchise_address.textEdited.connect(self.franchise_similar_timer.start)
+
         # Кнопки управления
         buttons_layout = QHBoxLayout()
         layout.addLayout(buttons_layout)
@@ -121,15 +433,44 @@ class FranchiseApp(QMainWindow):
         self.clear_franchise_btn.clicked.connect(self.clear_franchise_form)
         buttons_layout.addWidget(self.clear_franchise_btn)
 
+        self.reload_franchises_btn = QPushButton("Перезагрузить")
+        self.reload_franchises_btn.clicked.connect(self.load_franchises)
+        buttons_layout.addWidget(self.reload_franchises_btn)
+
+        # Поиск и фильтры
+        filter_layout = QHBoxLayout()
+        layout.addLayout(filter_layout)
+
+        self.franchise_search = QLineEdit()
+        self.franchise_search.setPlaceholderText("Поиск по названию или адресу")
+        filter_layout.addWidget(self.franchise_search)
+
+        self.franchise_active_filter = self.create_active_filter()
+        self.franchise_active_filter.activated.connect(self.filter_franchises)
+        filter_layout.addWidget(self.franchise_active_filter)
+
+        self.franchise_search_timer = QTimer(self)
+        self.franchise_search_timer.setSingleShot(True)
+        self.franchise_search_timer.setInterval(SEARCH_DELAY)
+        self.franchise_search_timer.timeout.connect(self.filter_franchises)
+        self.franchise_search.textChanged.connect(self.franchise_search_timer.start)
+
         # Таблица с франшизами
-        self.franchise_table = QTableWidget()
-        self.franchise_table.setColumnCount(5)
-        self.franchise_table.setHorizontalHeaderLabels(
-            ["ID", "Название", "Родитель", "Телефон", "Активна"]
+        self.franchise_model = LazyQueryModel(
+            ["ID", "Название", "Родитель", "Телефон", "Активна"],
+            self.executor
         )
-        self.franchise_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.franchise_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
-        self.franchise_table.cellClicked.connect(self.franchise_table_click)
+        self.franchise_model.setObjectName("franchises")
+        self.franchise_model.error.connect(
+            lambda e: self.show_db_error("Ошибка при загрузке франшиз", e)
+        )
+        self.franchise_table = QTableView()
+        self.franchise_table.setModel(self.franchise_model)
+        self.franchise_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.franchise_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.franchise_table.clicked.connect(self.franchise_table_click)
+        self.franchise_table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.franchise_table.setSortingEnabled(True)
         layout.addWidget(self.franchise_table)
 
     def setup_location_tab(self):
@@ -145,7 +486,7 @@ class FranchiseApp(QMainWindow):
         left_form = QVBoxLayout()
         form_layout.addLayout(left_form)
 
-        self.location_franchise = QComboBox()
+        self.location_franchise = ChoiceBox()
         left_form.addWidget(QLabel("Франшиза:"))
         left_form.addWidget(self.location_franchise)
 
@@ -169,6 +510,17 @@ class FranchiseApp(QMainWindow):
         self.location_active.setChecked(True)
         right_form.addWidget(self.location_active)
 
+        # Похожие локации ищутся, пока пользователь печатает
+        self.location_similar_label = self.create_similar_label()
+        layout.addWidget(self.location_similar_label)
+        self.location_similar_timer = QTimer(self)
+        self.location_similar_timer.setSingleShot(True)
+        self.location_similar_timer.setInterval(SEARCH_DELAY)
+        self.location_similar_timer.timeout.connect(self.check_similar_locations)
+        self.location_franchise.activated.connect(self.location_similar_timer.start)
+        self.location_name.textEdited.connect(self.location_similar_timer.start)
+        self.location_address.textEdited.connect(self.location_similar_timer.start)
+
         # Кнопки управления
         buttons_layout = QHBoxLayout()
         layout.addLayout(buttons_layout)
@@ -187,169 +539,289 @@ class FranchiseApp(QMainWindow):
         self.delete_location_btn.clicked.connect(self.delete_location)
         buttons_layout.addWidget(self.delete_location_btn)
 
+        self.location_history_btn = QPushButton("История")
+        self.location_history_btn.setEnabled(False)
+        self.location_history_btn.clicked.connect(self.show_location_history)
+        buttons_layout.addWidget(self.location_history_btn)
+
         self.clear_location_btn = QPushButton("Очистить")
         self.clear_location_btn.clicked.connect(self.clear_location_form)
         buttons_layout.addWidget(self.clear_location_btn)
 
+        self.reload_locations_btn = QPushButton("Перезагрузить")
+        self.reload_locations_btn.clicked.connect(self.load_locations)
+        buttons_layout.addWidget(self.reload_locations_btn)
+
+        # Поиск и фильтры
+        filter_layout = QHBoxLayout()
+        layout.addLayout(filter_layout)
+
+        self.location_search = QLineEdit()
+        self.location_search.setPlaceholderText("Поиск по названию или адресу")
+        filter_layout.addWidget(self.location_search)
+
+        self.location_filter_franchise = ChoiceBox("Все франшизы")
+        self.location_filter_franchise.activated.connect(self.load_locations)
+        filter_layout.addWidget(self.location_filter_franchise)
+
+        self.location_active_filter = self.create_active_filter()
+        self.location_active_filter.activated.connect(self.load_locations)
+        filter_layout.addWidget(self.location_active_filter)
+
+        self.location_search_timer = QTimer(self)
+        self.location_search_timer.setSingleShot(True)
+        self.location_search_timer.setInterval(SEARCH_DELAY)
+        self.location_search_timer.timeout.connect(self.load_locations)
+        self.location_search.textChanged.connect(self.location_search_timer.start)
+
         # Таблица с локациями
-        self.location_table = QTableWidget()
-        self.location_table.setColumnCount(5)
-        self.location_table.setHorizontalHeaderLabels(
-            ["ID", "Франшиза", "Название", "Адрес", "Активна"]
+        self.location_model = LazyQueryModel(
+            ["ID", "Франшиза", "Название", "Адрес", "Активна"],
+            self.executor
+        )
+        self.location_model.setObjectName("locations")
+        self.location_model.error.connect(
+            lambda e: self.show_db_error("Ошибка при загрузке локаций", e)
         )
-        self.location_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.location_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
-        self.location_table.cellClicked.connect(self.location_table_click)
+        self.location_table = QTableView()
+        self.location_table.setModel(self.location_model)
+        self.location_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.location_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.location_table.clicked.connect(self.location_table_click)
+        self.location_table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.location_table.setSortingEnabled(True)
         layout.addWidget(self.location_table)
 
+    def create_similar_label(self):
+        """Надпись со списком похожих записей, скрыта, пока их нет"""
+        label = QLabel()
+        label.setWordWrap(True)
+        label.setStyleSheet("color: #b05000")
+        label.setVisible(False)
+        return label
+
+    def show_similar(self, label, lines):
+        label.setText("Похожие записи уже есть:\n" + "\n".join(lines))
+        label.setVisible(bool(lines))
+
+    def similar_failed(self, label, error):
+        """Проверка не должна мешать вводу: ошибка показывается в надписи"""
+        if self.is_server_unavailable(error):
+            self.show_db_error("Ошибка при поиске похожих записей", error)
+            return
+        label.setText(f"Не удалось проверить похожие записи: {error}")
+        label.setVisible(True)
+
+    def hide_similar(self, label, timer, key):
+        timer.stop()
+        self.executor.cancel(key)
+        label.setVisible(False)
+
+    def check_similar_franchises(self):
+        """Поиск франшиз, похожих на вводимую, в фоновом потоке"""
+        name = self.franchise_name.text().strip()
+        address = self.franchise_address.text().strip() or None
+        if not self.online or max(len(name), len(address or "")) < SIMILAR_MIN_LENGTH:
+            self.hide_similar(self.franchise_similar_label, self.franchise_similar_timer, "franchise_similar")
+            return
+        exclude_id = getattr(self, "current_franchise_id", None)
+
+        def fetch(connection):
+            return FranchiseRepository(connection).similar(name, address, exclude_id)
+
+        self.executor.submit(
+            fetch,
+            on_result=lambda rows: self.show_similar(self.franchise_similar_label, similar_franchise_lines(rows)),
+            on_error=lambda e: self.similar_failed(self.franchise_similar_label, e),
+            key="franchise_similar"
+        )
+
+    def check_similar_locations(self):
+        """Поиск локаций, похожих на вводимую, в фоновом потоке"""
+        franchise_id = self.location_franchise.currentData()
+        name = self.location_name.text().strip()
+        address = self.location_address.text().strip() or None
+        if not self.online or max(len(name), len(address or "")) < SIMILAR_MIN_LENGTH:
+            self.hide_similar(self.location_similar_label, self.location_similar_timer, "location_similar")
+            return
+        exclude_id = getattr(self, "current_location_id", None)
+
+        def fetch(connection):
+            return LocationRepository(connection).similar(franchise_id, name, address, exclude_id)
+
+        self.executor.submit(
+            fetch,
+            on_result=lambda rows: self.show_similar(self.location_similar_label, similar_location_lines(rows)),
+            on_error=lambda e: self.similar_failed(self.location_similar_label, e),
+            key="location_similar"
+        )
+
+    def confirm_similar(self, label, lines, title):
+        """Подтверждение добавления записи, похожей на существующие"""
+        self.show_similar(label, lines)
+        reply = QMessageBox.question(
+            self, "Подтверждение",
+            f"{title}:\n\n" + "\n".join(lines) + "\n\nВсе равно добавить?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        return reply == QMessageBox.StandardButton.Yes
+
+    def create_active_filter(self):
+        """Комбобокс фильтра по активности"""
+        combo = QComboBox()
+        combo.addItem("Все", None)
+        combo.addItem("Активные", True)
+        combo.addItem("Неактивные", False)
+        return combo
+
     def load_franchises(self):
-        """Загрузка списка франшиз из БД"""
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT f.franchise_id, f.name, p.name as parent_name, 
-                           f.contact_phone, f.is_active
-                    FROM franchise f
-                    LEFT JOIN franchise p ON f.parent_id = p.franchise_id
-                    ORDER BY f.franchise_id
-                """)
-                franchises = cursor.fetchall()
-
-                # Очищаем таблицу
-                self.franchise_table.setRowCount(0)
-
-                # Заполняем таблицу
-                for row_num, row_data in enumerate(franchises):
-                    self.franchise_table.insertRow(row_num)
-                    for col_num, data in enumerate(row_data):
-                        item = QTableWidgetItem(str(data) if data is not None else "")
-                        item.setFlags(item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                        self.franchise_table.setItem(row_num, col_num, item)
-
-                # Обновляем комбобоксы
-                self.franchise_parent.clear()
-                self.franchise_parent.addItem("Нет родительской", None)
-                self.location_franchise.clear()
-
-                cursor.execute("SELECT franchise_id, name FROM franchise ORDER BY name")
-                for franchise_id, name in cursor.fetchall():
-                    self.franchise_parent.addItem(name, franchise_id)
-                    self.location_franchise.addItem(name, franchise_id)
-
-        except psycopg2.Error as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке франшиз:\n{str(e)}")
+        """Загрузка таблицы и списка франшиз"""
+        self.filter_franchises()
+        self.load_franchise_choices()
+
+    def load_franchise_choices(self):
+        """Список франшиз из общего кэша, перечитывается, только если изменился"""
+        if not self.online:
+            self.fill_franchise_choices(
+                ReferenceList(self.snapshot.franchise_choices() if self.snapshot else [])
+            )
+            return
+
+        def fetch_choices(connection):
+            return REFERENCES.get(connection, "franchise")["franchise"]
+
+        self.executor.submit(
+            fetch_choices, on_result=self.fill_franchise_choices,
+            on_error=lambda e: self.show_db_error("Ошибка при загрузке франшиз", e),
+            key="franchise_choices"
+        )
+
+    def filter_franchises(self):
+        """Загрузка таблицы франшиз с учетом поиска и фильтров"""
+        search = self.franchise_search.text().strip()
+        is_active = self.franchise_active_filter.currentData()
+        if not self.online:
+            self.franchise_model.show_rows(
+                self.snapshot.franchise_rows(search, is_active) if self.snapshot else []
+            )
+            return
+
+        # Строки таблицы подгружаются моделью постранично при прокрутке
+        self.franchise_model.reset(franchise_query(search, is_active))
+
+    def franchise_choice_boxes(self):
+        return self.franchise_parent, self.location_franchise, self.location_filter_franchise
+
+    def fill_franchise_choices(self, references):
+        """Показ списка франшиз в комбобоксах; тот же список не перестраивается"""
+        filter_id = self.location_filter_franchise.currentData()
+        for combo in self.franchise_choice_boxes():
+            combo.set_references(references)
+
+        # Франшизу из фильтра удалили
+        if filter_id is not None and self.location_filter_franchise.currentData() != filter_id:
+            self.load_locations()
+
+    def set_franchise_choice(self, franchise_id, name):
+        """Добавление или переименование франшизы в комбобоксах и кэше"""
+        references = self.location_franchise.references
+        changed = references.with_row((franchise_id, name))
+        REFERENCES.replace("franchise", references, changed)
+        for combo in self.franchise_choice_boxes():
+            combo.set_references(changed)
+
+    def remove_franchise_choice(self, franchise_id):
+        """Удаление франшизы из комбобоксов и кэша"""
+        filtered = self.location_filter_franchise.currentData() == franchise_id
+        references = self.location_franchise.references
+        changed = references.without(franchise_id)
+        REFERENCES.replace("franchise", references, changed)
+        for combo in self.franchise_choice_boxes():
+            combo.set_references(changed)
+
+        if filtered:
+            self.load_locations()
+
+    def rename_franchise_references(self, franchise_id, name):
+        """Обновление названия франшизы в строках, которые на нее ссылаются"""
+        self.franchise_model.patch_rows(
+            lambda row: row[:2] + (name,) + row[3:] if row[5] == franchise_id else None
+        )
+        self.location_model.patch_rows(
+            lambda row: row[:1] + (name,) + row[2:] if row[5] == franchise_id else None
+        )
 
     def load_locations(self):
-        """Загрузка списка локаций из БД"""
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT l.location_id, f.name as franchise_name, 
-                           l.name, l.address, l.is_active
-                    FROM location l
-                    JOIN franchise f ON l.franchise_id = f.franchise_id
-                    ORDER BY l.location_id
-                """)
-                locations = cursor.fetchall()
-
-                # Очищаем таблицу
-                self.location_table.setRowCount(0)
-
-                # Заполняем таблицу
-                for row_num, row_data in enumerate(locations):
-                    self.location_table.insertRow(row_num)
-                    for col_num, data in enumerate(row_data):
-                        item = QTableWidgetItem(str(data) if data is not None else "")
-                        item.setFlags(item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-                        self.location_table.setItem(row_num, col_num, item)
-
-        except psycopg2.Error as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке локаций:\n{str(e)}")
-
-    def franchise_table_click(self, row, column):
+        """Загрузка списка локаций из БД с учетом поиска и фильтров"""
+        search = self.location_search.text().strip()
+        franchise_id = self.location_filter_franchise.currentData()
+        is_active = self.location_active_filter.currentData()
+        if not self.online:
+            self.location_model.show_rows(
+                self.snapshot.location_rows(search, franchise_id, is_active) if self.snapshot else []
+            )
+            return
+
+        # Строки таблицы подгружаются моделью постранично при прокрутке
+        self.location_model.reset(location_query(search, franchise_id, is_active))
+
+    def franchise_table_click(self, index):
         """Обработка клика по таблице франшиз"""
-        franchise_id = int(self.franchise_table.item(row, 0).text())
-        franchise_name = self.franchise_table.item(row, 1).text()
-        parent_name = self.franchise_table.item(row, 2).text()
-        phone = self.franchise_table.item(row, 3).text()
-        active = self.franchise_table.item(row, 4).text() == "True"
+        # Строка модели содержит всю запись, в БД обращаться не нужно
+        self.fill_franchise_form(self.franchise_model.row(index.row()))
 
-        # Заполняем форму
+    def fill_franchise_form(self, row):
+        """Заполнение формы строкой таблицы франшиз"""
+        franchise_id, franchise_name, parent_name, phone, active, \
+            parent_id, address, email, version = row
+
+        # Строка запоминается целиком: по ней проверяется, не изменили ли
+        # франшизу другие, пока форма была открыта
         self.current_franchise_id = franchise_id
+        self.current_franchise_row = row
+        self.hide_similar(self.franchise_similar_label, self.franchise_similar_timer, "franchise_similar")
         self.franchise_name.setText(franchise_name)
 
-        # Устанавливаем родительскую франшизу
-        parent_index = 0  # По умолчанию "Нет родительской"
-        if parent_name:
-            for i in range(1, self.franchise_parent.count()):
-                if self.franchise_parent.itemText(i) == parent_name:
-                    parent_index = i
-                    break
-        self.franchise_parent.setCurrentIndex(parent_index)
+        # Устанавливаем родительскую франшизу, по умолчанию "Нет родительской"
+        self.franchise_parent.set_current_id(parent_id)
 
-        self.franchise_phone.setText(phone)
-        self.franchise_active.setChecked(active)
+        self.franchise_address.setText(address if address else "")
+        self.franchise_phone.setText(phone if phone else "")
+        self.franchise_email.setText(email if email else "")
+        self.franchise_active.setChecked(bool(active))
 
-        # Получаем остальные данные из БД
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT address, email
-                    FROM franchise
-                    WHERE franchise_id = %s
-                """, (franchise_id,))
-                address, email = cursor.fetchone()
-                self.franchise_address.setText(address if address else "")
-                self.franchise_email.setText(email if email else "")
-
-        except psycopg2.Error as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке данных франшизы:\n{str(e)}")
-
-        # Активируем кнопки
-        self.update_franchise_btn.setEnabled(True)
-        self.delete_franchise_btn.setEnabled(True)
+        # Активируем кнопки, если можно менять данные
+        self.update_franchise_btn.setEnabled(self.online)
+        self.delete_franchise_btn.setEnabled(self.online)
         self.add_franchise_btn.setEnabled(False)
 
-    def location_table_click(self, row, column):
+    def location_table_click(self, index):
         """Обработка клика по таблице локаций"""
-        location_id = int(self.location_table.item(row, 0).text())
-        franchise_name = self.location_table.item(row, 1).text()
-        location_name = self.location_table.item(row, 2).text()
-        address = self.location_table.item(row, 3).text()
-        active = self.location_table.item(row, 4).text() == "True"
+        # Строка модели содержит всю запись, в БД обращаться не нужно
+        self.fill_location_form(self.location_model.row(index.row()))
 
-        # Заполняем форму
+    def fill_location_form(self, row):
+        """Заполнение формы строкой таблицы локаций"""
+        location_id, franchise_name, location_name, address, active, \
+            franchise_id, room_number, version = row
+
+        # Строка запоминается для проверки изменений другими
         self.current_location_id = location_id
+        self.current_location_row = row
+        self.hide_similar(self.location_similar_label, self.location_similar_timer, "location_similar")
 
         # Устанавливаем франшизу
-        franchise_index = 0
-        for i in range(self.location_franchise.count()):
-            if self.location_franchise.itemText(i) == franchise_name:
-                franchise_index = i
-                break
-        self.location_franchise.setCurrentIndex(franchise_index)
+        self.location_franchise.set_current_id(franchise_id)
 
         self.location_name.setText(location_name)
         self.location_address.setText(address if address else "")
-        self.location_active.setChecked(active)
+        self.location_room.setText(room_number if room_number else "")
+        self.location_active.setChecked(bool(active))
 
-        # Получаем номер помещения из БД
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT room_number
-                    FROM location
-                    WHERE location_id = %s
-                """, (location_id,))
-                room_number = cursor.fetchone()[0]
-                self.location_room.setText(room_number if room_number else "")
-
-        except psycopg2.Error as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке данных локации:\n{str(e)}")
-
-        # Активируем кнопки
-        self.update_location_btn.setEnabled(True)
-        self.delete_location_btn.setEnabled(True)
+        # Активируем кнопки, если можно менять данные
+        self.update_location_btn.setEnabled(self.online)
+        self.delete_location_btn.setEnabled(self.online)
+        self.location_history_btn.setEnabled(self.online)
         self.add_location_btn.setEnabled(False)
 
     def add_franchise(self):
@@ -359,30 +831,38 @@ class FranchiseApp(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Название франшизы обязательно!")
             return
 
-        parent_id = self.franchise_parent.currentData()
-        address = self.franchise_address.text().strip()
-        phone = self.franchise_phone.text().strip()
-        email = self.franchise_email.text().strip()
-        is_active = self.franchise_active.isChecked()
-
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO franchise (parent_id, name, address, contact_phone, email, is_active)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING franchise_id
-                """, (parent_id, name, address if address else None,
-                      phone if phone else None, email if email else None, is_active))
-                franchise_id = cursor.fetchone()[0]
-                self.db_connection.commit()
-
-                QMessageBox.information(self, "Успех", f"Франшиза успешно добавлена с ID: {franchise_id}")
-                self.load_franchises()
-                self.clear_franchise_form()
-
-        except psycopg2.Error as e:
-            self.db_connection.rollback()
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при добавлении франшизы:\n{str(e)}")
+        self.insert_franchise(self.franchise_form(name), check_similar=True)
+
+    def insert_franchise(self, franchise, check_similar):
+        """Добавление франшизы; похожие франшизы проверяются перед вставкой"""
+        def insert(connection):
+            repository = FranchiseRepository(connection)
+            if check_similar:
+                similar = repository.similar(franchise.name, franchise.address)
+                if similar:
+                    return None, similar
+            row = repository.insert(franchise)
+            connection.commit()
+            return row, []
+
+        def done(result):
+            row, similar = result
+            if row is None:
+                lines = similar_franchise_lines(similar)
+                if self.confirm_similar(self.franchise_similar_label, lines, "Похожие франшизы уже есть"):
+                    self.insert_franchise(franchise, check_similar=False)
+                return
+            franchise_id = row[0]
+            QMessageBox.information(self, "Успех", f"Франшиза успешно добавлена с ID: {franchise_id}")
+            self.franchise_model.insert_row(row)
+            self.set_franchise_choice(franchise_id, row[1])
+            self.clear_franchise_form()
+            self.invalidate_tabs()
+
+        self.executor.submit(
+            insert, on_result=done,
+            on_error=lambda e: self.show_db_error("Ошибка при добавлении франшизы", e)
+        )
 
     def update_franchise(self):
         """Обновление существующей франшизы"""
@@ -394,32 +874,72 @@ class FranchiseApp(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Название франшизы обязательно!")
             return
 
-        parent_id = self.franchise_parent.currentData()
-        address = self.franchise_address.text().strip()
-        phone = self.franchise_phone.text().strip()
-        email = self.franchise_email.text().strip()
-        is_active = self.franchise_active.isChecked()
-
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    UPDATE franchise
-                    SET parent_id = %s, name = %s, address = %s,
-                        contact_phone = %s, email = %s, is_active = %s,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE franchise_id = %s
-                """, (parent_id, name, address if address else None,
-                      phone if phone else None, email if email else None,
-                      is_active, self.current_franchise_id))
-                self.db_connection.commit()
-
-                QMessageBox.information(self, "Успех", "Франшиза успешно обновлена")
-                self.load_franchises()
-                self.clear_franchise_form()
-
-        except psycopg2.Error as e:
-            self.db_connection.rollback()
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при обновлении франшизы:\n{str(e)}")
+        self.save_franchise(self.current_franchise_row, self.franchise_form(name))
+
+    def save_franchise(self, base_row, franchise):
+        """Сохранение франшизы, если ее не изменили после загрузки строки base_row"""
+        franchise_id, version = base_row[0], base_row[8]
+        position = self.franchise_model.find_row(franchise_id)
+        old_name = self.franchise_model.row(position)[1] if position >= 0 else None
+
+        def update(connection):
+            row = FranchiseRepository(connection).update(franchise_id, franchise, version)
+            connection.commit()
+            return row
+
+        def done(row):
+            if row is None:
+                # Франшизу успели удалить
+                self.franchise_model.remove_row(franchise_id)
+                self.remove_franchise_choice(franchise_id)
+                QMessageBox.warning(self, "Ошибка", "Франшиза не найдена")
+                return
+            QMessageBox.information(self, "Успех", "Франшиза успешно обновлена")
+            if row[1] != old_name:
+                self.set_franchise_choice(franchise_id, row[1])
+                self.rename_franchise_references(franchise_id, row[1])
+            self.franchise_model.update_row(row)
+            self.clear_franchise_form()
+            self.invalidate_tabs()
+
+        def failed(error):
+            if isinstance(error, ConflictError):
+                self.franchise_conflict(base_row, franchise, error.current)
+                return
+            if isinstance(error, psycopg2.errors.CheckViolation):
+                # Триггер иерархии отклонил цикл в parent_id
+                QMessageBox.warning(
+                    self, "Ошибка",
+                    "Нельзя назначить родителем саму франшизу или ее дочернюю франшизу!"
+                )
+                return
+            self.show_db_error("Ошибка при обновлении франшизы", error)
+
+        self.executor.submit(update, on_result=done, on_error=failed)
+
+    def franchise_conflict(self, base_row, franchise, current):
+        """Франшизу изменили другие: слияние изменений или отказ от своих"""
+        if current[1] != base_row[1]:
+            self.set_franchise_choice(current[0], current[1])
+            self.rename_franchise_references(current[0], current[1])
+        self.franchise_model.update_row(current)
+        base, theirs = Franchise.from_row(base_row), Franchise.from_row(current)
+        if theirs == base:
+            # Изменились только служебные поля, сохраняем без вопросов
+            self.save_franchise(current, franchise)
+            return
+        dialog = ConflictDialog(
+            "Конфликт изменений франшизы", FRANCHISE_FIELDS, base, franchise, theirs,
+            self.field_display, self
+        )
+        result = dialog.exec()
+        merged = dialog.merged()
+        # Окно создается на каждый конфликт
+        dialog.deleteLater()
+        if result == ConflictDialog.SAVE:
+            self.save_franchise(current, merged)
+        elif result == ConflictDialog.DISCARD:
+            self.fill_franchise_form(current)
 
     def delete_franchise(self):
         """Удаление франшизы"""
@@ -432,51 +952,40 @@ class FranchiseApp(QMainWindow):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
 
-        if reply == QMessageBox.StandardButton.Yes:
-            try:
-                with self.db_connection.cursor() as cursor:
-                    # Проверяем, есть ли дочерние франшизы
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM franchise 
-                        WHERE parent_id = %s
-                    """, (self.current_franchise_id,))
-                    child_count = cursor.fetchone()[0]
-
-                    if child_count > 0:
-                        QMessageBox.warning(
-                            self, "Ошибка",
-                            "Нельзя удалить франшизу, у которой есть дочерние франшизы!"
-                        )
-                        return
-
-                    # Проверяем, есть ли связанные локации
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM location 
-                        WHERE franchise_id = %s
-                    """, (self.current_franchise_id,))
-                    location_count = cursor.fetchone()[0]
-
-                    if location_count > 0:
-                        QMessageBox.warning(
-                            self, "Ошибка",
-                            "Нельзя удалить франшизу, у которой есть локации!"
-                        )
-                        return
-
-                    # Удаляем франшизу
-                    cursor.execute("""
-                        DELETE FROM franchise 
-                        WHERE franchise_id = %s
-                    """, (self.current_franchise_id,))
-                    self.db_connection.commit()
-
-                    QMessageBox.information(self, "Успех", "Франшиза успешно удалена")
-                    self.load_franchises()
-                    self.clear_franchise_form()
-
-            except psycopg2.Error as e:
-                self.db_connection.rollback()
-                QMessageBox.critical(self, "Ошибка", f"Ошибка при удалении франшизы:\n{str(e)}")
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        franchise_id = self.current_franchise_id
+
+        def delete(connection):
+            FranchiseRepository(connection).delete(franchise_id)
+            connection.commit()
+
+        def done(_):
+            QMessageBox.information(self, "Успех", "Франшиза успешно удалена")
+            self.franchise_model.remove_row(franchise_id)
+            self.remove_franchise_choice(franchise_id)
+            self.clear_franchise_form()
+            self.invalidate_tabs()
+
+        def failed(error):
+            if isinstance(error, RepositoryError):
+                QMessageBox.warning(self, "Ошибка", str(error))
+                return
+            self.show_db_error("Ошибка при удалении франшизы", error)
+
+        self.executor.submit(delete, on_result=done, on_error=failed)
+
+    def franchise_form(self, name):
+        """Поля франшизы из формы"""
+        return Franchise(
+            name=name,
+            parent_id=self.franchise_parent.currentData(),
+            address=self.franchise_address.text().strip() or None,
+            contact_phone=self.franchise_phone.text().strip() or None,
+            email=self.franchise_email.text().strip() or None,
+            is_active=self.franchise_active.isChecked(),
+        )
 
     def clear_franchise_form(self):
         """Очистка формы франшизы"""
@@ -489,10 +998,12 @@ class FranchiseApp(QMainWindow):
 
         if hasattr(self, 'current_franchise_id'):
             del self.current_franchise_id
+            del self.current_franchise_row
+        self.hide_similar(self.franchise_similar_label, self.franchise_similar_timer, "franchise_similar")
 
         self.update_franchise_btn.setEnabled(False)
         self.delete_franchise_btn.setEnabled(False)
-        self.add_franchise_btn.setEnabled(True)
+        self.add_franchise_btn.setEnabled(self.online)
 
     def add_location(self):
         """Добавление новой локации"""
@@ -506,28 +1017,36 @@ class FranchiseApp(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Название локации обязательно!")
             return
 
-        address = self.location_address.text().strip()
-        room_number = self.location_room.text().strip()
-        is_active = self.location_active.isChecked()
-
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO location (franchise_id, name, address, room_number, is_active)
-                    VALUES (%s, %s, %s, %s, %s)
-                    RETURNING location_id
-                """, (franchise_id, name, address if address else None,
-                      room_number if room_number else None, is_active))
-                location_id = cursor.fetchone()[0]
-                self.db_connection.commit()
-
-                QMessageBox.information(self, "Успех", f"Локация успешно добавлена с ID: {location_id}")
-                self.load_locations()
-                self.clear_location_form()
-
-        except psycopg2.Error as e:
-            self.db_connection.rollback()
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при добавлении локации:\n{str(e)}")
+        self.insert_location(self.location_form(franchise_id, name), check_similar=True)
+
+    def insert_location(self, location, check_similar):
+        """Добавление локации; похожие локации проверяются перед вставкой"""
+        def insert(connection):
+            repository = LocationRepository(connection)
+            if check_similar:
+                similar = repository.similar(location.franchise_id, location.name, location.address)
+                if similar:
+                    return None, similar
+            row = repository.insert(location)
+            connection.commit()
+            return row, []
+
+        def done(result):
+            row, similar = result
+            if row is None:
+                lines = similar_location_lines(similar)
+                if self.confirm_similar(self.location_similar_label, lines, "Похожие локации уже есть"):
+                    self.insert_location(location, check_similar=False)
+                return
+            QMessageBox.information(self, "Успех", f"Локация успешно добавлена с ID: {row[0]}")
+            self.location_model.insert_row(row)
+            self.clear_location_form()
+            self.invalidate_tabs()
+
+        self.executor.submit(
+            insert, on_result=done,
+            on_error=lambda e: self.show_db_error("Ошибка при добавлении локации", e)
+        )
 
     def update_location(self):
         """Обновление существующей локации"""
@@ -544,29 +1063,65 @@ class FranchiseApp(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Название локации обязательно!")
             return
 
-        address = self.location_address.text().strip()
-        room_number = self.location_room.text().strip()
-        is_active = self.location_active.isChecked()
-
-        try:
-            with self.db_connection.cursor() as cursor:
-                cursor.execute("""
-                    UPDATE location
-                    SET franchise_id = %s, name = %s, address = %s,
-                        room_number = %s, is_active = %s
-                    WHERE location_id = %s
-                """, (franchise_id, name, address if address else None,
-                      room_number if room_number else None, is_active,
-                      self.current_location_id))
-                self.db_connection.commit()
-
-                QMessageBox.information(self, "Успех", "Локация успешно обновлена")
-                self.load_locations()
-                self.clear_location_form()
-
-        except psycopg2.Error as e:
-            self.db_connection.rollback()
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при обновлении локации:\n{str(e)}")
+        self.save_location(self.current_location_row, self.location_form(franchise_id, name))
+
+    def save_location(self, base_row, location):
+        """Сохранение локации, если ее не изменили после загрузки строки base_row"""
+        location_id, version = base_row[0], base_row[7]
+
+        def update(connection):
+            row = LocationRepository(connection).update(location_id, location, version)
+            connection.commit()
+            return row
+
+        def done(row):
+            if row is None:
+                # Локацию успели удалить
+                self.location_model.remove_row(location_id)
+                QMessageBox.warning(self, "Ошибка", "Локация не найдена")
+                return
+            QMessageBox.information(self, "Успех", "Локация успешно обновлена")
+            self.location_model.update_row(row)
+            self.clear_location_form()
+            self.invalidate_tabs()
+
+        def failed(error):
+            if isinstance(error, ConflictError):
+                self.location_conflict(base_row, location, error.current)
+                return
+            self.show_db_error("Ошибка при обновлении локации", error)
+
+        self.executor.submit(update, on_result=done, on_error=failed)
+
+    def location_conflict(self, base_row, location, current):
+        """Локацию изменили другие: слияние изменений или отказ от своих"""
+        self.location_model.update_row(current)
+        base, theirs = Location.from_row(base_row), Location.from_row(current)
+        if theirs == base:
+            self.save_location(current, location)
+            return
+        dialog = ConflictDialog(
+            "Конфликт изменений локации", LOCATION_FIELDS, base, location, theirs,
+            self.field_display, self
+        )
+        result = dialog.exec()
+        merged = dialog.merged()
+        # Окно создается на каждый конфликт
+        dialog.deleteLater()
+        if result == ConflictDialog.SAVE:
+            self.save_location(current, merged)
+        elif result == ConflictDialog.DISCARD:
+            self.fill_location_form(current)
+
+    def field_display(self, name, value):
+        """Значение поля франшизы или локации для показа пользователю"""
+        if name in ("parent_id", "franchise_id"):
+            if value is None:
+                return "Нет"
+            return self.location_franchise.references.name(value) or f"ID {value}"
+        if name == "is_active":
+            return "Да" if value else "Нет"
+        return value or ""
 
     def delete_location(self):
         """Удаление локации"""
@@ -579,22 +1134,42 @@ class FranchiseApp(QMainWindow):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
 
-        if reply == QMessageBox.StandardButton.Yes:
-            try:
-                with self.db_connection.cursor() as cursor:
-                    cursor.execute("""
-                        DELETE FROM location 
-                        WHERE location_id = %s
-                    """, (self.current_location_id,))
-                    self.db_connection.commit()
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        location_id = self.current_location_id
 
-                    QMessageBox.information(self, "Успех", "Локация успешно удалена")
-                    self.load_locations()
-                    self.clear_location_form()
+        def delete(connection):
+            LocationRepository(connection).delete(location_id)
+            connection.commit()
 
-            except psycopg2.Error as e:
-                self.db_connection.rollback()
-                QMessageBox.critical(self, "Ошибка", f"Ошибка при удалении локации:\n{str(e)}")
+        def done(_):
+            QMessageBox.information(self, "Успех", "Локация успешно удалена")
+            self.location_model.remove_row(location_id)
+            self.clear_location_form()
+            self.invalidate_tabs()
+
+        self.executor.submit(
+            delete, on_result=done,
+            on_error=lambda e: self.show_db_error("Ошибка при удалении локации", e)
+        )
+
+    def show_location_history(self):
+        """Хронология изменений устройств выбранной локации"""
+        if hasattr(self, 'current_location_id'):
+            location_history(
+                self.executor, self.current_location_id, self.location_name.text(), self
+            ).exec()
+
+    def location_form(self, franchise_id, name):
+        """Поля локации из формы"""
+        return Location(
+            franchise_id=franchise_id,
+            name=name,
+            address=self.location_address.text().strip() or None,
+            room_number=self.location_room.text().strip() or None,
+            is_active=self.location_active.isChecked(),
+        )
 
     def clear_location_form(self):
         """Очистка формы локации"""
@@ -606,14 +1181,20 @@ class FranchiseApp(QMainWindow):
 
         if hasattr(self, 'current_location_id'):
             del self.current_location_id
+            del self.current_location_row
+        self.hide_similar(self.location_similar_label, self.location_similar_timer, "location_similar")
 
         self.update_location_btn.setEnabled(False)
         self.delete_location_btn.setEnabled(False)
-        self.add_location_btn.setEnabled(True)
+        self.location_history_btn.setEnabled(False)
+        self.add_location_btn.setEnabled(self.online)
 
     def closeEvent(self, event):
         """Обработка закрытия окна"""
-        self.db_connection.close()
+        self.change_listener.stop()
+        self.executor.shutdown()
+        if self.snapshot is not None:
+            self.snapshot.close()
         event.accept()
 
 
@@ -0,0 +1,147 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QLineEdit,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QMessageBox
+)
+
+from repository import ARCHIVE_SEARCH_LIMIT, ArchiveRepository
+
+
+# Что искать: название, таблица архива и заголовки столбцов
+ARCHIVE_SOURCES = [
+    ("Устройства", "device",
+     ["ID", "Инв. номер", "Название", "Тип", "Франшиза", "Локация", "Статус", "В архиве с"]),
+    ("Локации", "location", ["ID", "Франшиза", "Название", "Адрес", "В архиве с"]),
+    ("Франшизы", "franchise", ["ID", "Название", "Родитель", "Адрес", "Телефон", "В архиве с"]),
+]
+
+
+class ArchiveDialog(QDialog):
+    """Поиск в архиве и восстановление записей
+
+    Восстановленные записи возвращаются в рабочие таблицы, и вкладки
+    узнают о них из уведомлений об изменениях, как о любых других.
+    """
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.setWindowTitle("Архив")
+        self.resize(900, 500)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        options_layout = QHBoxLayout()
+        layout.addLayout(options_layout)
+        self.source = QComboBox()
+        for title, table_name, headers in ARCHIVE_SOURCES:
+            self.source.addItem(title, (table_name, headers))
+        options_layout.addWidget(self.source)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Название, адрес или инв. номер")
+        self.search_input.returnPressed.connect(self.search)
+        options_layout.addWidget(self.search_input)
+
+        self.search_btn = QPushButton("Найти")
+        self.search_btn.clicked.connect(self.search)
+        options_layout.addWidget(self.search_btn)
+
+        self.table = QTableWidget()
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.itemSelectionChanged.connect(self.update_buttons)
+        layout.addWidget(self.table)
+
+        bottom_layout = QHBoxLayout()
+        layout.addLayout(bottom_layout)
+        self.status_label = QLabel()
+        bottom_layout.addWidget(self.status_label)
+        bottom_layout.addStretch()
+        self.restore_btn = QPushButton("Восстановить")
+        self.restore_btn.clicked.connect(self.restore)
+        self.restore_btn.setEnabled(False)
+        bottom_layout.addWidget(self.restore_btn)
+
+        # Таблица, к которой относятся показанные строки
+        self.shown_table = None
+
+    def search(self):
+        """Поиск в архиве в фоновом потоке"""
+        table_name, headers = self.source.currentData()
+        text = self.search_input.text()
+
+        self.search_btn.setEnabled(False)
+        self.status_label.setText("Поиск...")
+        self.executor.submit(
+            lambda connection: ArchiveRepository(connection).search(table_name, text),
+            on_result=lambda rows: self.fill(table_name, headers, rows),
+            on_error=lambda e: self.show_error("Ошибка при поиске в архиве", e), key="archive"
+        )
+
+    def fill(self, table_name, headers, rows):
+        self.search_btn.setEnabled(True)
+        self.shown_table = table_name
+        self.table.clear()
+        self.table.setColumnCount(len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column, value in enumerate(row):
+                if column == len(row) - 1:
+                    value = value.astimezone().strftime("%d.%m.%Y %H:%M")
+                self.table.setItem(row_index, column, QTableWidgetItem("" if value is None else str(value)))
+        self.table.resizeColumnsToContents()
+        if len(rows) >= ARCHIVE_SEARCH_LIMIT:
+            self.status_label.setText(f"Показаны первые {len(rows)} записей, уточните поиск")
+        else:
+            self.status_label.setText(f"Найдено: {len(rows)}")
+        self.update_buttons()
+
+    def selected_ids(self):
+        return [int(self.table.item(index.row(), 0).text())
+                for index in self.table.selectionModel().selectedRows()]
+
+    def update_buttons(self):
+        self.restore_btn.setEnabled(bool(self.selected_ids()))
+
+    def restore(self):
+        """Восстановление выделенных записей одной транзакцией"""
+        table_name = self.shown_table
+        ids = self.selected_ids()
+        if not ids:
+            return
+
+        reply = QMessageBox.question(
+            self, 'Подтверждение',
+            f'Восстановить выбранные записи ({len(ids)}) из архива? Вместе с ними '
+            f'восстанавливаются франшизы и локации, на которые они ссылаются.',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        def update(connection):
+            count = ArchiveRepository(connection).restore(table_name, ids)
+            connection.commit()
+            return count
+
+        self.restore_btn.setEnabled(False)
+        self.executor.submit(
+            update, on_result=lambda count: self.restored(table_name, ids, count),
+            on_error=lambda e: self.show_error("Ошибка при восстановлении", e)
+        )
+
+    def restored(self, table_name, ids, count):
+        restored_ids = {str(row_id) for row_id in ids}
+        for row in reversed(range(self.table.rowCount())):
+            if table_name == self.shown_table and self.table.item(row, 0).text() in restored_ids:
+                self.table.removeRow(row)
+        self.status_label.setText(f"Восстановлено: {count}")
+
+    def show_error(self, message, error):
+        self.search_btn.setEnabled(True)
+        self.update_buttons()
+        self.status_label.clear()
+        QMessageBox.critical(self, "Ошибка", f"{message}:\n{str(error)}")
@@ -0,0 +1,308 @@
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import psycopg2
+
+from component_tab import DEVICE_COMPONENTS, component_device_query
+from components import ComponentFilter, parse_specifications_query
+from db import DatabaseSettings
+from generate_data import GeneratorSettings, generate
+from hierarchy_tab import HIERARCHY_SQL
+from history_dialog import HISTORY_ROW, HISTORY_SORT, HISTORY_SOURCE
+from models import LazyQueryModel
+from queries import KeysetQuery, like_prefix
+from repository import FRANCHISE_DELETE_CHECK, device_query, franchise_query, location_query, spec_query
+from specs import SpecCatalog, SpecQueryError, parse_spec_query
+
+
+# Страница таблицы, как ее читает модель
+PAGE_SIZE = LazyQueryModel.PAGE_SIZE
+
+# Таблицы, размер которых записывается в результаты
+COUNTED_TABLES = ["franchise", "location", "device", "component", "device_spec", "device_history"]
+
+# Во сколько раз медиана может вырасти, прежде чем считается регрессией
+REGRESSION_RATIO = 1.2
+
+
+class BenchmarkCase:
+    """Измеряемый запрос
+
+    prepare(connection) выбирает подходящие данные и возвращает SQL и
+    параметры, которые выполняет программа, или None, если таких данных
+    в БД нет.
+    """
+
+    def __init__(self, name, title, prepare):
+        self.name = name
+        self.title = title
+        self.prepare = prepare
+
+
+def _value(connection, sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _middle_row(connection, query, column):
+    """Строка из середины выборки - граница страницы при глубокой прокрутке"""
+    sql, params = query.page(None, None, column)
+    total = _value(connection, f"SELECT COUNT(*) FROM ({sql}) q", params)
+    if not total:
+        return None
+    # Строки до середины пропускаются на сервере, а не передаются
+    with connection.cursor(name="benchmark_middle_row") as cursor:
+        cursor.execute(sql, params)
+        cursor.scroll(total // 2)
+        return cursor.fetchone()
+
+
+def _page(query, column=0, after=None):
+    return query.page(after, PAGE_SIZE, column)
+
+
+def _deep_page(query, column):
+    def prepare(connection):
+        after = _middle_row(connection, query, column)
+        return _page(query, column, after) if after is not None else None
+    return prepare
+
+
+def _with_id(sql_for_id, build):
+    """prepare, которому нужен id подходящей записи"""
+    def prepare(connection):
+        record_id = _value(connection, sql_for_id)
+        return build(record_id) if record_id is not None else None
+    return prepare
+
+
+def _spec_search(text, subtree_root=False):
+    def prepare(connection):
+        catalog = SpecCatalog()
+        catalog.load(connection)
+        try:
+            conditions = parse_spec_query(text, catalog)
+        except SpecQueryError:
+            # В БД нет атрибутов из запроса
+            return None
+        franchise_id = None
+        if subtree_root:
+            franchise_id = _value(connection, "SELECT MIN(franchise_id) FROM franchise WHERE parent_id IS NULL")
+        return _page(spec_query(conditions, franchise_id))
+    return prepare
+
+
+def _component_search(text="", model=""):
+    def prepare(connection):
+        component_filter = ComponentFilter()
+        if model:
+            component_filter.where("lower(c.model) LIKE lower(%s)", like_prefix(model))
+        parse_specifications_query(text, component_filter)
+        return _page(component_device_query(component_filter))
+    return prepare
+
+
+def _history(condition, sql_for_id):
+    def build(record_id):
+        query = KeysetQuery(HISTORY_ROW, HISTORY_SOURCE, "h.history_id", HISTORY_SORT)
+        query.where(condition, record_id)
+        return query.page(None, PAGE_SIZE, 1, descending=True)
+    return _with_id(sql_for_id, build)
+
+
+# Франшиза с наибольшим числом локаций, локация и устройство с наибольшей историей
+BUSY_FRANCHISE = "SELECT franchise_id FROM location GROUP BY franchise_id ORDER BY COUNT(*) DESC LIMIT 1"
+BUSY_LOCATION = "SELECT location_id FROM device WHERE location_id IS NOT NULL GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1"
+BUSY_DEVICE = "SELECT device_id FROM device_history GROUP BY device_id ORDER BY COUNT(*) DESC LIMIT 1"
+
+CASES = [
+    BenchmarkCase("franchises_page", "Франшизы: первая страница",
+                  lambda connection: _page(franchise_query())),
+    BenchmarkCase("franchises_page_by_name", "Франшизы: первая страница по названию",
+                  lambda connection: _page(franchise_query(), 1)),
+    BenchmarkCase("franchises_deep_page", "Франшизы: страница из середины по названию",
+                  _deep_page(franchise_query(), 1)),
+    BenchmarkCase("franchises_search", "Франшизы: поиск по подстроке",
+                  lambda connection: _page(franchise_query("12"))),
+    BenchmarkCase("franchise_delete_check", "Франшизы: проверка перед удалением",
+                  _with_id("SELECT MIN(franchise_id) FROM franchise WHERE parent_id IS NULL",
+                           lambda franchise_id: (FRANCHISE_DELETE_CHECK, {"id": franchise_id}))),
+    BenchmarkCase("locations_page", "Локации: первая страница",
+                  lambda connection: _page(location_query())),
+    BenchmarkCase("locations_deep_page", "Локации: страница из середины по франшизе",
+                  _deep_page(location_query(), 1)),
+    BenchmarkCase("locations_by_franchise", "Локации: фильтр по франшизе",
+                  _with_id(BUSY_FRANCHISE, lambda franchise_id: _page(location_query(franchise_id=franchise_id)))),
+    BenchmarkCase("locations_search", "Локации: поиск по подстроке",
+                  lambda connection: _page(location_query("12"))),
+    BenchmarkCase("hierarchy", "Иерархия франшиз с итогами",
+                  lambda connection: (HIERARCHY_SQL, ())),
+    BenchmarkCase("devices_page", "Устройства: первая страница",
+                  lambda connection: _page(device_query())),
+    BenchmarkCase("devices_deep_page", "Устройства: страница из середины по названию",
+                  _deep_page(device_query(), 2)),
+    BenchmarkCase("devices_search", "Устройства: поиск по подстроке",
+                  lambda connection: _page(device_query("123"))),
+    BenchmarkCase("devices_by_status", "Устройства: фильтр по статусу",
+                  lambda connection: _page(device_query(status="lost"))),
+    BenchmarkCase("devices_by_location", "Устройства: фильтр по локации",
+                  _with_id(BUSY_LOCATION, lambda location_id: _page(device_query(location_id=location_id)))),
+    BenchmarkCase("device_row", "Устройства: перечитывание строки",
+                  _with_id("SELECT MAX(device_id) FROM device", lambda device_id: device_query().rows([device_id]))),
+    BenchmarkCase("device_components", "Компоненты устройства",
+                  _with_id("SELECT MAX(device_id) FROM component", lambda device_id: (DEVICE_COMPONENTS, (device_id,)))),
+    BenchmarkCase("device_history", "История устройства",
+                  _history("h.device_id = %s", BUSY_DEVICE)),
+    BenchmarkCase("location_history", "История локации",
+                  _history("h.location_id = %s", BUSY_LOCATION)),
+    BenchmarkCase("spec_search", "Поиск по характеристикам",
+                  _spec_search("RAM Size >= 16 AND CPU Cores >= 8")),
+    BenchmarkCase("spec_search_subtree", "Поиск по характеристикам в поддереве франшизы",
+                  _spec_search("RAM Size >= 16 AND CPU Cores >= 8", subtree_root=True)),
+    BenchmarkCase("component_search", "Поиск по характеристикам компонентов",
+                  _component_search("interface = NVMe AND capacity_gb >= 1000")),
+    BenchmarkCase("component_model_search", "Поиск компонентов по началу модели",
+                  _component_search(model="Samsung")),
+]
+
+
+def table_counts(connection):
+    """Точное число строк основных таблиц"""
+    counts = {table: _value(connection, f"SELECT COUNT(*) FROM {table}") for table in COUNTED_TABLES}
+    connection.rollback()
+    return counts
+
+
+def run_case(connection, case, repeat):
+    """Замер запроса: первый прогон прогревает кэш и не учитывается"""
+    prepared = case.prepare(connection)
+    connection.rollback()
+    if prepared is None:
+        return None
+
+    sql, params = prepared
+    timings = []
+    rows = 0
+    for attempt in range(repeat + 1):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = len(cursor.fetchall())
+        elapsed = (time.perf_counter() - started) * 1000
+        connection.rollback()
+        if attempt:
+            timings.append(elapsed)
+
+    timings.sort()
+    return {
+        "title": case.title,
+        "rows": rows,
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def run_benchmark(connection, repeat, cases=CASES, progress=print):
+    """Замер всех запросов на данных, которые сейчас в БД"""
+    result = {"counts": table_counts(connection), "cases": {}}
+    for case in cases:
+        measured = run_case(connection, case, repeat)
+        if measured is None:
+            progress(f"{case.name}: нет данных, пропущено")
+            continue
+        result["cases"][case.name] = measured
+        progress(f"{case.name}: {measured['median_ms']:.2f} мс, строк {measured['rows']}")
+    return result
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, output=print):
+    """Сравнение медиан с прошлым запуском на тех же масштабах"""
+    previous = {point["scale"]: point["cases"] for point in baseline["results"]}
+    for point in results["results"]:
+        cases = previous.get(point["scale"])
+        if cases is None:
+            continue
+        for name, measured in point["cases"].items():
+            before = cases.get(name)
+            if before is None or not before["median_ms"]:
+                continue
+            ratio = measured["median_ms"] / before["median_ms"]
+            mark = "  медленнее" if ratio > REGRESSION_RATIO else ""
+            output(f"{point['scale']} {name}: {before['median_ms']:.2f} -> "
+                   f"{measured['median_ms']:.2f} мс (x{ratio:.2f}){mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Замер запросов, которые выполняет FCAS, с сохранением результатов в JSON"
+    )
+    parser.add_argument("--scales", help="числа устройств через запятую; для каждого данные "
+                                         "генерируются заново (нужен --generate)")
+    parser.add_argument("--generate", action="store_true",
+                        help="перед замером удалить данные и сгенерировать новые")
+    parser.add_argument("--seed", type=int, default=1, help="начальное значение генератора")
+    parser.add_argument("--repeat", type=int, default=5, help="число замеров каждого запроса")
+    parser.add_argument("--case", action="append", help="замерить только этот запрос (можно несколько)")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmark-<дата>.json)")
+    parser.add_argument("--baseline", help="файл прошлых результатов для сравнения")
+    parser.add_argument("--dsn", help="строка подключения (по умолчанию FCAS_DSN)")
+    args = parser.parse_args()
+
+    if args.scales and not args.generate:
+        parser.error("--scales удаляет данные в БД, добавьте --generate")
+    scales = [int(scale) for scale in args.scales.split(",")] if args.scales else [None]
+    cases = [case for case in CASES if not args.case or case.name in args.case]
+
+    connection = psycopg2.connect(args.dsn or DatabaseSettings.from_env().dsn, application_name="fcas-benchmark")
+    try:
+        results = {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": _revision(),
+            "server_version": connection.server_version,
+            "repeat": args.repeat,
+            "results": [],
+        }
+        for scale in scales:
+            if args.generate:
+                print(f"Генерация данных: {scale or 100000} устройств")
+                generate(connection, GeneratorSettings.for_scale(scale or 100000, args.seed), truncate=True)
+            point = run_benchmark(connection, args.repeat, cases)
+            point["scale"] = scale
+            results["results"].append(point)
+    except (psycopg2.Error, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    output = args.output or f"benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"Результаты записаны в {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from PyQt6.QtWidgets import QComboBox, QCompleter
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+from references import ReferenceList
+
+
+class ChoiceModel(QAbstractListModel):
+    """Строки справочника (id, название) для комбобокса
+
+    Модель только показывает общий неизменяемый список, поэтому смена
+    списка - это сброс модели без добавления элементов по одному.
+    Необязательный первый элемент (например, "Все франшизы") имеет id None.
+    """
+
+    def __init__(self, first_item=None, parent=None):
+        super().__init__(parent)
+        self.first_item = first_item
+        self.references = ReferenceList([])
+
+    def set_references(self, references):
+        self.beginResetModel()
+        self.references = references
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.references) + (self.first_item is not None)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = self.row(index.row())
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return row[1]
+        if role == Qt.ItemDataRole.UserRole:
+            return row[0]
+        return None
+
+    def row(self, index):
+        if self.first_item is not None:
+            if index == 0:
+                return None, self.first_item
+            index -= 1
+        return self.references[index]
+
+    def index_of(self, row_id):
+        """Номер элемента по id или -1"""
+        if row_id is None:
+            return 0 if self.first_item is not None else -1
+        position = self.references.position(row_id)
+        if position < 0:
+            return -1
+        return position + (self.first_item is not None)
+
+
+class MatchModel(QAbstractListModel):
+    """Найденные по введенному тексту строки для подсказки"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.rows[index.row()][1]
+        if role == Qt.ItemDataRole.UserRole:
+            return self.rows[index.row()][0]
+        return None
+
+
+class ChoiceBox(QComboBox):
+    """Выбор строки справочника с поиском по началу и части названия
+
+    Выпадающий список показывает общий ReferenceList, а при вводе текста
+    подсказка ищет совпадения по индексу списка, не перебирая элементы
+    комбобокса. Выбор из подсказки испускает activated, как выбор
+    из списка.
+    """
+
+    def __init__(self, first_item=None, parent=None):
+        super().__init__(parent)
+        self.choices = ChoiceModel(first_item, self)
+        self.setModel(self.choices)
+        self.setEditable(True)
+        self.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+        # Ширина не зависит от длины тысяч названий
+        self.setSizeAdjustPolicy(QComboBox.SizeAdjustPolicy.AdjustToMinimumContentsLengthWithIcon)
+        self.setMinimumContentsLength(20)
+        self.view().setUniformItemSizes(True)
+
+        self.matches = MatchModel(self)
+        completer = QCompleter(self.matches, self)
+        completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        completer.activated[QModelIndex].connect(self.match_activated)
+        self.lineEdit().setCompleter(completer)
+        self.lineEdit().textEdited.connect(self.search)
+        self.lineEdit().editingFinished.connect(self.restore_text)
+
+    @property
+    def references(self):
+        return self.choices.references
+
+    def set_references(self, references):
+        """Смена списка с сохранением выбранной строки, если она осталась"""
+        if references is self.choices.references:
+            return
+        row_id = self.currentData()
+        self.choices.set_references(references)
+        self.setCurrentIndex(max(self.choices.index_of(row_id), 0))
+
+    def find_id(self, row_id):
+        """Номер элемента по id или -1"""
+        return self.choices.index_of(row_id)
+
+    def set_current_id(self, row_id):
+        self.setCurrentIndex(max(self.choices.index_of(row_id), 0))
+
+    def search(self, text):
+        self.matches.set_rows(self.references.search(text))
+
+    def match_activated(self, index):
+        row = self.choices.index_of(index.data(Qt.ItemDataRole.UserRole))
+        if row >= 0:
+            self.setCurrentIndex(row)
+            self.activated.emit(row)
+
+    def restore_text(self):
+        """Недовведенный текст заменяется названием выбранной строки"""
+        if self.currentIndex() >= 0 and self.currentText() != self.itemText(self.currentIndex()):
+            self.setEditText(self.itemText(self.currentIndex()))
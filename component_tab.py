@@ -0,0 +1,202 @@
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+    QTableView, QTableWidget, QTableWidgetItem, QAbstractItemView,
+    QMessageBox, QSplitter
+)
+from PyQt6.QtCore import Qt
+
+from choice_box import ChoiceBox
+from components import COMPONENT_SUMMARY, ComponentFilter, parse_specifications_query
+from models import LazyQueryModel
+from queries import KeysetQuery, like_prefix
+from references import REFERENCES
+from specs import SpecQueryError
+
+
+# Значения строки результата: устройство, число подходящих компонентов
+# и сводка по всем его компонентам
+COMPONENT_DEVICE_ROW = """
+    d.device_id, d.inventory_number, d.name, f.name as franchise_name,
+    l.name as location_name, m.matched, cs.summary
+"""
+
+COMPONENT_DEVICE_SORT = [
+    ("d.device_id", None),
+    ("COALESCE(d.inventory_number, '')", ""),
+    ("COALESCE(d.name, '')", ""),
+    ("f.name", None),
+    ("COALESCE(l.name, '')", ""),
+    ("m.matched", None),
+    ("COALESCE(cs.summary, '')", ""),
+]
+
+
+# Компоненты одного устройства
+DEVICE_COMPONENTS = """
+    SELECT ct.name, c.model, c.installed_date, c.specifications::text, c.notes
+    FROM component c
+    JOIN component_type ct ON c.component_type_id = ct.component_type_id
+    WHERE c.device_id = %s
+    ORDER BY ct.name, c.model
+"""
+
+
+def component_device_query(component_filter):
+    """Запрос устройств, у которых есть компоненты, подходящие под фильтр
+
+    Подходящие компоненты группируются по устройству, сводка по всем
+    компонентам устройства собирается тем же запросом.
+    """
+    return KeysetQuery(
+        COMPONENT_DEVICE_ROW,
+        f"""
+        FROM (
+            SELECT c.device_id, COUNT(*) AS matched
+            FROM component c
+            WHERE {component_filter.sql()}
+            GROUP BY c.device_id
+        ) m
+        JOIN device d ON d.device_id = m.device_id
+        JOIN franchise f ON d.franchise_id = f.franchise_id
+        LEFT JOIN location l ON d.location_id = l.location_id
+        {COMPONENT_SUMMARY}
+        """,
+        "d.device_id", COMPONENT_DEVICE_SORT, component_filter.params
+    )
+
+
+class ComponentTab(QWidget):
+    """Вкладка поиска устройств по их компонентам"""
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.stale = True
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        filter_layout = QHBoxLayout()
+        layout.addLayout(filter_layout)
+
+        self.type_filter = ChoiceBox("Все компоненты")
+        filter_layout.addWidget(self.type_filter)
+
+        self.model_filter = QLineEdit()
+        self.model_filter.setPlaceholderText("Модель начинается с")
+        self.model_filter.returnPressed.connect(self.search)
+        filter_layout.addWidget(self.model_filter)
+
+        self.search_btn = QPushButton("Найти")
+        self.search_btn.clicked.connect(self.search)
+        filter_layout.addWidget(self.search_btn)
+
+        self.specifications_filter = QLineEdit()
+        self.specifications_filter.setPlaceholderText(
+            'Характеристики: interface = NVMe AND capacity_gb >= 500, {"interface": "NVMe"} или $.capacity_gb > 500'
+        )
+        self.specifications_filter.returnPressed.connect(self.search)
+        layout.addWidget(self.specifications_filter)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        layout.addWidget(splitter)
+
+        # Устройства с подходящими компонентами
+        self.model = LazyQueryModel(
+            ["ID", "Инв. номер", "Название", "Франшиза", "Локация", "Найдено", "Компоненты"],
+            self.executor
+        )
+        self.model.setObjectName("component_devices")
+        self.model.error.connect(lambda e: self.show_error("Ошибка при поиске компонентов", e))
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.clicked.connect(self.device_click)
+        splitter.addWidget(self.table)
+
+        # Компоненты выбранного устройства
+        components_widget = QWidget()
+        components_layout = QVBoxLayout()
+        components_layout.setContentsMargins(0, 0, 0, 0)
+        components_widget.setLayout(components_layout)
+        components_layout.addWidget(QLabel("Компоненты устройства:"))
+        self.components_table = QTableWidget(0, 5)
+        self.components_table.setHorizontalHeaderLabels(
+            ["Тип", "Модель", "Установлен", "Характеристики", "Примечания"]
+        )
+        self.components_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.components_table.horizontalHeader().setStretchLastSection(True)
+        components_layout.addWidget(self.components_table)
+        splitter.addWidget(components_widget)
+
+    def invalidate(self):
+        """Отметка о том, что франшизы или локации изменились"""
+        self.stale = True
+        if self.isVisible():
+            self.load()
+
+    def load_if_stale(self):
+        if self.stale:
+            self.load()
+
+    def load(self):
+        """Загрузка типов компонентов и результатов поиска"""
+        self.stale = False
+
+        def fetch_types(connection):
+            return REFERENCES.get(connection, "component_type")["component_type"]
+
+        self.executor.submit(
+            fetch_types, on_result=self.type_filter.set_references,
+            on_error=lambda e: self.show_error("Ошибка при загрузке типов компонентов", e),
+            key="component_types"
+        )
+        self.search()
+
+    def search(self):
+        """Поиск устройств, у которых есть подходящие компоненты"""
+        component_filter = ComponentFilter()
+        type_id = self.type_filter.currentData()
+        if type_id is not None:
+            component_filter.where("c.component_type_id = %s", type_id)
+        model = self.model_filter.text().strip()
+        if model:
+            component_filter.where("lower(c.model) LIKE lower(%s)", like_prefix(model))
+        try:
+            parse_specifications_query(self.specifications_filter.text(), component_filter)
+        except SpecQueryError as e:
+            QMessageBox.warning(self, "Ошибка", str(e))
+            return
+
+        self.components_table.setRowCount(0)
+        self.model.reset(component_device_query(component_filter))
+
+    def device_click(self, index):
+        """Показ компонентов выбранного устройства"""
+        device_id = self.model.row(index.row())[0]
+
+        def fetch(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(DEVICE_COMPONENTS, (device_id,))
+                return cursor.fetchall()
+
+        def fill(components):
+            self.components_table.setRowCount(len(components))
+            for i, component in enumerate(components):
+                for j, value in enumerate(component):
+                    self.components_table.setItem(
+                        i, j, QTableWidgetItem(str(value) if value is not None else "")
+                    )
+
+        self.executor.submit(
+            fetch, on_result=fill,
+            on_error=lambda e: self.show_error("Ошибка при загрузке компонентов", e),
+            key="device_components"
+        )
+
+    def show_error(self, message, error):
+        QMessageBox.critical(self, "Ошибка", f"{message}:\n{str(error)}")
@@ -0,0 +1,152 @@
+import json
+import re
+
+from psycopg2.extras import Json
+
+from specs import AND_RE, CONDITION_RE, SpecQueryError
+
+
+# Сводка по всем компонентам устройства: "CPU Intel i5; SSD Samsung 870 EVO"
+COMPONENT_SUMMARY = """
+    CROSS JOIN LATERAL (
+        SELECT string_agg(
+                   ct.name || COALESCE(' ' || c.model, ''), '; ' ORDER BY ct.name, c.model
+               ) AS summary
+        FROM component c
+        JOIN component_type ct ON c.component_type_id = ct.component_type_id
+        WHERE c.device_id = d.device_id
+    ) cs
+"""
+
+
+# Сравнения и логические операции jsonpath: выражение с ними на верхнем
+# уровне - предикат (@@), без них - путь, проверяемый на существование (@?)
+JSONPATH_PREDICATE_RE = re.compile(
+    r"==|!=|<>|<|>|&&|\|\||!|(?<![.\w])(?:like_regex|starts\s+with|is\s+unknown)\b"
+)
+
+
+class ComponentFilter:
+    """Условия на компоненты c, собранные в WHERE с параметрами"""
+
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+
+    def where(self, condition, *params):
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def sql(self):
+        return " AND ".join(self.conditions) if self.conditions else "TRUE"
+
+
+def parse_specifications_query(text, component_filter):
+    """Условия на component.specifications из текста запроса
+
+    Поддерживаются три формы:
+    - JSON-объект {"interface": "NVMe"} - вхождение (@>);
+    - выражение jsonpath, начинающееся с $: предикат вроде $.size > 100
+      проверяется @@, путь вроде $.ports ? (@ == "USB") - @?;
+    - условия "ключ оператор значение" через AND; равенства собираются
+      в один объект для @>, сравнения превращаются в jsonpath.
+    Все эти операторы поддерживаются GIN-индексом jsonb_path_ops.
+    """
+    text = text.strip()
+    if not text:
+        return
+
+    if text.startswith("{"):
+        try:
+            value = json.loads(text)
+        except ValueError as e:
+            raise SpecQueryError(f"Некорректный JSON: {e}")
+        if not isinstance(value, dict):
+            raise SpecQueryError("Ожидается JSON-объект")
+        component_filter.where("c.specifications @> %s", Json(value))
+        return
+
+    if text.startswith("$"):
+        operator = "@@" if JSONPATH_PREDICATE_RE.search(_jsonpath_top_level(text)) else "@?"
+        component_filter.where(f"c.specifications {operator} %s::jsonpath", text)
+        return
+
+    contained = {}
+    for part in AND_RE.split(text):
+        if not part:
+            continue
+        match = CONDITION_RE.match(part)
+        if match is None:
+            raise SpecQueryError(f"Не понято условие \"{part}\": ожидается <ключ> <оператор> <значение>")
+        key, operator, value = (group.strip() for group in match.groups())
+        if operator == "~":
+            raise SpecQueryError("Оператор ~ для характеристик компонентов не поддерживается")
+        if operator == "<>":
+            operator = "!="
+        path = key.split(".")
+        value = _json_value(value)
+
+        if operator == "=":
+            # Равенства проверяются вхождением: индекс находит их точно
+            target = contained
+            for name in path[:-1]:
+                target = target.setdefault(name, {})
+                if not isinstance(target, dict):
+                    raise SpecQueryError(f"Ключ \"{key}\" противоречит другому условию")
+            target[path[-1]] = value
+        else:
+            jsonpath = "$" + "".join(f".{json.dumps(name, ensure_ascii=False)}" for name in path)
+            component_filter.where(
+                "c.specifications @@ %s::jsonpath",
+                f"{jsonpath} {operator} {json.dumps(value, ensure_ascii=False)}"
+            )
+
+    if contained:
+        component_filter.where("c.specifications @> %s", Json(contained))
+
+
+def _jsonpath_top_level(text):
+    """Выражение jsonpath без строк и содержимого скобок: там, где операции
+    относятся к фильтрам и индексам, а не ко всему выражению"""
+    result = []
+    depth = 0
+    quoted = False
+    escaped = False
+    for char in text:
+        if quoted:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                quoted = False
+            result.append(" ")
+        elif char == '"':
+            quoted = True
+            result.append(" ")
+        elif char in "([":
+            depth += 1
+            result.append(" ")
+        elif char in ")]":
+            depth = max(depth - 1, 0)
+            result.append(" ")
+        else:
+            result.append(char if depth == 0 else " ")
+    return "".join(result)
+
+
+def _json_value(text):
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    lowered = text.casefold()
+    if lowered in ("true", "да"):
+        return True
+    if lowered in ("false", "нет"):
+        return False
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
@@ -0,0 +1,93 @@
+from dataclasses import fields, replace
+
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QAbstractItemView, QComboBox, QHeaderView
+)
+from PyQt6.QtGui import QColor
+
+from repository import merge_changes
+
+
+HEADERS = ["Поле", "При открытии", "Ваше", "В базе", "Сохранить"]
+
+# Подсветка полей, которые изменили обе стороны
+CONFLICT_COLOR = QColor(255, 220, 220)
+
+
+class ConflictDialog(QDialog):
+    """Слияние изменений записи, которую после открытия изменил кто-то другой
+
+    Показывает поля, отличающиеся от значений при открытии формы. Для
+    каждого можно выбрать, чье значение сохранить: по умолчанию берется
+    измененное одной стороной, а при изменении обеими - значение из формы.
+    Результат exec(): SAVE - сохранить merged(), DISCARD - заменить
+    форму данными из базы, Rejected - вернуться к редактированию.
+    """
+
+    SAVE = 1
+    DISCARD = 2
+
+    def __init__(self, title, labels, base, mine, theirs, display, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(800, 300)
+        self.mine = mine
+        self.theirs = theirs
+        merged, conflicts = merge_changes(base, mine, theirs)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        message = "Запись изменена другим пользователем после того, как вы ее открыли."
+        if conflicts:
+            message += " Выделены поля, которые изменены и в форме, и в базе."
+        layout.addWidget(QLabel(message))
+
+        self.choices = {}
+        changed = [
+            field.name for field in fields(base)
+            if getattr(mine, field.name) != getattr(base, field.name)
+            or getattr(theirs, field.name) != getattr(base, field.name)
+        ]
+        self.table = QTableWidget(len(changed), len(HEADERS))
+        self.table.setHorizontalHeaderLabels(HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        for row, name in enumerate(changed):
+            values = [labels[name]] + [display(name, getattr(record, name)) for record in (base, mine, theirs)]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if name in conflicts:
+                    item.setBackground(CONFLICT_COLOR)
+                self.table.setItem(row, column, item)
+            choice = QComboBox()
+            choice.addItem("Ваше", False)
+            choice.addItem("Из базы", True)
+            theirs_chosen = getattr(merged, name) == getattr(theirs, name) and name not in conflicts
+            choice.setCurrentIndex(1 if theirs_chosen else 0)
+            self.table.setCellWidget(row, len(HEADERS) - 1, choice)
+            self.choices[name] = choice
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        layout.addLayout(buttons_layout)
+        buttons_layout.addStretch()
+        save_btn = QPushButton("Сохранить")
+        save_btn.setDefault(True)
+        save_btn.clicked.connect(lambda: self.done(self.SAVE))
+        buttons_layout.addWidget(save_btn)
+        discard_btn = QPushButton("Отменить мои изменения")
+        discard_btn.clicked.connect(lambda: self.done(self.DISCARD))
+        buttons_layout.addWidget(discard_btn)
+        cancel_btn = QPushButton("Продолжить редактирование")
+        cancel_btn.clicked.connect(self.reject)
+        buttons_layout.addWidget(cancel_btn)
+
+    def merged(self):
+        """Поля записи с выбранными значениями"""
+        record = replace(self.mine)
+        for name, choice in self.choices.items():
+            if choice.currentData():
+                setattr(record, name, getattr(self.theirs, name))
+        return record
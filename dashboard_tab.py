@@ -0,0 +1,197 @@
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QMessageBox
+)
+from PyQt6.QtCore import Qt, QRectF
+from PyQt6.QtGui import QPainter, QColor
+
+from choice_box import ChoiceBox
+from queries import DEVICE_STATUSES
+from references import REFERENCES
+from repository import DashboardRepository
+
+
+STATUS_NAMES = dict(DEVICE_STATUSES)
+
+MONTH_NAMES = ["янв", "фев", "мар", "апр", "май", "июн", "июл", "авг", "сен", "окт", "ноя", "дек"]
+
+
+def format_money(value):
+    return f"{value:,.0f}".replace(",", " ")
+
+
+class BarChart(QWidget):
+    """Простой столбчатый график: пары (подпись, значение)
+
+    Горизонтальные полосы с подписями слева подходят для категорий,
+    вертикальные столбцы - для рядов по времени.
+    """
+
+    BAR_COLOR = QColor(70, 130, 180)
+
+    def __init__(self, title, vertical=False, value_format=str, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.vertical = vertical
+        self.value_format = value_format
+        self.items = []
+        self.setMinimumSize(300, 200)
+
+    def set_items(self, items):
+        self.items = list(items)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        metrics = painter.fontMetrics()
+        line = metrics.height()
+        area = QRectF(self.rect()).adjusted(4, 4, -4, -4)
+
+        painter.drawText(area.adjusted(0, 0, 0, -area.height() + line), Qt.AlignmentFlag.AlignLeft, self.title)
+        area.adjust(0, line + 4, 0, 0)
+        if not self.items:
+            painter.drawText(area, Qt.AlignmentFlag.AlignCenter, "Нет данных")
+            return
+
+        largest = float(max(value for _, value in self.items)) or 1.0
+        if self.vertical:
+            self._paint_columns(painter, area, line, largest)
+        else:
+            self._paint_bars(painter, area, metrics, largest)
+
+    def _paint_bars(self, painter, area, metrics, largest):
+        label_width = min(max(metrics.horizontalAdvance(label) for label, _ in self.items) + 8,
+                          area.width() / 3)
+        value_width = max(metrics.horizontalAdvance(self.value_format(value)) for _, value in self.items) + 8
+        step = area.height() / len(self.items)
+        bar_width = area.width() - label_width - value_width
+        for i, (label, value) in enumerate(self.items):
+            top = area.top() + i * step
+            text = metrics.elidedText(label, Qt.TextElideMode.ElideRight, int(label_width) - 4)
+            painter.drawText(QRectF(area.left(), top, label_width - 4, step),
+                             Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight, text)
+            width = bar_width * float(value) / largest
+            painter.fillRect(QRectF(area.left() + label_width, top + step * 0.15, width, step * 0.7),
+                             self.BAR_COLOR)
+            painter.drawText(QRectF(area.left() + label_width + width + 4, top, value_width, step),
+                             Qt.AlignmentFlag.AlignVCenter, self.value_format(value))
+
+    def _paint_columns(self, painter, area, line, largest):
+        step = area.width() / len(self.items)
+        height = area.height() - 2 * line
+        # Подписей столько, сколько помещается без наложения
+        label_every = max(1, int(painter.fontMetrics().horizontalAdvance("00 ммм") / step) + 1)
+        for i, (label, value) in enumerate(self.items):
+            left = area.left() + i * step
+            column = height * float(value) / largest
+            top = area.top() + line + height - column
+            painter.fillRect(QRectF(left + step * 0.1, top, step * 0.8, column), self.BAR_COLOR)
+            if value and step >= painter.fontMetrics().horizontalAdvance(self.value_format(value)):
+                painter.drawText(QRectF(left, top - line, step, line),
+                                 Qt.AlignmentFlag.AlignHCenter, self.value_format(value))
+            if i % label_every == 0:
+                painter.drawText(QRectF(left, area.bottom() - line, step * label_every, line),
+                                 Qt.AlignmentFlag.AlignLeft, label)
+
+
+class DashboardTab(QWidget):
+    """Вкладка с показателями оборудования по сводным таблицам"""
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        # Показатели перечитываются при показе вкладки, если устройства менялись
+        self.stale = True
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        filter_layout = QHBoxLayout()
+        layout.addLayout(filter_layout)
+        filter_layout.addWidget(QLabel("Франшиза:"))
+        self.franchise_filter = ChoiceBox("Все франшизы")
+        self.franchise_filter.activated.connect(self.load_dashboard)
+        filter_layout.addWidget(self.franchise_filter)
+        self.reload_btn = QPushButton("Обновить")
+        self.reload_btn.clicked.connect(self.load)
+        filter_layout.addWidget(self.reload_btn)
+        filter_layout.addStretch()
+
+        self.totals_label = QLabel()
+        layout.addWidget(self.totals_label)
+
+        charts = QGridLayout()
+        layout.addLayout(charts, 1)
+        self.status_chart = BarChart("Устройства по статусам")
+        charts.addWidget(self.status_chart, 0, 0)
+        self.type_chart = BarChart("Устройства по типам")
+        charts.addWidget(self.type_chart, 0, 1)
+        self.value_chart = BarChart("Стоимость по франшизам", value_format=format_money)
+        charts.addWidget(self.value_chart, 0, 2)
+        self.warranty_chart = BarChart("Окончание гарантии работающих устройств по месяцам", vertical=True)
+        charts.addWidget(self.warranty_chart, 1, 0, 1, 2)
+        self.changes_chart = BarChart("Изменения устройств по дням (вся база)", vertical=True)
+        charts.addWidget(self.changes_chart, 1, 2)
+
+    def invalidate(self):
+        """Отметка о том, что устройства или франшизы изменились"""
+        self.stale = True
+        if self.isVisible():
+            self.load()
+
+    def load_if_stale(self):
+        if self.stale:
+            self.load()
+
+    def load(self):
+        """Загрузка списка франшиз и показателей"""
+        self.stale = False
+
+        def fetch_choices(connection):
+            return REFERENCES.get(connection, "franchise")["franchise"]
+
+        self.executor.submit(
+            fetch_choices, on_result=self.franchise_filter.set_references,
+            on_error=lambda e: self.show_error("Ошибка при загрузке франшиз", e),
+            key="dashboard_choices"
+        )
+        self.load_dashboard()
+
+    def load_dashboard(self):
+        """Загрузка показателей всех устройств или выбранной франшизы с дочерними"""
+        franchise_id = self.franchise_filter.currentData()
+
+        def fetch(connection):
+            dashboard = DashboardRepository(connection).load(franchise_id)
+            connection.rollback()
+            return dashboard
+
+        self.executor.submit(
+            fetch, on_result=self.fill,
+            on_error=lambda e: self.show_error("Ошибка при загрузке показателей", e),
+            key="dashboard"
+        )
+
+    def fill(self, dashboard):
+        soon = sum(count for _, count in dashboard.warranty_by_month[:3])
+        self.totals_label.setText(
+            f"Устройств: {dashboard.device_count}    "
+            f"Стоимость: {format_money(dashboard.total_price)}    "
+            f"Гарантия истекает в ближайшие 3 месяца: {soon}    "
+            f"Уже истекла: {dashboard.warranty_expired}"
+        )
+        self.status_chart.set_items(
+            (STATUS_NAMES.get(status, "Без статуса"), count) for status, count in dashboard.by_status
+        )
+        self.type_chart.set_items(dashboard.by_type)
+        self.value_chart.title = "Стоимость по " + (
+            "франшизам" if self.franchise_filter.currentData() is None else "локациям"
+        )
+        self.value_chart.set_items(dashboard.value_by_unit)
+        self.warranty_chart.set_items(
+            (f"{MONTH_NAMES[month.month - 1]} {month:%y}", count) for month, count in dashboard.warranty_by_month
+        )
+        self.changes_chart.set_items((f"{day:%d.%m}", count) for day, count in dashboard.changes_by_day)
+
+    def show_error(self, message, error):
+        QMessageBox.critical(self, "Ошибка", f"{message}:\n{str(error)}")
@@ -0,0 +1,190 @@
+import getpass
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import psycopg2
+import psycopg2.pool
+
+from diagnostics import InstrumentedCursor
+from snapshot import default_snapshot_path
+
+
+@dataclass
+class DatabaseSettings:
+    """Параметры подключения к PostgreSQL"""
+
+    dsn: str = "dbname=fcas user=postgres password=postgres host=localhost"
+    # Сколько простаивающих соединений держать открытыми
+    min_connections: int = 4
+    max_connections: int = 8
+    # Таймаут выполнения запроса на сервере, мс (0 - без ограничения)
+    statement_timeout: int = 30000
+    # Соединение, простаивавшее дольше этого времени, проверяется перед выдачей, с
+    health_check_interval: float = 60.0
+    # Сколько ждать свободного соединения, прежде чем сообщить об ошибке, с
+    acquire_timeout: float = 30.0
+    # Имя пользователя для истории изменений (настройка сеанса fcas.user)
+    user_name: str = ""
+    # Сколько ждать ответа сервера при подключении, с
+    connect_timeout: int = 10
+    # Файл локального снимка франшиз, локаций и справочников
+    snapshot_path: str = ""
+    # Журнал запросов в JSON: путь к файлу, "-" - stderr, пусто - выключен
+    query_log: str = ""
+    # В журнал попадают запросы не быстрее этого, мс
+    slow_query_ms: float = 0.0
+    # Региональные базы для общего просмотра: "имя=строка подключения; ..."
+    federation: str = ""
+    # Сколько ждать ответа каждой региональной базы, с
+    federation_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls):
+        """Чтение настроек из переменных окружения FCAS_*"""
+        defaults = cls()
+        return cls(
+            dsn=os.environ.get("FCAS_DSN", defaults.dsn),
+            min_connections=int(os.environ.get("FCAS_POOL_MIN", defaults.min_connections)),
+            max_connections=int(os.environ.get("FCAS_POOL_MAX", defaults.max_connections)),
+            statement_timeout=int(os.environ.get("FCAS_STATEMENT_TIMEOUT", defaults.statement_timeout)),
+            health_check_interval=float(
+                os.environ.get("FCAS_HEALTH_CHECK_INTERVAL", defaults.health_check_interval)
+            ),
+            acquire_timeout=float(os.environ.get("FCAS_ACQUIRE_TIMEOUT", defaults.acquire_timeout)),
+            user_name=os.environ.get("FCAS_USER") or _system_user(),
+            connect_timeout=int(os.environ.get("FCAS_CONNECT_TIMEOUT", defaults.connect_timeout)),
+            snapshot_path=os.environ.get("FCAS_SNAPSHOT") or default_snapshot_path(),
+            query_log=os.environ.get("FCAS_QUERY_LOG", defaults.query_log),
+            slow_query_ms=float(os.environ.get("FCAS_SLOW_QUERY_MS", defaults.slow_query_ms)),
+            federation=os.environ.get("FCAS_FEDERATION", defaults.federation),
+            federation_timeout=float(os.environ.get("FCAS_FEDERATION_TIMEOUT", defaults.federation_timeout)),
+        )
+
+
+def _system_user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с проверкой и восстановлением соединений
+
+    В отличие от ThreadedConnectionPool, при исчерпании пула getconn
+    ждет освобождения соединения, а не сразу завершается ошибкой.
+    Соединения открываются при первом запросе, а не при создании пула,
+    поэтому окно показывается сразу, даже если сервер недоступен.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._options = session_options(settings)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(settings.max_connections)
+        # Время последнего использования соединений
+        self._last_used = {}
+
+    def getconn(self):
+        """Выдача рабочего соединения из пула"""
+        if not self._slots.acquire(timeout=self.settings.acquire_timeout):
+            raise psycopg2.pool.PoolError("Нет свободных соединений с БД")
+        try:
+            return self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        """Возврат соединения в пул; разорванное соединение закрывается"""
+        close = close or connection.closed != 0
+        self._last_used[id(connection)] = time.monotonic()
+        try:
+            try:
+                # Пул откатывает незавершенную транзакцию соединения
+                self._pool.putconn(connection, close=close)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                close = True
+                self._pool.putconn(connection, close=True)
+        finally:
+            if close:
+                self._last_used.pop(id(connection), None)
+            self._slots.release()
+
+    def closeall(self):
+        if self._pool is not None:
+            self._pool.closeall()
+
+    def _connections(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # При недоступном сервере пул не создается, следующий
+                # запрос попробует подключиться снова
+                self._pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.settings.min_connections, self.settings.max_connections,
+                    self.settings.dsn, application_name="fcas", options=self._options,
+                    connect_timeout=self.settings.connect_timeout,
+                    # Все запросы программы попадают в статистику
+                    cursor_factory=InstrumentedCursor
+                )
+                # Соединения, открытые пулом при создании, тоже
+                # подлежат проверке после простоя
+                now = time.monotonic()
+                self._last_used.update({id(connection): now for connection in self._pool._pool})
+            return self._pool
+
+    def _checkout(self):
+        pool = self._connections()
+        while True:
+            connection = pool.getconn()
+            if self._is_alive(connection):
+                return connection
+            # Соединение разорвано: выбрасываем его, пул откроет новое
+            self._last_used.pop(id(connection), None)
+            pool.putconn(connection, close=True)
+
+    def _is_alive(self, connection):
+        if connection.closed:
+            return False
+
+        last_used = self._last_used.get(id(connection))
+        if last_used is None or time.monotonic() - last_used < self.settings.health_check_interval:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+
+def session_options(settings):
+    """Параметр options подключения: таймаут запросов и автор изменений"""
+    options = f"-c statement_timeout={settings.statement_timeout}"
+    if settings.user_name:
+        options += f" -c fcas.user={_escape_option(settings.user_name)}"
+    return options
+
+
+def connect(settings, application_name="fcas"):
+    """Отдельное соединение с теми же настройками сеанса, что у пула"""
+    return psycopg2.connect(
+        settings.dsn, application_name=application_name, options=session_options(settings),
+        connect_timeout=settings.connect_timeout, cursor_factory=InstrumentedCursor
+    )
+
+
+def _escape_option(value):
+    # В параметре options пробелы и обратная косая черта экранируются
+    return value.replace("\\", "\\\\").replace(" ", "\\ ")
+
+
+def is_connection_error(error):
+    """Ошибка, после которой соединение нельзя возвращать в пул"""
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)) \
+        and not isinstance(error, psycopg2.extensions.QueryCanceledError)
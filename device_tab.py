@@ -0,0 +1,339 @@
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+    QComboBox, QTableView, QAbstractItemView, QMessageBox
+)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+
+from choice_box import ChoiceBox
+from history_dialog import device_history, location_history
+from models import LazyQueryModel
+from queries import DEVICE_STATUSES
+from references import REFERENCES
+from repository import DeviceRepository, LocationRepository, device_query
+
+
+# Задержка перед поиском, пока пользователь печатает, мс
+SEARCH_DELAY = 300
+
+
+class DeviceTab(QWidget):
+    """Вкладка учета оборудования с групповыми операциями над устройствами"""
+
+    # Устройства перемещены или изменен их статус
+    devicesChanged = pyqtSignal()
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        # Справочники и таблица перезагружаются при показе вкладки,
+        # если франшизы или локации менялись
+        self.stale = True
+        self.select_all_pending = False
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        # Поиск и фильтры
+        filter_layout = QHBoxLayout()
+        layout.addLayout(filter_layout)
+
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Поиск по названию или инвентарному номеру")
+        filter_layout.addWidget(self.search)
+
+        self.franchise_filter = ChoiceBox("Все франшизы")
+        self.franchise_filter.activated.connect(self.franchise_filter_changed)
+        filter_layout.addWidget(self.franchise_filter)
+
+        self.location_filter = QComboBox()
+        self.location_filter.addItem("Все локации", None)
+        self.location_filter.setEnabled(False)
+        self.location_filter.activated.connect(self.load_devices)
+        filter_layout.addWidget(self.location_filter)
+
+        self.status_filter = QComboBox()
+        self.status_filter.addItem("Все статусы", None)
+        for status, name in DEVICE_STATUSES:
+            self.status_filter.addItem(name, status)
+        self.status_filter.activated.connect(self.load_devices)
+        filter_layout.addWidget(self.status_filter)
+
+        self.type_filter = ChoiceBox("Все типы")
+        self.type_filter.activated.connect(self.load_devices)
+        filter_layout.addWidget(self.type_filter)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.load_devices)
+        self.search.textChanged.connect(self.search_timer.start)
+
+        # Таблица с устройствами
+        self.model = LazyQueryModel(
+            ["ID", "Инв. номер", "Название", "Тип", "Франшиза", "Локация", "Статус"],
+            self.executor
+        )
+        self.model.setObjectName("devices")
+        self.model.error.connect(
+            lambda e: self.show_error("Ошибка при загрузке устройств", e)
+        )
+        self.model.loaded.connect(self.all_loaded)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.selectionModel().selectionChanged.connect(self.selection_changed)
+        layout.addWidget(self.table)
+
+        # Групповые операции над выделенными устройствами
+        bulk_layout = QHBoxLayout()
+        layout.addLayout(bulk_layout)
+
+        self.select_all_btn = QPushButton("Выделить все")
+        self.select_all_btn.clicked.connect(self.select_all)
+        bulk_layout.addWidget(self.select_all_btn)
+
+        self.selected_label = QLabel("Выбрано: 0")
+        bulk_layout.addWidget(self.selected_label)
+        bulk_layout.addStretch()
+
+        self.target_status = QComboBox()
+        for status, name in DEVICE_STATUSES:
+            self.target_status.addItem(name, status)
+        bulk_layout.addWidget(self.target_status)
+
+        self.change_status_btn = QPushButton("Изменить статус")
+        self.change_status_btn.setEnabled(False)
+        self.change_status_btn.clicked.connect(self.change_status)
+        bulk_layout.addWidget(self.change_status_btn)
+
+        self.target_franchise = ChoiceBox()
+        self.target_franchise.activated.connect(self.load_target_locations)
+        bulk_layout.addWidget(self.target_franchise)
+
+        self.target_location = QComboBox()
+        bulk_layout.addWidget(self.target_location)
+
+        self.move_btn = QPushButton("Переместить")
+        self.move_btn.setEnabled(False)
+        self.move_btn.clicked.connect(self.move_devices)
+        bulk_layout.addWidget(self.move_btn)
+
+        buttons_layout = QHBoxLayout()
+        layout.addLayout(buttons_layout)
+
+        self.reload_btn = QPushButton("Перезагрузить")
+        self.reload_btn.clicked.connect(self.load)
+        buttons_layout.addWidget(self.reload_btn)
+
+        self.device_history_btn = QPushButton("История устройства")
+        self.device_history_btn.setEnabled(False)
+        self.device_history_btn.clicked.connect(self.show_device_history)
+        buttons_layout.addWidget(self.device_history_btn)
+
+        self.location_history_btn = QPushButton("История локации")
+        self.location_history_btn.setEnabled(False)
+        self.location_history_btn.clicked.connect(self.show_location_history)
+        buttons_layout.addWidget(self.location_history_btn)
+        buttons_layout.addStretch()
+
+    def invalidate(self):
+        """Отметка о том, что франшизы или локации изменились"""
+        self.stale = True
+        if self.isVisible():
+            self.load()
+
+    def load_if_stale(self):
+        if self.stale:
+            self.load()
+
+    def load(self):
+        """Загрузка справочников и списка устройств"""
+        self.stale = False
+        self.load_choices()
+        self.load_devices()
+
+    def load_choices(self):
+        """Франшизы и типы устройств для фильтров из общего кэша"""
+        def fetch_choices(connection):
+            return REFERENCES.get(connection, "franchise", "device_type")
+
+        self.executor.submit(
+            fetch_choices, on_result=self.fill_choices,
+            on_error=lambda e: self.show_error("Ошибка при загрузке справочников", e),
+            key="device_choices"
+        )
+
+    def fill_choices(self, choices):
+        """Смена списков франшиз и типов с сохранением выбора"""
+        franchise_id = self.franchise_filter.currentData()
+        self.franchise_filter.set_references(choices["franchise"])
+        self.target_franchise.set_references(choices["franchise"])
+        self.type_filter.set_references(choices["device_type"])
+        self.load_target_locations()
+
+        filter_index = self.franchise_filter.find_id(franchise_id)
+        if franchise_id is not None:
+            self.load_location_choices(self.location_filter, "Все локации", franchise_id)
+            if filter_index < 0:
+                # Франшизу из фильтра удалили
+                self.franchise_filter_changed()
+
+    def load_location_choices(self, combo, first_item, franchise_id):
+        """Загрузка локаций франшизы в комбобокс с сохранением выбора"""
+        def fetch(connection):
+            return LocationRepository(connection).choices(franchise_id)
+
+        def fill(locations):
+            location_id = combo.currentData()
+            combo.clear()
+            if first_item is not None:
+                combo.addItem(first_item, None)
+            for choice_id, name in locations:
+                combo.addItem(name, choice_id)
+            combo.setCurrentIndex(max(combo.findData(location_id), 0))
+            combo.setEnabled(True)
+
+        self.executor.submit(
+            fetch, on_result=fill,
+            on_error=lambda e: self.show_error("Ошибка при загрузке локаций", e),
+            key=f"device_locations_{id(combo)}"
+        )
+
+    def franchise_filter_changed(self):
+        """Смена франшизы в фильтре: список локаций - только ее"""
+        franchise_id = self.franchise_filter.currentData()
+        self.location_filter.clear()
+        self.location_filter.addItem("Все локации", None)
+        self.location_filter.setEnabled(False)
+        if franchise_id is not None:
+            self.load_location_choices(self.location_filter, "Все локации", franchise_id)
+        self.load_devices()
+
+    def load_target_locations(self):
+        """Загрузка локаций франшизы, в которую перемещаются устройства"""
+        self.target_location.clear()
+        self.target_location.setEnabled(False)
+        franchise_id = self.target_franchise.currentData()
+        if franchise_id is not None:
+            self.load_location_choices(self.target_location, None, franchise_id)
+
+    def load_devices(self):
+        """Загрузка таблицы устройств с учетом поиска и фильтров"""
+        self.select_all_pending = False
+        location_id = self.location_filter.currentData()
+        query = device_query(
+            self.search.text().strip(), self.franchise_filter.currentData(), location_id,
+            self.status_filter.currentData(), self.type_filter.currentData()
+        )
+        self.location_history_btn.setEnabled(location_id is not None)
+
+        # Строки таблицы подгружаются моделью постранично при прокрутке
+        self.model.reset(query)
+
+    def select_all(self):
+        """Выделение всех устройств выборки, включая еще не прочитанные"""
+        self.select_all_pending = True
+        self.model.fetch_all()
+
+    def all_loaded(self):
+        if self.select_all_pending:
+            self.select_all_pending = False
+            self.table.selectAll()
+
+    def selection_changed(self):
+        count = len(self.table.selectionModel().selectedRows())
+        self.selected_label.setText(f"Выбрано: {count}")
+        self.change_status_btn.setEnabled(count > 0)
+        self.move_btn.setEnabled(count > 0)
+        self.device_history_btn.setEnabled(count == 1)
+
+    def selected_device_ids(self):
+        """ID выделенных устройств"""
+        return [self.model.row(index.row())[0] for index in self.table.selectionModel().selectedRows()]
+
+    def change_status(self):
+        """Смена статуса выделенных устройств одним запросом"""
+        device_ids = self.selected_device_ids()
+        if not device_ids:
+            return
+        status = self.target_status.currentData()
+
+        def update(connection):
+            rows = DeviceRepository(connection).set_status(device_ids, status)
+            connection.commit()
+            return rows
+
+        self.executor.submit(
+            update, on_result=self.devices_updated,
+            on_error=lambda e: self.show_error("Ошибка при смене статуса", e)
+        )
+
+    def move_devices(self):
+        """Перемещение выделенных устройств в локацию одним запросом"""
+        device_ids = self.selected_device_ids()
+        location_id = self.target_location.currentData()
+        if not device_ids:
+            return
+        if location_id is None:
+            QMessageBox.warning(self, "Ошибка", "Необходимо выбрать локацию!")
+            return
+
+        reply = QMessageBox.question(
+            self, 'Подтверждение',
+            f'Переместить выбранные устройства ({len(device_ids)}) в локацию '
+            f'"{self.target_location.currentText()}"?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        def update(connection):
+            rows = DeviceRepository(connection).move(device_ids, location_id)
+            connection.commit()
+            return rows
+
+        self.executor.submit(
+            update, on_result=self.devices_updated,
+            on_error=lambda e: self.show_error("Ошибка при перемещении устройств", e)
+        )
+
+    def apply_changes(self, franchise_ids, location_ids, device_ids):
+        """Применение изменений, сделанных в других окнах"""
+        # Строки устройств содержат названия франшиз и локаций
+        device_ids = set(device_ids) | set(self.model.keys(
+            lambda row: row[8] in franchise_ids or row[9] in location_ids
+        ))
+        self.model.refresh_rows(device_ids)
+        if franchise_ids or location_ids:
+            if self.isVisible():
+                self.load_choices()
+            else:
+                self.stale = True
+
+    def show_device_history(self):
+        """Хронология изменений выделенного устройства"""
+        rows = self.table.selectionModel().selectedRows()
+        if len(rows) != 1:
+            return
+        device_id, inventory_number = self.model.row(rows[0].row())[:2]
+        device_history(self.executor, device_id, inventory_number or device_id, self).exec()
+
+    def show_location_history(self):
+        """Хронология изменений устройств локации из фильтра"""
+        location_id = self.location_filter.currentData()
+        if location_id is not None:
+            location_history(self.executor, location_id, self.location_filter.currentText(), self).exec()
+
+    def devices_updated(self, rows):
+        """Обновление измененных строк таблицы без перезагрузки"""
+        for row in rows:
+            self.model.update_row(row)
+        QMessageBox.information(self, "Успех", f"Изменено устройств: {len(rows)}")
+        if rows:
+            self.devicesChanged.emit()
+
+    def show_error(self, message, error):
+        QMessageBox.critical(self, "Ошибка", f"{message}:\n{str(error)}")
@@ -0,0 +1,298 @@
+import datetime
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+import psycopg2.extensions
+
+
+# Верхние границы корзин гистограммы времени выполнения, мс;
+# последняя корзина - все, что дольше
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# Сколько последних замеров хранится для каждого запроса
+WINDOW_SIZE = 500
+
+# Сколько разных запросов запоминается; редкие вытесняются
+MAX_STATEMENTS = 1000
+
+# Запросы, которые можно выполнить под EXPLAIN
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "VALUES", "TABLE", "EXECUTE")
+
+# Тексты подготовленных запросов по имени (PreparedStatement): для
+# EXPLAIN EXECUTE запрос подготавливается, если соединение его еще не знает
+PREPARED = {}
+
+EXECUTE_RE = re.compile(r"EXECUTE\s+(\w+)", re.IGNORECASE)
+
+_current = threading.local()
+
+
+def set_caller(caller):
+    """Имя вызывающего кода для запросов текущего потока, None - определять по стеку"""
+    _current.caller = caller
+
+
+def _caller_from_stack():
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__") == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return None
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__')}.{code.co_qualname.replace('.<locals>', '')}"
+
+
+def register_prepared(name, sql):
+    """Запоминание текста подготовленного запроса для EXPLAIN EXECUTE"""
+    PREPARED[name] = sql
+
+
+def normalize_sql(sql):
+    """Текст запроса в одну строку: одинаковые запросы с разными параметрами совпадают"""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class StatementStats:
+    """Статистика одного запроса одного вызывающего кода
+
+    Счетчики накапливаются с запуска, а процентили и гистограмма
+    считаются по последним WINDOW_SIZE замерам.
+    """
+
+    def __init__(self, caller, sql):
+        self.caller = caller
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.window = deque(maxlen=WINDOW_SIZE)
+        # Последний выполненный текст с подставленными параметрами - для EXPLAIN
+        self.last_query = None
+        self.last_at = None
+
+    def record(self, elapsed_ms, rows, query, failed):
+        self.count += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        self.window.append(elapsed_ms)
+        if query is not None:
+            self.last_query = query
+        self.last_at = time.time()
+
+    def copy(self):
+        copied = StatementStats(self.caller, self.sql)
+        copied.__dict__.update(self.__dict__)
+        copied.window = deque(self.window, maxlen=WINDOW_SIZE)
+        return copied
+
+    @property
+    def prepared_name(self):
+        """Имя подготовленного запроса, если это EXECUTE известного запроса"""
+        match = EXECUTE_RE.match(self.sql)
+        return match.group(1) if match and match.group(1) in PREPARED else None
+
+    @property
+    def query_text(self):
+        """Текст запроса; для EXECUTE - текст подготовленного запроса"""
+        name = self.prepared_name
+        return PREPARED[name] if name is not None else self.sql
+
+    @property
+    def explainable(self):
+        command = self.sql.split(" ", 1)[0].upper()
+        if command == "EXECUTE" and self.prepared_name is None:
+            return False
+        return self.last_query is not None and command in EXPLAINABLE
+
+    def percentile(self, fraction):
+        if not self.window:
+            return 0.0
+        ordered = sorted(self.window)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def histogram(self):
+        """Число замеров окна по корзинам HISTOGRAM_BOUNDS"""
+        counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for elapsed_ms in self.window:
+            position = 0
+            while position < len(HISTOGRAM_BOUNDS) and elapsed_ms > HISTOGRAM_BOUNDS[position]:
+                position += 1
+            counts[position] += 1
+        return counts
+
+    def as_dict(self):
+        return {
+            "caller": self.caller,
+            "sql": self.sql,
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "histogram": dict(zip([f"<={bound}" for bound in HISTOGRAM_BOUNDS] + ["more"], self.histogram())),
+        }
+
+
+class QueryStats:
+    """Статистика выполненных запросов всего процесса
+
+    Запросы группируются по вызывающему коду и тексту без параметров.
+    При включенном журнале каждый запрос дольше порога записывается
+    строкой JSON в логгер fcas.queries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}
+        self.logger = logging.getLogger("fcas.queries")
+        self.logger.propagate = False
+        self.slow_ms = 0.0
+        self.log_enabled = False
+
+    def configure_log(self, target, slow_ms=0.0):
+        """Журнал запросов: путь к файлу или "-" для stderr, пустая строка - выключен"""
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+        self.slow_ms = slow_ms
+        self.log_enabled = bool(target)
+        if not target:
+            return
+        handler = logging.StreamHandler(sys.stderr) if target == "-" else \
+            logging.FileHandler(target, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+
+    def record(self, sql, elapsed_ms, rows, query=None, error=None):
+        sql = normalize_sql(sql)
+        caller = getattr(_current, "caller", None) or _caller_from_stack() or "?"
+        with self._lock:
+            statement = self._statements.get((caller, sql))
+            if statement is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    # Вытесняем запрос, который дольше всех не выполнялся
+                    oldest = min(self._statements, key=lambda key: self._statements[key].last_at)
+                    del self._statements[oldest]
+                statement = self._statements[(caller, sql)] = StatementStats(caller, sql)
+            statement.record(elapsed_ms, rows, query, error is not None)
+
+        if self.log_enabled and elapsed_ms >= self.slow_ms:
+            self.logger.info(json.dumps({
+                "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "caller": caller,
+                "sql": sql,
+                "ms": round(elapsed_ms, 3),
+                "rows": rows,
+                "error": None if error is None else type(error).__name__,
+            }, ensure_ascii=False))
+
+    def statements(self):
+        """Копии статистики запросов, самые затратные по суммарному времени первыми"""
+        with self._lock:
+            statements = [statement.copy() for statement in self._statements.values()]
+        return sorted(statements, key=lambda statement: statement.total_ms, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+    def export(self, path):
+        """Запись статистики в JSON"""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "histogram_bounds_ms": HISTOGRAM_BOUNDS,
+                "statements": [statement.as_dict() for statement in self.statements()],
+            }, file, ensure_ascii=False, indent=2)
+
+
+# Статистика всех соединений пула
+STATS = QueryStats()
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """Курсор, замеряющий каждый запрос
+
+    Пул создает соединения с этим курсором, поэтому замеряются все
+    запросы программы без изменений в местах их вызова.
+    """
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().execute(query, vars)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            STATS.record(
+                query if isinstance(query, (str, bytes)) else self.query or b"",
+                (time.perf_counter() - started) * 1000, self.rowcount, self.query, error
+            )
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().executemany(query, vars_list)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            STATS.record(query if isinstance(query, (str, bytes)) else b"",
+                         (time.perf_counter() - started) * 1000, self.rowcount, None, error)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().copy_expert(sql, file, size)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            STATS.record(sql if isinstance(sql, (str, bytes)) else b"",
+                         (time.perf_counter() - started) * 1000, self.rowcount, None, error)
+
+
+def explain(connection, statement):
+    """План последнего выполнения запроса с EXPLAIN (ANALYZE, BUFFERS)
+
+    Запрос действительно выполняется, поэтому транзакция всегда
+    откатывается: изменяющие запросы ничего не меняют. Для EXECUTE
+    запрос подготавливается на этом соединении, если его там еще нет,
+    и после плана освобождается, чтобы не мешать PreparedStatement.
+    """
+    # Обычный курсор: сам EXPLAIN в статистику не попадает
+    with connection.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+        prepared = None
+        try:
+            name = statement.prepared_name
+            if name is not None:
+                cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (name,))
+                if cursor.fetchone() is None:
+                    cursor.execute(f"PREPARE {name} AS {PREPARED[name]}")
+                    prepared = name
+            cursor.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + statement.last_query)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            connection.rollback()
+            if prepared is not None:
+                cursor.execute(f"DEALLOCATE {prepared}")
+                connection.rollback()
@@ -0,0 +1,167 @@
+import re
+
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+    QAbstractItemView, QPlainTextEdit, QSplitter, QFileDialog, QMessageBox
+)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFont
+
+from diagnostics import HISTOGRAM_BOUNDS, STATS, explain
+
+
+HEADERS = ["Кто вызывал", "Запрос", "Вызовов", "Ошибок", "Всего, мс", "Среднее, мс",
+           "p95, мс", "Макс., мс", "Строк"]
+
+# Ширина самого длинного столбца гистограммы, символов
+HISTOGRAM_WIDTH = 40
+
+# Запрос изменяет данные: при EXPLAIN ANALYZE он выполняется и откатывается
+MODIFYING_RE = re.compile(r"\b(INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+class DiagnosticsTab(QWidget):
+    """Вкладка со статистикой запросов: самые затратные, гистограмма, план"""
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.statements = []
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        buttons_layout = QHBoxLayout()
+        layout.addLayout(buttons_layout)
+
+        self.refresh_btn = QPushButton("Обновить")
+        self.refresh_btn.clicked.connect(self.load)
+        buttons_layout.addWidget(self.refresh_btn)
+
+        self.reset_btn = QPushButton("Сбросить")
+        self.reset_btn.clicked.connect(self.reset)
+        buttons_layout.addWidget(self.reset_btn)
+
+        self.explain_btn = QPushButton("EXPLAIN ANALYZE")
+        self.explain_btn.setEnabled(False)
+        self.explain_btn.clicked.connect(self.explain_selected)
+        buttons_layout.addWidget(self.explain_btn)
+
+        self.export_btn = QPushButton("Экспорт...")
+        self.export_btn.clicked.connect(self.export)
+        buttons_layout.addWidget(self.export_btn)
+        buttons_layout.addStretch()
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        layout.addWidget(splitter)
+
+        self.table = QTableWidget(0, len(HEADERS))
+        self.table.setHorizontalHeaderLabels(HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.itemSelectionChanged.connect(self.statement_selected)
+        splitter.addWidget(self.table)
+
+        details = QWidget()
+        details_layout = QVBoxLayout()
+        details_layout.setContentsMargins(0, 0, 0, 0)
+        details.setLayout(details_layout)
+        self.details = QPlainTextEdit()
+        self.details.setReadOnly(True)
+        self.details.setFont(QFont("Monospace"))
+        self.details.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        details_layout.addWidget(QLabel("Запрос, гистограмма последних замеров и план:"))
+        details_layout.addWidget(self.details)
+        splitter.addWidget(details)
+
+    def load_if_stale(self):
+        # Статистика меняется с каждым запросом, при показе всегда обновляем
+        self.load()
+
+    def load(self):
+        """Заполнение таблицы текущей статистикой"""
+        self.statements = STATS.statements()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(self.statements))
+        for row, statement in enumerate(self.statements):
+            values = [
+                statement.caller, statement.sql, statement.count, statement.errors,
+                round(statement.total_ms, 1), round(statement.total_ms / statement.count, 2),
+                round(statement.percentile(0.95), 2), round(statement.max_ms, 2), statement.rows,
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                # Числа кладем как числа, чтобы столбцы сортировались по значению
+                item.setData(Qt.ItemDataRole.DisplayRole, value)
+                if column == 1:
+                    item.setToolTip(statement.sql)
+                self.table.setItem(row, column, item)
+            self.table.item(row, 0).setData(Qt.ItemDataRole.UserRole, row)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(4, Qt.SortOrder.DescendingOrder)
+        self.details.clear()
+        self.explain_btn.setEnabled(False)
+
+    def reset(self):
+        STATS.reset()
+        self.load()
+
+    def selected_statement(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.statements[self.table.item(rows[0].row(), 0).data(Qt.ItemDataRole.UserRole)]
+
+    def statement_selected(self):
+        """Показ запроса и гистограммы времени выполнения"""
+        statement = self.selected_statement()
+        self.explain_btn.setEnabled(statement is not None and statement.explainable)
+        if statement is None:
+            self.details.clear()
+            return
+
+        counts = statement.histogram()
+        largest = max(counts) or 1
+        labels = [f"<= {bound} мс" for bound in HISTOGRAM_BOUNDS] + [f"> {HISTOGRAM_BOUNDS[-1]} мс"]
+        lines = [statement.sql, "", f"Последние {sum(counts)} замеров:"]
+        for label, count in zip(labels, counts):
+            bar = "#" * round(count * HISTOGRAM_WIDTH / largest)
+            lines.append(f"{label:>12} {count:>6} {bar}")
+        self.details.setPlainText("\n".join(lines))
+
+    def explain_selected(self):
+        """EXPLAIN (ANALYZE, BUFFERS) последнего выполнения выбранного запроса"""
+        statement = self.selected_statement()
+        if statement is None or not statement.explainable:
+            return
+        if MODIFYING_RE.search(statement.query_text):
+            reply = QMessageBox.question(
+                self, "Подтверждение",
+                "Запрос изменяет данные. Для плана он будет выполнен, а изменения откачены. Продолжить?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+
+        def done(plan):
+            self.statement_selected()
+            self.details.appendPlainText("\nEXPLAIN (ANALYZE, BUFFERS):\n" + plan)
+
+        self.executor.submit(
+            lambda connection: explain(connection, statement), on_result=done,
+            on_error=lambda e: QMessageBox.critical(self, "Ошибка", f"Ошибка при получении плана:\n{str(e)}"),
+            key="explain", caller="DiagnosticsTab.explain"
+        )
+
+    def export(self):
+        """Выгрузка статистики в JSON, например для отправки разработчикам"""
+        path, _ = QFileDialog.getSaveFileName(self, "Файл статистики", "queries.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            STATS.export(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось записать файл:\n{str(e)}")
+            return
+        QMessageBox.information(self, "Успех", f"Статистика записана в {path}")
@@ -0,0 +1,94 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QDoubleSpinBox,
+    QTreeWidget, QTreeWidgetItem, QMessageBox
+)
+
+from repository import SIMILARITY_THRESHOLD, FranchiseRepository, LocationRepository
+
+
+# Что проверять: название, заголовки столбцов, столбец с названием
+# записи для подписи группы и чтение групп
+DUPLICATE_SOURCES = [
+    ("Франшизы", ["ID", "Название", "Адрес", "Активна"], 1,
+     lambda connection, threshold: FranchiseRepository(connection).duplicates(threshold)),
+    ("Локации", ["ID", "Франшиза", "Название", "Адрес", "Активна"], 2,
+     lambda connection, threshold: LocationRepository(connection).duplicates(threshold)),
+]
+
+
+class DuplicatesDialog(QDialog):
+    """Отчет о группах похожих франшиз или локаций во всей таблице"""
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.setWindowTitle("Поиск дубликатов")
+        self.resize(800, 500)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        options_layout = QHBoxLayout()
+        layout.addLayout(options_layout)
+        self.source = QComboBox()
+        for title, headers, label_column, fetch in DUPLICATE_SOURCES:
+            self.source.addItem(title, (headers, label_column, fetch))
+        options_layout.addWidget(self.source)
+
+        options_layout.addWidget(QLabel("Похожесть не ниже:"))
+        self.threshold = QDoubleSpinBox()
+        self.threshold.setRange(0.1, 1.0)
+        self.threshold.setSingleStep(0.05)
+        self.threshold.setValue(SIMILARITY_THRESHOLD)
+        options_layout.addWidget(self.threshold)
+
+        self.search_btn = QPushButton("Найти")
+        self.search_btn.clicked.connect(self.search)
+        options_layout.addWidget(self.search_btn)
+        options_layout.addStretch()
+
+        self.tree = QTreeWidget()
+        layout.addWidget(self.tree)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+    def search(self):
+        """Поиск групп в фоновом потоке одним запросом"""
+        headers, label_column, fetch = self.source.currentData()
+        threshold = self.threshold.value()
+
+        self.search_btn.setEnabled(False)
+        self.status_label.setText("Поиск...")
+        self.executor.submit(
+            lambda connection: fetch(connection, threshold),
+            on_result=lambda rows: self.fill(headers, label_column, rows),
+            on_error=self.search_failed, key="duplicates"
+        )
+
+    def fill(self, headers, label_column, rows):
+        """Группы - узлы дерева, записи группы - их дочерние строки"""
+        self.search_btn.setEnabled(True)
+        self.tree.clear()
+        self.tree.setHeaderLabels(headers)
+        groups = {}
+        for cluster_id, *values in rows:
+            group = groups.get(cluster_id)
+            if group is None:
+                group = QTreeWidgetItem(self.tree)
+                groups[cluster_id] = group
+            values[-1] = "Да" if values[-1] else "Нет"
+            QTreeWidgetItem(group, [str(value) if value is not None else "" for value in values])
+        for group in groups.values():
+            first = group.child(0)
+            group.setText(0, f"Группа: {group.childCount()}")
+            group.setText(label_column, first.text(label_column))
+            group.setExpanded(True)
+        for column in range(len(headers)):
+            self.tree.resizeColumnToContents(column)
+        self.status_label.setText(f"Групп: {len(groups)}, записей в них: {len(rows)}")
+
+    def search_failed(self, error):
+        self.search_btn.setEnabled(True)
+        self.status_label.clear()
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при поиске дубликатов:\n{str(error)}")
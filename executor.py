@@ -0,0 +1,150 @@
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from db import is_connection_error
+from diagnostics import set_caller
+
+
+class QueryTask(QRunnable):
+    """Запрос к БД, выполняемый в фоновом потоке"""
+
+    def __init__(self, executor, fn, on_result, on_error, key, caller):
+        super().__init__()
+        # Временем жизни задачи управляет исполнитель, а не пул потоков
+        self.setAutoDelete(False)
+        self.executor = executor
+        self.fn = fn
+        self.on_result = on_result
+        self.on_error = on_error
+        self.key = key
+        # Имя задачи в статистике запросов, по умолчанию - имя функции
+        self.caller = caller or f"{fn.__module__}.{fn.__qualname__.replace('.<locals>', '')}"
+        self.cancelled = False
+        self.connection = None
+
+    def run(self):
+        executor = self.executor
+        if self.cancelled:
+            executor._done.emit(self, False, None)
+            return
+
+        try:
+            connection = executor.pool.getconn()
+        except Exception as e:
+            executor._done.emit(self, False, e)
+            return
+
+        with executor._lock:
+            self.connection = connection
+
+        broken = False
+        set_caller(self.caller)
+        try:
+            result = self.fn(connection)
+        except Exception as e:
+            broken = is_connection_error(e) or connection.closed != 0
+            if not broken:
+                try:
+                    connection.rollback()
+                except Exception:
+                    broken = True
+            executor._done.emit(self, False, e)
+        else:
+            executor._done.emit(self, True, result)
+        finally:
+            set_caller(None)
+            with executor._lock:
+                self.connection = None
+            executor.pool.putconn(connection, close=broken)
+
+
+class QueryExecutor(QObject):
+    """Выполнение запросов вне GUI-потока на соединениях из пула
+
+    Функция задачи получает соединение и выполняется в рабочем потоке,
+    а результат или ошибка доставляются обработчикам в GUI-потоке.
+    Задачи с одинаковым ключом вытесняют друг друга: устаревшая задача
+    снимается из очереди, а выполняющийся запрос отменяется на сервере.
+    """
+
+    busyChanged = pyqtSignal(bool)
+
+    # Внутренний сигнал: из рабочего потока в поток исполнителя
+    _done = pyqtSignal(object, bool, object)
+
+    def __init__(self, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(pool.settings.max_connections)
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._latest = {}
+        self._done.connect(self._on_done)
+
+    def submit(self, fn, on_result=None, on_error=None, key=None, caller=None):
+        """Постановка задачи fn(connection) в очередь"""
+        if key is not None:
+            self.cancel(key)
+
+        task = QueryTask(self, fn, on_result, on_error, key, caller)
+        if key is not None:
+            self._latest[key] = task
+        self._tasks.add(task)
+        if len(self._tasks) == 1:
+            self.busyChanged.emit(True)
+        self._pool.start(task)
+        return task
+
+    def cancel(self, key):
+        """Отмена задачи с указанным ключом"""
+        task = self._latest.pop(key, None)
+        if task is None:
+            return
+        task.cancelled = True
+        if self._pool.tryTake(task):
+            # Задача еще не начала выполняться
+            self._finish(task)
+            return
+
+        # Прерываем выполняющийся запрос на сервере
+        with self._lock:
+            if task.connection is not None:
+                try:
+                    task.connection.cancel()
+                except Exception:
+                    pass
+
+    def is_busy(self):
+        return bool(self._tasks)
+
+    def shutdown(self):
+        """Снятие ожидающих задач и ожидание выполняющихся"""
+        for task in list(self._tasks):
+            task.cancelled = True
+            if self._pool.tryTake(task):
+                self._finish(task)
+        self._pool.waitForDone()
+        self.pool.closeall()
+
+    def _finish(self, task):
+        if self._latest.get(task.key) is task:
+            del self._latest[task.key]
+        self._tasks.discard(task)
+        if not self._tasks:
+            self.busyChanged.emit(False)
+
+    def _on_done(self, task, ok, payload):
+        if task not in self._tasks:
+            return
+        self._finish(task)
+
+        if task.cancelled:
+            return
+
+        if ok:
+            if task.on_result is not None:
+                task.on_result(payload)
+        elif task.on_error is not None:
+            task.on_error(payload)
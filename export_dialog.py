@@ -0,0 +1,105 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QProgressBar, QFileDialog, QMessageBox
+)
+from PyQt6.QtCore import pyqtSignal
+
+from exporter import EXPORTS, estimate_rows, export_csv
+
+
+class ExportDialog(QDialog):
+    """Выгрузка франшиз, локаций, устройств или истории устройств в CSV"""
+
+    # Выгружено строк; испускается из рабочего потока
+    progressed = pyqtSignal(int)
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.setWindowTitle("Экспорт")
+        self.resize(400, 150)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        layout.addWidget(QLabel("Что выгрузить:"))
+        self.export = QComboBox()
+        for export in EXPORTS:
+            self.export.addItem(export.title, export)
+        layout.addWidget(self.export)
+
+        self.progress = QProgressBar()
+        self.progress.setVisible(False)
+        layout.addWidget(self.progress)
+        self.progressed.connect(self.show_progress)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        buttons_layout = QHBoxLayout()
+        layout.addLayout(buttons_layout)
+        self.export_btn = QPushButton("Выгрузить...")
+        self.export_btn.clicked.connect(self.start_export)
+        buttons_layout.addWidget(self.export_btn)
+        self.cancel_btn = QPushButton("Отменить")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_export)
+        buttons_layout.addWidget(self.cancel_btn)
+        buttons_layout.addStretch()
+
+    def start_export(self):
+        """Выбор файла и запуск выгрузки в фоновом потоке"""
+        export = self.export.currentData()
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Файл для выгрузки", f"{export.name}.csv", "CSV (*.csv)"
+        )
+        if not path:
+            return
+
+        def run(connection):
+            # Оценка нужна только для шкалы индикатора
+            self.progressed.emit(-estimate_rows(connection, export))
+            return export_csv(connection, export, path, self.progressed.emit)
+
+        self.export_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.progress.setRange(0, 0)
+        self.progress.setVisible(True)
+        self.status_label.setText("Выгрузка...")
+        self.executor.submit(
+            run, on_result=self.export_done, on_error=self.export_failed, key="export"
+        )
+
+    def show_progress(self, rows):
+        # Отрицательное значение - оценка общего числа строк
+        if rows <= 0:
+            self.progress.setRange(0, -rows)
+            return
+        if rows > self.progress.maximum() > 0:
+            self.progress.setMaximum(rows)
+        self.progress.setValue(rows)
+        self.status_label.setText(f"Выгружено строк: {rows}")
+
+    def cancel_export(self):
+        """Отмена выгрузки: запрос прерывается на сервере, файл не создается"""
+        self.executor.cancel("export")
+        self.finish("Выгрузка отменена")
+
+    def export_done(self, rows):
+        self.finish(f"Выгружено строк: {rows}")
+
+    def export_failed(self, error):
+        self.finish("Выгрузка не выполнена")
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при выгрузке:\n{str(error)}")
+
+    def finish(self, message):
+        self.export_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.progress.setVisible(False)
+        self.status_label.setText(message)
+
+    def reject(self):
+        # Закрытие окна прерывает выгрузку
+        if self.cancel_btn.isEnabled():
+            self.cancel_export()
+        super().reject()
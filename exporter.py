@@ -0,0 +1,124 @@
+import os
+
+
+class Export:
+    """Описание выгрузки: запрос и таблица, по которой оценивается число строк
+
+    Столбцы выгрузок франшиз, локаций и устройств совпадают со столбцами
+    импорта, так что выгруженный файл можно загрузить обратно.
+    """
+
+    def __init__(self, name, title, table, query):
+        self.name = name
+        self.title = title
+        self.table = table
+        self.query = query
+
+
+EXPORTS = [
+    Export("franchises", "Франшизы", "franchise", """
+        SELECT f.franchise_id, f.name, p.name AS parent_name, f.address,
+               f.contact_phone, f.email, f.is_active, f.created_at, f.updated_at
+        FROM franchise f
+        LEFT JOIN franchise p ON f.parent_id = p.franchise_id
+        ORDER BY f.franchise_id
+    """),
+    Export("locations", "Локации", "location", """
+        SELECT l.location_id, f.name AS franchise_name, l.name, l.address,
+               l.room_number, l.is_active
+        FROM location l
+        JOIN franchise f ON l.franchise_id = f.franchise_id
+        ORDER BY l.location_id
+    """),
+    Export("devices", "Устройства", "device", """
+        SELECT d.device_id, d.inventory_number, d.name, t.name AS device_type,
+               f.name AS franchise_name, l.name AS location_name, d.status,
+               d.purchase_date, d.warranty_expiry, d.purchase_price, d.notes,
+               d.created_at, d.updated_at
+        FROM device d
+        JOIN device_type t ON d.device_type_id = t.device_type_id
+        JOIN franchise f ON d.franchise_id = f.franchise_id
+        LEFT JOIN location l ON d.location_id = l.location_id
+        ORDER BY d.device_id
+    """),
+    Export("device_history", "История устройств", "device_history", """
+        SELECT h.history_id, h.device_id, d.inventory_number,
+               f.name AS franchise_name, l.name AS location_name, h.status,
+               h.notes, h.changed_at, h.changed_by
+        FROM device_history h
+        JOIN device d ON h.device_id = d.device_id
+        LEFT JOIN franchise f ON h.franchise_id = f.franchise_id
+        LEFT JOIN location l ON h.location_id = l.location_id
+        ORDER BY h.history_id
+    """),
+]
+
+# Как часто сообщать о ходе выгрузки, строк
+PROGRESS_STEP = 10000
+
+
+class _CountingFile:
+    """Файл, считающий записанные строки для индикатора хода выгрузки"""
+
+    def __init__(self, file, progress):
+        self.file = file
+        self.progress = progress
+        self.lines = 0
+        self.reported = 0
+
+    def write(self, data):
+        self.file.write(data)
+        # Перевод строки внутри значения в кавычках тоже посчитается,
+        # для индикатора такой точности достаточно
+        self.lines += data.count(b"\n")
+        if self.progress is not None and self.lines - self.reported >= PROGRESS_STEP:
+            self.reported = self.lines
+            self.progress(self.lines)
+
+
+def estimate_rows(connection, export):
+    """Оценка числа строк выгрузки по статистике таблицы, 0 - неизвестно"""
+    with connection.cursor() as cursor:
+        # У секционированной таблицы статистика хранится по секциям
+        cursor.execute("""
+            SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0)
+            FROM pg_class
+            WHERE oid = %(table)s::regclass
+               OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %(table)s::regclass)
+        """, {"table": export.table})
+        rows = cursor.fetchone()[0]
+    connection.rollback()
+    return int(rows)
+
+
+def export_csv(connection, export, path, progress=None):
+    """Выгрузка в CSV через COPY ... TO STDOUT
+
+    Строки идут с сервера прямо в файл, в памяти не накапливаются.
+    Файл пишется под временным именем и переименовывается только после
+    успешного завершения, поэтому отмена или ошибка не оставляют
+    неполного файла. Возвращает число выгруженных строк.
+    """
+    partial = path + ".part"
+    try:
+        with open(partial, "wb") as file:
+            # BOM - чтобы табличные редакторы распознали UTF-8
+            file.write(b"\xef\xbb\xbf")
+            counting = _CountingFile(file, progress)
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY ({export.query}) TO STDOUT WITH (FORMAT csv, HEADER)", counting
+                )
+                rows = cursor.rowcount
+        connection.rollback()
+        os.replace(partial, path)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+
+    if progress is not None:
+        progress(rows)
+    return rows
@@ -0,0 +1,206 @@
+import threading
+
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QLineEdit,
+    QTableView, QAbstractItemView, QMessageBox
+)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+from federation import FEDERATED_TABLES, FederatedReader, parse_sources, tagged_rows
+
+
+class FederatedModel(QAbstractTableModel):
+    """Строки всех регионов в одной таблице, первый столбец - регион
+
+    Ответы регионов добавляются по мере прихода, строки каждого региона
+    заменяются целиком. Сортировка выполняется в памяти.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._headers = []
+        self._columns = 0
+        self._results = {}
+        self._rows = []
+        self._sort_column = 0
+        self._descending = False
+
+    def reset(self, headers):
+        """Новая таблица без строк"""
+        self.beginResetModel()
+        self._headers = ["Регион"] + list(headers)
+        self._columns = len(headers)
+        self._results = {}
+        self._rows = []
+        self.endResetModel()
+
+    def add_result(self, result):
+        """Строки ответившего региона вместо прежних строк этого региона"""
+        self.beginResetModel()
+        self._results[result.source] = result
+        self._rows = tagged_rows(self._results.values(), self._columns)
+        self._sort_rows()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._descending = order == Qt.SortOrder.DescendingOrder
+        self.beginResetModel()
+        self._sort_rows()
+        self.endResetModel()
+
+    def _sort_rows(self):
+        column = self._sort_column
+        # Регион - второй ключ, чтобы одинаковые id разных регионов шли подряд
+        self._rows.sort(
+            key=lambda row: (
+                row[column] is not None, row[column] if row[column] is not None else 0, row[0]
+            ),
+            reverse=self._descending
+        )
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self._rows[index.row()][index.column()]
+        return str(value) if value is not None else ""
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+
+class FederatedView(QDialog):
+    """Просмотр франшиз, локаций и устройств всех региональных баз
+
+    Регионы читаются параллельно, каждый не дольше таймаута.
+    Медленные и недоступные регионы не задерживают остальные: их
+    состояние показывается под таблицей, а строки - когда придут.
+    Таблица загружается при каждом открытии окна, а соединения с
+    регионами закрываются при закрытии.
+    """
+
+    # Из рабочего потока: номер загрузки и результат региона (SourceResult)
+    _source_done = pyqtSignal(int, object)
+    _fetch_done = pyqtSignal(int)
+
+    def __init__(self, settings, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Все регионы")
+        self.resize(1000, 600)
+        self.settings = settings
+        self.sources = parse_sources(settings.federation)
+        # Открыт, пока открыто окно
+        self.reader = FederatedReader(self.sources, settings)
+        # Номер последней загрузки: ответы прежних загрузок не показываются
+        self.generation = 0
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        options_layout = QHBoxLayout()
+        layout.addLayout(options_layout)
+        self.table_choice = QComboBox()
+        for table_name, table in FEDERATED_TABLES.items():
+            self.table_choice.addItem(table.title, table_name)
+        self.table_choice.currentIndexChanged.connect(self.load)
+        options_layout.addWidget(self.table_choice)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Название, адрес или инв. номер")
+        self.search_input.returnPressed.connect(self.load)
+        options_layout.addWidget(self.search_input)
+
+        self.refresh_btn = QPushButton("Обновить")
+        self.refresh_btn.clicked.connect(self.load)
+        options_layout.addWidget(self.refresh_btn)
+
+        self.model = FederatedModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.table)
+
+        # Состояние каждого региона
+        self.source_labels = {}
+        sources_layout = QHBoxLayout()
+        layout.addLayout(sources_layout)
+        for source in self.sources:
+            label = QLabel()
+            self.source_labels[source.name] = label
+            sources_layout.addWidget(label)
+        sources_layout.addStretch()
+        self.total_label = QLabel()
+        sources_layout.addWidget(self.total_label)
+
+        self._source_done.connect(self.source_loaded)
+        self._fetch_done.connect(self.fetch_finished)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.load()
+
+    def load(self):
+        """Чтение выбранной таблицы из всех регионов в фоновом потоке"""
+        if self.reader is None:
+            self.reader = FederatedReader(self.sources, self.settings)
+        reader = self.reader
+        self.generation += 1
+        generation = self.generation
+        table_name = self.table_choice.currentData()
+        search = self.search_input.text().strip()
+
+        self.model.reset(FEDERATED_TABLES[table_name].headers)
+        for name, label in self.source_labels.items():
+            label.setText(f"{name}: загрузка...")
+            label.setToolTip("")
+        self.total_label.clear()
+
+        def fetch():
+            reader.fetch(
+                table_name, search, on_source=lambda result: self._source_done.emit(generation, result)
+            )
+            self._fetch_done.emit(generation)
+
+        threading.Thread(target=fetch, name="fcas-federation-fetch", daemon=True).start()
+
+    def source_loaded(self, generation, result):
+        if generation != self.generation:
+            return
+        if result.ok:
+            self.model.add_result(result)
+        label = self.source_labels[result.source]
+        label.setText(result.describe() if result.ok else f"⚠ {result.describe()}")
+        label.setToolTip(str(result.error) if result.error is not None else "")
+        self.total_label.setText(f"Всего строк: {self.model.rowCount()}")
+
+    def fetch_finished(self, generation):
+        if generation == self.generation:
+            self.table.resizeColumnsToContents()
+
+    def done(self, result):
+        # Ответы, пришедшие после закрытия, не показываются
+        self.generation += 1
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        super().done(result)
+
+
+def create_federated_view(settings, parent=None):
+    """Окно общего просмотра; неверный список регионов - сообщение об ошибке и None"""
+    try:
+        return FederatedView(settings, parent)
+    except ValueError as e:
+        QMessageBox.critical(parent, "Ошибка", f"Неверный список регионов FCAS_FEDERATION:\n{str(e)}")
+        return None
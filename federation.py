@@ -0,0 +1,284 @@
+import argparse
+import csv
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from dataclasses import dataclass, replace
+
+import psycopg2
+
+from db import DatabaseSettings, connect, is_connection_error
+from repository import device_query, franchise_query, location_query
+
+
+@dataclass
+class FederatedTable:
+    """Таблица, которую можно читать со всех баз сразу"""
+
+    title: str
+    # Запрос KeysetQuery по строке поиска
+    query: object
+    # Заголовки отображаемых столбцов; хвостовые значения строк отбрасываются
+    headers: list
+
+
+FEDERATED_TABLES = {
+    "franchise": FederatedTable(
+        "Франшизы", franchise_query, ["ID", "Название", "Родитель", "Телефон", "Активна"]
+    ),
+    "location": FederatedTable(
+        "Локации", location_query, ["ID", "Франшиза", "Название", "Адрес", "Активна"]
+    ),
+    "device": FederatedTable(
+        "Устройства", device_query, ["ID", "Инв. номер", "Название", "Тип", "Франшиза", "Локация", "Статус"]
+    ),
+}
+
+# Сколько строк читать из одной базы за запрос
+FEDERATION_ROW_LIMIT = 10000
+
+
+@dataclass
+class FederationSource:
+    """Региональная база: имя для столбца "Регион" и строка подключения"""
+
+    name: str
+    dsn: str
+
+
+def parse_sources(text):
+    """Список баз из строки вида "север=dbname=fcas host=a; юг=postgresql://b/fcas"
+
+    Имя отделяется от строки подключения первым знаком "=".
+    """
+    sources = []
+    for item in text.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        name, separator, dsn = item.partition("=")
+        if not separator or not name.strip() or not dsn.strip():
+            raise ValueError(f'Ожидается "имя=строка подключения": {item}')
+        if any(source.name == name.strip() for source in sources):
+            raise ValueError(f"Имя базы повторяется: {name.strip()}")
+        sources.append(FederationSource(name.strip(), dsn.strip()))
+    return sources
+
+
+@dataclass
+class SourceResult:
+    """Результат одной базы; при ошибке или таймауте строк нет"""
+
+    source: str
+    rows: list
+    elapsed: float
+    error: Exception = None
+    timed_out: bool = False
+    # Строк больше FEDERATION_ROW_LIMIT, показана только часть
+    truncated: bool = False
+
+    @property
+    def ok(self):
+        return self.error is None and not self.timed_out
+
+    def describe(self):
+        """Состояние базы одной строкой для пользователя"""
+        if self.timed_out:
+            return f"{self.source}: нет ответа за {self.elapsed:.0f} с"
+        if self.error is not None:
+            return f"{self.source}: недоступна ({str(self.error).strip().splitlines()[0]})"
+        more = " (показана часть)" if self.truncated else ""
+        return f"{self.source}: {len(self.rows)} строк{more} за {self.elapsed:.1f} с"
+
+
+def tagged_rows(results, columns):
+    """Строки всех ответивших баз с именем базы первым значением"""
+    return [(result.source,) + tuple(row[:columns]) for result in results for row in result.rows]
+
+
+class FederatedReader:
+    """Параллельное чтение одних и тех же запросов из нескольких баз FCAS
+
+    Каждая база читается в своем потоке на своем соединении, ответ
+    ждется не дольше timeout секунд. Медленная или недоступная база не
+    задерживает остальные: ее запрос отменяется на сервере, а в
+    результате она отмечается ошибкой. Пока запрос к базе не завершился,
+    следующие запросы к ней не отправляются, и она тоже отмечается
+    ошибкой. Соединение, разорванное ошибкой, открывается заново при
+    следующем запросе. Соединения только читают.
+    """
+
+    def __init__(self, sources, settings, timeout=None):
+        if not sources:
+            raise ValueError("Не задано ни одной базы")
+        self.sources = list(sources)
+        self.timeout = timeout if timeout is not None else settings.federation_timeout
+        # Сервер сам прерывает запрос после таймаута, даже если отмена не дошла
+        self.settings = replace(
+            settings,
+            statement_timeout=int(self.timeout * 1000),
+            connect_timeout=max(2, math.ceil(self.timeout)),
+        )
+        self._threads = ThreadPoolExecutor(
+            max_workers=len(self.sources), thread_name_prefix="fcas-federation"
+        )
+        self._lock = threading.Lock()
+        self._connections = {}
+        # Базы, запрос к которым еще выполняется: имя -> соединение или None
+        self._running = {}
+        self._closed = False
+
+    def fetch(self, table_name, search="", on_source=None):
+        """Строки таблицы из всех баз; список SourceResult в порядке sources
+
+        on_source(result) вызывается из рабочего потока по мере ответа
+        каждой базы, чтобы быстрые базы можно было показать сразу.
+        """
+        table = FEDERATED_TABLES[table_name]
+        started = time.monotonic()
+        results = {}
+        futures = {}
+        for source in self.sources:
+            with self._lock:
+                busy = source.name in self._running
+                if not busy:
+                    self._running[source.name] = None
+            if busy:
+                results[source.name] = SourceResult(
+                    source.name, [], 0.0, RuntimeError("еще выполняется предыдущий запрос")
+                )
+                if on_source is not None:
+                    on_source(results[source.name])
+                continue
+            try:
+                future = self._threads.submit(self._read, source, table.query(search))
+            except RuntimeError as e:
+                # Читатель закрыт из другого потока
+                with self._lock:
+                    del self._running[source.name]
+                results[source.name] = SourceResult(source.name, [], 0.0, e)
+                continue
+            futures[future] = source
+
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                source = futures[future]
+                elapsed = time.monotonic() - started
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    result = SourceResult(source.name, [], elapsed, e)
+                else:
+                    result = SourceResult(
+                        source.name, rows[:FEDERATION_ROW_LIMIT], elapsed,
+                        truncated=len(rows) > FEDERATION_ROW_LIMIT
+                    )
+                results[source.name] = result
+                if on_source is not None:
+                    on_source(result)
+        except TimeoutError:
+            for future, source in futures.items():
+                if source.name in results:
+                    continue
+                self._cancel(source)
+                result = SourceResult(source.name, [], time.monotonic() - started, timed_out=True)
+                results[source.name] = result
+                if on_source is not None:
+                    on_source(result)
+        return [results[source.name] for source in self.sources]
+
+    def close(self):
+        """Отмена выполняющихся запросов и закрытие соединений без ожидания
+
+        Соединения, занятые запросом, закрываются после его отмены.
+        """
+        with self._lock:
+            self._closed = True
+            for source in self.sources:
+                if source.name not in self._running:
+                    connection = self._connections.pop(source.name, None)
+                    if connection is not None:
+                        connection.close()
+        for source in self.sources:
+            self._cancel(source)
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    def _read(self, source, query):
+        try:
+            connection = self._connections.get(source.name)
+            if connection is None or connection.closed:
+                connection = connect(replace(self.settings, dsn=source.dsn), "fcas-federation")
+                connection.set_session(readonly=True)
+                self._connections[source.name] = connection
+            with self._lock:
+                self._running[source.name] = connection
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(*query.page(None, FEDERATION_ROW_LIMIT + 1))
+                    rows = cursor.fetchall()
+                connection.rollback()
+                return rows
+            except Exception as e:
+                if is_connection_error(e) or connection.closed:
+                    connection.close()
+                    self._connections.pop(source.name, None)
+                else:
+                    connection.rollback()
+                raise
+        finally:
+            with self._lock:
+                del self._running[source.name]
+                if self._closed:
+                    connection = self._connections.pop(source.name, None)
+                    if connection is not None:
+                        connection.close()
+
+    def _cancel(self, source):
+        with self._lock:
+            connection = self._running.get(source.name)
+            if connection is not None:
+                try:
+                    connection.cancel()
+                except psycopg2.Error:
+                    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Чтение франшиз, локаций или устройств из всех региональных баз в CSV на stdout"
+    )
+    parser.add_argument("table", choices=list(FEDERATED_TABLES))
+    parser.add_argument("search", nargs="?", default="", help="часть названия, адреса или инв. номера")
+    parser.add_argument("--sources", help='базы "имя=строка подключения; ..." (по умолчанию FCAS_FEDERATION)')
+    parser.add_argument("--timeout", type=float, help="сколько ждать каждую базу, с")
+    args = parser.parse_args()
+
+    settings = DatabaseSettings.from_env()
+    try:
+        sources = parse_sources(args.sources or settings.federation)
+        reader = FederatedReader(sources, settings, args.timeout)
+    except ValueError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        results = reader.fetch(args.table, args.search)
+    finally:
+        reader.close()
+
+    table = FEDERATED_TABLES[args.table]
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Регион"] + table.headers)
+    writer.writerows(tagged_rows(results, len(table.headers)))
+    for result in results:
+        print(result.describe(), file=sys.stderr)
+    # Код 2 - данные неполные: часть баз не ответила
+    if not any(result.ok for result in results):
+        sys.exit(1)
+    if not all(result.ok for result in results):
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
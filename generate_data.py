@@ -0,0 +1,343 @@
+import argparse
+import datetime
+import json
+import random
+import sys
+import time
+
+import psycopg2
+
+from db import DatabaseSettings
+from queries import DEVICE_STATUSES
+
+
+# Доли статусов устройств
+STATUS_WEIGHTS = {"active": 80, "in_repair": 10, "decommissioned": 7, "lost": 3}
+
+# Модели и характеристики компонентов по названию типа
+COMPONENT_MODELS = {
+    "CPU": [
+        ("Intel Core i3-12100", {"cores": 4, "threads": 8, "frequency_ghz": 3.3}),
+        ("Intel Core i5-12400", {"cores": 6, "threads": 12, "frequency_ghz": 2.5}),
+        ("Intel Core i7-12700", {"cores": 12, "threads": 20, "frequency_ghz": 2.1}),
+        ("AMD Ryzen 5 5600", {"cores": 6, "threads": 12, "frequency_ghz": 3.5}),
+        ("AMD Ryzen 9 5950X", {"cores": 16, "threads": 32, "frequency_ghz": 3.4}),
+    ],
+    "RAM": [
+        ("Kingston KVR26N19S8/8", {"capacity_gb": 8, "type": "DDR4", "speed_mhz": 2666}),
+        ("Kingston KF432C16BB/16", {"capacity_gb": 16, "type": "DDR4", "speed_mhz": 3200}),
+        ("Corsair CMK32GX5M2B5600C36", {"capacity_gb": 32, "type": "DDR5", "speed_mhz": 5600}),
+    ],
+    "HDD": [
+        ("Seagate Barracuda ST1000DM010", {"capacity_gb": 1000, "interface": "SATA", "rpm": 7200}),
+        ("WD Blue WD20EZBX", {"capacity_gb": 2000, "interface": "SATA", "rpm": 7200}),
+        ("Toshiba P300 HDWD240", {"capacity_gb": 4000, "interface": "SATA", "rpm": 5400}),
+    ],
+    "SSD": [
+        ("Samsung 870 EVO", {"capacity_gb": 500, "interface": "SATA"}),
+        ("Samsung 980 PRO", {"capacity_gb": 1000, "interface": "NVMe", "pcie": 4}),
+        ("Kingston NV2", {"capacity_gb": 2000, "interface": "NVMe", "pcie": 4}),
+        ("Crucial MX500", {"capacity_gb": 250, "interface": "SATA"}),
+    ],
+    "GPU": [
+        ("NVIDIA GeForce GTX 1650", {"memory_gb": 4, "vendor": "NVIDIA"}),
+        ("NVIDIA GeForce RTX 3060", {"memory_gb": 12, "vendor": "NVIDIA"}),
+        ("AMD Radeon RX 6600", {"memory_gb": 8, "vendor": "AMD"}),
+    ],
+}
+
+# Типичные значения числовых характеристик по единице измерения
+SPEC_VALUES = {
+    "cores": [2, 4, 6, 8, 12, 16, 24, 32],
+    "GB": [4, 8, 16, 32, 64, 128, 256, 512, 1000, 2000],
+    "Mbps": [100, 1000, 2500, 10000],
+    "GHz": [2.1, 2.5, 3.0, 3.3, 3.6, 4.2],
+    "inches": [13.3, 14.0, 15.6, 21.5, 23.8, 27.0],
+}
+
+
+class GeneratorSettings:
+    """Объем генерируемых данных
+
+    Для компонентов, характеристик и истории задается среднее число
+    на устройство, фактическое выбирается случайно от 0 до удвоенного.
+    """
+
+    def __init__(self, franchises, locations, devices, components=3, specs=3, history=2,
+                 depth=12, history_months=24, seed=1):
+        self.franchises = franchises
+        self.locations = locations
+        self.devices = devices
+        self.components = components
+        self.specs = specs
+        self.history = history
+        self.depth = depth
+        self.history_months = history_months
+        self.seed = seed
+
+    @classmethod
+    def for_scale(cls, devices, seed=1):
+        """Объем, пропорциональный числу устройств: 100 устройств на франшизу, 10 на локацию"""
+        return cls(max(10, devices // 100), max(20, devices // 10), devices, seed=seed)
+
+
+def _copy_value(value):
+    # Текстовый формат COPY: \N - NULL, спецсимволы экранируются
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class _RowStream:
+    """Файл для COPY FROM, строки которого порождаются по мере чтения
+
+    Сгенерированные данные не накапливаются в памяти целиком.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = b""
+        self.count = 0
+
+    def read(self, size=-1):
+        chunks, length = [self._buffer], len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ("\t".join(_copy_value(value) for value in row) + "\n").encode()
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = b"".join(chunks)
+        if size < 0:
+            self._buffer = b""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def _copy(cursor, table, columns, rows):
+    stream = _RowStream(rows)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=65536)
+    return stream.count
+
+
+def _next_id(cursor, table, key):
+    cursor.execute(f"SELECT COALESCE(MAX({key}), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _random_date(rng, start, end):
+    return start + datetime.timedelta(days=rng.randrange((end - start).days + 1))
+
+
+def generate(connection, settings, truncate=False, progress=print):
+    """Заполнение БД сгенерированными данными через COPY
+
+    Франшизы, локации и устройства получают id подряд после уже
+    существующих, последовательности потом сдвигаются. Одинаковые
+    настройки и seed дают одинаковые данные. Возвращает число строк
+    по таблицам.
+    """
+    rng = random.Random(settings.seed)
+    today = datetime.date.today()
+    counts = {}
+
+    with connection.cursor() as cursor:
+        if truncate:
+            cursor.execute("""
+                TRUNCATE franchise, location, device, device_history, component,
+                         device_spec, deleted_row, archive.franchise, archive.location,
+                         archive.device, archive.device_history, archive.component,
+                         archive.device_spec
+                RESTART IDENTITY CASCADE
+            """)
+
+        cursor.execute("SELECT device_type_id, name FROM device_type ORDER BY device_type_id")
+        device_types = cursor.fetchall()
+        cursor.execute("SELECT component_type_id, name FROM component_type ORDER BY component_type_id")
+        component_types = cursor.fetchall()
+        cursor.execute("SELECT spec_attribute_id, data_type, unit FROM spec_attribute ORDER BY spec_attribute_id")
+        attributes = cursor.fetchall()
+        if not device_types:
+            raise ValueError("В БД нет типов устройств, сначала выполните sql/6_Примеры данных.sql")
+
+        def timed(table, columns, rows):
+            started = time.monotonic()
+            counts[table] = _copy(cursor, table, columns, rows)
+            progress(f"{table}: {counts[table]} строк за {time.monotonic() - started:.1f} с")
+
+        # Франшизы. Половина продолжает самую свежую ветку, остальные
+        # прикрепляются к случайной франшизе: получаются и глубокие
+        # цепочки до settings.depth уровней, и широкие поддеревья
+        first_franchise = _next_id(cursor, "franchise", "franchise_id")
+        franchise_ids = range(first_franchise, first_franchise + settings.franchises)
+        roots = max(1, settings.franchises // 100)
+        depths = {}
+
+        def franchises():
+            for franchise_id in franchise_ids:
+                parent_id = None
+                if franchise_id - first_franchise >= roots:
+                    parent_id = franchise_id - 1 if rng.random() < 0.5 else \
+                        rng.randrange(first_franchise, franchise_id)
+                    if depths[parent_id] >= settings.depth:
+                        parent_id = rng.randrange(first_franchise, first_franchise + roots)
+                depths[franchise_id] = 0 if parent_id is None else depths[parent_id] + 1
+                yield (franchise_id, parent_id, f"Франшиза {franchise_id}", f"ул. Тестовая, {franchise_id}",
+                       f"+7 900 {franchise_id % 10000000:07d}", f"franchise{franchise_id}@example.com",
+                       rng.random() < 0.9)
+
+        timed("franchise", ["franchise_id", "parent_id", "name", "address", "contact_phone",
+                            "email", "is_active"], franchises())
+
+        first_location = _next_id(cursor, "location", "location_id")
+        location_franchises = [rng.choice(franchise_ids) for _ in range(settings.locations)]
+
+        def locations():
+            for offset, franchise_id in enumerate(location_franchises):
+                location_id = first_location + offset
+                yield (location_id, franchise_id, f"Локация {location_id}",
+                       f"ул. Тестовая, {franchise_id}, корп. {offset % 10 + 1}",
+                       str(offset % 500 + 1), rng.random() < 0.9)
+
+        timed("location", ["location_id", "franchise_id", "name", "address", "room_number",
+                           "is_active"], locations())
+
+        first_device = _next_id(cursor, "device", "device_id")
+        statuses = [status for status, _ in DEVICE_STATUSES]
+        weights = [STATUS_WEIGHTS.get(status, 1) for status in statuses]
+        # Где числится устройство - для истории
+        device_places = []
+
+        def devices():
+            for offset in range(settings.devices):
+                device_id = first_device + offset
+                device_type_id, type_name = rng.choice(device_types)
+                if rng.random() < 0.05:
+                    # Устройство на складе франшизы, без локации
+                    franchise_id, location_id = rng.choice(franchise_ids), None
+                else:
+                    location = rng.randrange(settings.locations)
+                    franchise_id, location_id = location_franchises[location], first_location + location
+                status = rng.choices(statuses, weights)[0]
+                device_places.append((franchise_id, location_id, status))
+                purchase_date = _random_date(rng, today - datetime.timedelta(days=6 * 365), today)
+                yield (device_id, device_type_id, franchise_id, location_id, f"GEN-{device_id:09d}",
+                       f"{type_name} {device_id}", status, purchase_date,
+                       purchase_date + datetime.timedelta(days=365 * rng.randint(1, 3)),
+                       f"{rng.uniform(100, 5000):.2f}")
+
+        timed("device", ["device_id", "device_type_id", "franchise_id", "location_id",
+                         "inventory_number", "name", "status", "purchase_date", "warranty_expiry",
+                         "purchase_price"], devices())
+
+        def components():
+            for offset in range(settings.devices):
+                for _ in range(rng.randint(0, 2 * settings.components)):
+                    component_type_id, type_name = rng.choice(component_types)
+                    model, specifications = rng.choice(
+                        COMPONENT_MODELS.get(type_name, [(f"{type_name} generic", {})])
+                    )
+                    yield (first_device + offset, component_type_id, model,
+                           json.dumps(specifications, ensure_ascii=False), _random_date(rng, today - datetime.timedelta(days=6 * 365), today))
+
+        if component_types:
+            timed("component", ["device_id", "component_type_id", "model", "specifications",
+                                "installed_date"], components())
+
+        def specs():
+            for offset in range(settings.devices):
+                count = min(len(attributes), rng.randint(0, 2 * settings.specs))
+                for attribute_id, data_type, unit in rng.sample(attributes, count):
+                    values = [None] * 5
+                    if data_type == "string":
+                        values[0] = rng.choice(["A", "B", "C", "D"])
+                    elif data_type == "integer":
+                        values[1] = rng.choice(SPEC_VALUES.get(unit, [1, 2, 4, 8, 16, 32, 64]))
+                    elif data_type == "decimal":
+                        values[2] = rng.choice(SPEC_VALUES.get(unit, [1.0, 2.5, 5.0, 10.0]))
+                    elif data_type == "boolean":
+                        values[3] = rng.random() < 0.5
+                    else:
+                        values[4] = _random_date(rng, today - datetime.timedelta(days=6 * 365), today)
+                    yield (first_device + offset, attribute_id, *values)
+
+        if attributes:
+            timed("device_spec", ["device_id", "spec_attribute_id", "value_string", "value_integer",
+                                  "value_decimal", "value_boolean", "value_date"], specs())
+
+        history_start = datetime.datetime.now(datetime.timezone.utc) - \
+            datetime.timedelta(days=30 * settings.history_months)
+        history_seconds = 30 * 24 * 3600 * settings.history_months
+
+        def history():
+            for offset, (franchise_id, location_id, status) in enumerate(device_places):
+                for _ in range(rng.randint(0, 2 * settings.history)):
+                    changed_at = history_start + datetime.timedelta(seconds=rng.randrange(history_seconds))
+                    yield (first_device + offset, franchise_id, location_id,
+                           rng.choices(statuses, weights)[0] if rng.random() < 0.3 else status,
+                           changed_at.isoformat(), "generator")
+
+        timed("device_history", ["device_id", "franchise_id", "location_id", "status",
+                                 "changed_at", "changed_by"], history())
+
+        # Строки истории вне созданных секций переносятся в месячные секции
+        cursor.execute("SELECT create_device_history_partitions()")
+        for table, key in (("franchise", "franchise_id"), ("location", "location_id"), ("device", "device_id")):
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, %s), (SELECT MAX({key}) FROM {table}))",
+                (table, key)
+            )
+    connection.commit()
+
+    # Статистика нужна планировщику сразу, не дожидаясь autovacuum
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    finally:
+        connection.autocommit = False
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Заполнение БД FCAS сгенерированными данными для проверки производительности"
+    )
+    parser.add_argument("--devices", type=int, default=100000, help="число устройств")
+    parser.add_argument("--franchises", type=int, help="число франшиз (по умолчанию устройства / 100)")
+    parser.add_argument("--locations", type=int, help="число локаций (по умолчанию устройства / 10)")
+    parser.add_argument("--components", type=int, default=3, help="компонентов на устройство в среднем")
+    parser.add_argument("--specs", type=int, default=3, help="характеристик на устройство в среднем")
+    parser.add_argument("--history", type=int, default=2, help="записей истории на устройство в среднем")
+    parser.add_argument("--depth", type=int, default=12, help="наибольшая глубина иерархии франшиз")
+    parser.add_argument("--seed", type=int, default=1, help="начальное значение генератора")
+    parser.add_argument("--truncate", action="store_true",
+                        help="удалить существующие франшизы, локации и устройства")
+    parser.add_argument("--dsn", help="строка подключения (по умолчанию FCAS_DSN)")
+    args = parser.parse_args()
+
+    settings = GeneratorSettings.for_scale(args.devices, seed=args.seed)
+    settings.franchises = args.franchises if args.franchises is not None else settings.franchises
+    settings.locations = args.locations if args.locations is not None else settings.locations
+    settings.components = args.components
+    settings.specs = args.specs
+    settings.history = args.history
+    settings.depth = args.depth
+
+    connection = psycopg2.connect(args.dsn or DatabaseSettings.from_env().dsn, application_name="fcas-generator")
+    try:
+        generate(connection, settings, truncate=args.truncate)
+    except (psycopg2.Error, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
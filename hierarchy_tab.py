@@ -0,0 +1,115 @@
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTreeView, QMessageBox
+)
+
+from models import TreeModel
+
+
+# Вся иерархия одним запросом: замыкание дерева (предок, потомок)
+# строится рекурсивно, а количество локаций и устройств считается
+# один раз на франшизу (устройства - по сводке device_summary) и
+# суммируется по поддереву. UNION вместо UNION ALL гарантирует
+# завершение даже при цикле в parent_id
+HIERARCHY_SQL = """
+    WITH RECURSIVE closure AS (
+        SELECT franchise_id AS ancestor_id, franchise_id AS descendant_id
+        FROM franchise
+        UNION
+        SELECT c.ancestor_id, f.franchise_id
+        FROM closure c
+        JOIN franchise f ON f.parent_id = c.descendant_id
+    ),
+    own_locations AS (
+        SELECT franchise_id, COUNT(*) AS count
+        FROM location
+        GROUP BY franchise_id
+    ),
+    own_devices AS (
+        SELECT franchise_id, SUM(device_count) AS count
+        FROM device_summary
+        GROUP BY franchise_id
+    )
+    SELECT f.franchise_id, f.parent_id, f.name, f.is_active,
+           COUNT(*) - 1 AS descendants,
+           COALESCE(SUM(ol.count), 0)::bigint AS locations,
+           COALESCE(SUM(od.count), 0)::bigint AS devices
+    FROM franchise f
+    JOIN closure c ON c.ancestor_id = f.franchise_id
+    LEFT JOIN own_locations ol ON ol.franchise_id = c.descendant_id
+    LEFT JOIN own_devices od ON od.franchise_id = c.descendant_id
+    GROUP BY f.franchise_id
+    ORDER BY f.name, f.franchise_id
+"""
+
+
+class HierarchyTab(QWidget):
+    """Вкладка с деревом франшиз и итогами по поддеревьям"""
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        # Дерево перезагружается при показе вкладки, если данные менялись
+        self.stale = True
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        buttons_layout = QHBoxLayout()
+        layout.addLayout(buttons_layout)
+
+        self.reload_btn = QPushButton("Перезагрузить")
+        self.reload_btn.clicked.connect(self.load)
+        buttons_layout.addWidget(self.reload_btn)
+
+        self.expand_btn = QPushButton("Развернуть все")
+        buttons_layout.addWidget(self.expand_btn)
+
+        self.collapse_btn = QPushButton("Свернуть все")
+        buttons_layout.addWidget(self.collapse_btn)
+        buttons_layout.addStretch()
+
+        self.model = TreeModel(
+            ["Название", "Активна", "Дочерних франшиз", "Локаций", "Устройств"]
+        )
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
+        self.tree.setUniformRowHeights(True)
+        self.expand_btn.clicked.connect(self.tree.expandAll)
+        self.collapse_btn.clicked.connect(self.tree.collapseAll)
+        layout.addWidget(self.tree)
+
+    def invalidate(self):
+        """Отметка о том, что франшизы или локации изменились"""
+        self.stale = True
+        if self.isVisible():
+            self.load()
+
+    def load_if_stale(self):
+        if self.stale:
+            self.load()
+
+    def load(self):
+        """Загрузка иерархии франшиз"""
+        self.stale = False
+
+        def fetch(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(HIERARCHY_SQL)
+                return cursor.fetchall()
+
+        self.executor.submit(
+            fetch, on_result=self.fill, on_error=self.show_error, key="hierarchy"
+        )
+
+    def fill(self, rows):
+        """Перестроение дерева с сохранением развернутых узлов"""
+        expanded = [key for key in self.model.keys() if self.tree.isExpanded(self.model.index_of(key))]
+        self.model.reset(rows)
+        for key in expanded:
+            index = self.model.index_of(key)
+            if index.isValid():
+                self.tree.setExpanded(index, True)
+
+    def show_error(self, error):
+        self.stale = True
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке иерархии:\n{str(error)}")
@@ -0,0 +1,80 @@
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTableView, QAbstractItemView, QMessageBox
+from PyQt6.QtCore import Qt
+
+from models import LazyQueryModel
+from queries import DEVICE_STATUSES, KeysetQuery
+
+
+STATUS_NAME = "CASE h.status {} ELSE h.status END".format(
+    " ".join(f"WHEN '{status}' THEN '{name}'" for status, name in DEVICE_STATUSES)
+)
+
+# Значения строки хронологии (h - запись истории, d - устройство)
+HISTORY_ROW = f"""
+    h.history_id, h.changed_at, d.inventory_number, d.name as device_name,
+    f.name as franchise_name, l.name as location_name,
+    {STATUS_NAME} as status_name, h.changed_by
+"""
+
+HISTORY_SOURCE = """
+    FROM device_history h
+    JOIN device d ON h.device_id = d.device_id
+    LEFT JOIN franchise f ON h.franchise_id = f.franchise_id
+    LEFT JOIN location l ON h.location_id = l.location_id
+"""
+
+# Хронология сортируется только по времени изменения (столбец 1),
+# ключ history_id различает записи с одинаковым временем. Такой
+# порядок читается по индексам (device_id | location_id, changed_at, history_id)
+HISTORY_SORT = [("h.history_id", None), ("h.changed_at", None)]
+
+
+class HistoryDialog(QDialog):
+    """Хронология изменений устройства или локации, новые записи сверху
+
+    Окно создается на каждый просмотр и удаляется при закрытии; done()
+    снимает загрузку страниц, так что ответы не приходят в удаленную модель.
+    """
+
+    def __init__(self, executor, title, condition, value, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.setWindowTitle(title)
+        self.resize(800, 500)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.model = LazyQueryModel(
+            ["ID", "Когда", "Инв. номер", "Устройство", "Франшиза", "Локация", "Статус", "Кто"],
+            executor, self
+        )
+        self.model.setObjectName("history")
+        self.model.error.connect(
+            lambda e: QMessageBox.critical(self, "Ошибка", f"Ошибка при загрузке истории:\n{str(e)}")
+        )
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.table)
+
+        query = KeysetQuery(HISTORY_ROW, HISTORY_SOURCE, "h.history_id", HISTORY_SORT)
+        query.where(condition, value)
+        self.model.sort(1, Qt.SortOrder.DescendingOrder)
+        self.model.reset(query)
+        # Первый столбец строки - ключ, в таблице он не нужен
+        self.table.hideColumn(0)
+
+    def done(self, result):
+        self.model.clear()
+        super().done(result)
+
+
+def device_history(executor, device_id, title, parent=None):
+    """Хронология изменений устройства"""
+    return HistoryDialog(executor, f"История устройства {title}", "h.device_id = %s", device_id, parent)
+
+
+def location_history(executor, location_id, title, parent=None):
+    """Хронология изменений устройств локации"""
+    return HistoryDialog(executor, f"История локации {title}", "h.location_id = %s", location_id, parent)
@@ -0,0 +1,132 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+    QComboBox, QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox,
+    QAbstractItemView
+)
+from PyQt6.QtCore import pyqtSignal
+
+from importer import IMPORT_ENTITIES, import_file, write_report
+
+
+class ImportDialog(QDialog):
+    """Импорт франшиз, локаций или устройств из файла CSV/XLSX"""
+
+    # Импорт завершен, данные в БД изменились
+    imported = pyqtSignal()
+    # Прочитано строк файла; испускается из рабочего потока
+    progressed = pyqtSignal(int)
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.errors = []
+        self.setWindowTitle("Импорт")
+        self.resize(600, 400)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        layout.addWidget(QLabel("Что импортировать:"))
+        self.entity = QComboBox()
+        for entity in IMPORT_ENTITIES:
+            self.entity.addItem(entity.title, entity)
+        self.entity.currentIndexChanged.connect(self.show_columns)
+        layout.addWidget(self.entity)
+
+        self.columns_label = QLabel()
+        self.columns_label.setWordWrap(True)
+        layout.addWidget(self.columns_label)
+
+        file_layout = QHBoxLayout()
+        layout.addLayout(file_layout)
+        self.path = QLineEdit()
+        self.path.setPlaceholderText("Файл CSV или XLSX")
+        file_layout.addWidget(self.path)
+        self.browse_btn = QPushButton("Обзор...")
+        self.browse_btn.clicked.connect(self.browse)
+        file_layout.addWidget(self.browse_btn)
+
+        buttons_layout = QHBoxLayout()
+        layout.addLayout(buttons_layout)
+        self.import_btn = QPushButton("Импортировать")
+        self.import_btn.clicked.connect(self.start_import)
+        buttons_layout.addWidget(self.import_btn)
+        self.report_btn = QPushButton("Сохранить отчет")
+        self.report_btn.setEnabled(False)
+        self.report_btn.clicked.connect(self.save_report)
+        buttons_layout.addWidget(self.report_btn)
+        buttons_layout.addStretch()
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        self.progressed.connect(
+            lambda count: self.status_label.setText(f"Прочитано строк: {count}")
+        )
+
+        # Отчет об ошибках по строкам файла
+        self.errors_table = QTableWidget(0, 2)
+        self.errors_table.setHorizontalHeaderLabels(["Строка", "Ошибка"])
+        self.errors_table.horizontalHeader().setStretchLastSection(True)
+        self.errors_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.errors_table)
+
+        self.show_columns()
+
+    def show_columns(self):
+        entity = self.entity.currentData()
+        names = ", ".join(name for name, _, _ in entity.columns)
+        self.columns_label.setText(f"Столбцы файла (первая строка): {names}")
+
+    def browse(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Файл для импорта", "", "Таблицы (*.csv *.xlsx);;Все файлы (*)"
+        )
+        if path:
+            self.path.setText(path)
+
+    def start_import(self):
+        """Запуск импорта в фоновом потоке"""
+        path = self.path.text().strip()
+        if not path:
+            QMessageBox.warning(self, "Ошибка", "Необходимо выбрать файл!")
+            return
+
+        entity = self.entity.currentData()
+        self.import_btn.setEnabled(False)
+        self.report_btn.setEnabled(False)
+        self.errors_table.setRowCount(0)
+        self.status_label.setText("Импорт...")
+
+        self.executor.submit(
+            lambda connection: import_file(connection, entity, path, self.progressed.emit),
+            on_result=self.import_done, on_error=self.import_failed
+        )
+
+    def import_done(self, result):
+        self.import_btn.setEnabled(True)
+        self.errors = result.errors
+        self.status_label.setText(
+            f"Добавлено: {result.inserted}, обновлено: {result.updated}, "
+            f"строк с ошибками: {len(result.errors)}"
+        )
+        self.errors_table.setRowCount(len(result.errors))
+        for i, (row_number, message) in enumerate(result.errors):
+            self.errors_table.setItem(i, 0, QTableWidgetItem(str(row_number)))
+            self.errors_table.setItem(i, 1, QTableWidgetItem(message))
+        self.report_btn.setEnabled(bool(result.errors))
+        if result.inserted or result.updated:
+            self.imported.emit()
+
+    def import_failed(self, error):
+        self.import_btn.setEnabled(True)
+        self.status_label.setText("Импорт отменен, данные не изменены")
+        QMessageBox.critical(self, "Ошибка", f"Ошибка при импорте:\n{str(error)}")
+
+    def save_report(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Отчет об ошибках", "", "CSV (*.csv)")
+        if not path:
+            return
+        try:
+            write_report(path, self.errors)
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет:\n{str(e)}")
@@ -0,0 +1,419 @@
+import csv
+import datetime
+import io
+import os
+from dataclasses import dataclass, field
+
+from values import boolean, date, price, status, text
+
+
+class ImportFileError(Exception):
+    """Файл импорта нельзя прочитать: формат, кодировка, нет нужных столбцов"""
+
+
+@dataclass
+class ImportResult:
+    """Итог импорта: сколько записей добавлено и обновлено, ошибки по строкам"""
+
+    inserted: int = 0
+    updated: int = 0
+    # (номер строки файла, сообщение)
+    errors: list = field(default_factory=list)
+
+
+class Entity:
+    """Описание импортируемой таблицы
+
+    columns - столбцы файла (они же столбцы промежуточной таблицы):
+    имя, тип в промежуточной таблице и преобразователь значения.
+    checks - проверки строк промежуточной таблицы i: условие, при котором
+    строка отбрасывается, и сообщение для отчета. merge - запросы переноса
+    оставшихся строк в целевую таблицу; каждый возвращает признак вставки
+    (TRUE) или обновления (FALSE) на каждую перенесенную запись.
+    """
+
+    def __init__(self, name, title, columns, checks, merge):
+        self.name = name
+        self.title = title
+        self.columns = columns
+        self.checks = checks
+        self.merge = merge
+
+    @property
+    def staging(self):
+        return f"import_{self.name}"
+
+
+# Франшиза по названию; franchise.name не уникален, поэтому
+# неоднозначные ссылки отбрасываются проверками
+FRANCHISE_IMPORT = Entity(
+    "franchise", "Франшизы",
+    [
+        ("name", "VARCHAR(100)", text(100, required=True)),
+        ("parent_name", "VARCHAR(100)", text(100)),
+        ("address", "TEXT", text()),
+        ("contact_phone", "VARCHAR(20)", text(20)),
+        ("email", "VARCHAR(100)", text(100)),
+        ("is_active", "BOOLEAN", boolean),
+    ],
+    [
+        ("Франшиза с таким названием уже встречалась в файле",
+         "EXISTS (SELECT 1 FROM import_franchise o WHERE o.name = i.name AND o.row_number < i.row_number)"),
+        ("В БД несколько франшиз с таким названием",
+         "(SELECT COUNT(*) FROM franchise f WHERE f.name = i.name) > 1"),
+        ("Франшиза не может быть родителем самой себя",
+         "i.parent_name = i.name"),
+        # Цепочка родителей идет по файлу, а для франшиз без родителя в файле -
+        # по БД. Возврат к самой строке - цикл, который отклонит триггер
+        ("Франшиза оказывается потомком самой себя",
+         """i.name IN (
+                WITH RECURSIVE edge(child, parent) AS (
+                    SELECT name, parent_name FROM import_franchise WHERE parent_name IS NOT NULL
+                    UNION ALL
+                    SELECT f.name, p.name
+                    FROM franchise f
+                    JOIN franchise p ON p.franchise_id = f.parent_id
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM import_franchise o
+                        WHERE o.name = f.name AND o.parent_name IS NOT NULL
+                    )
+                ),
+                walk(start, name, path) AS (
+                    SELECT name, parent_name, ARRAY[name]::VARCHAR[]
+                    FROM import_franchise
+                    WHERE parent_name IS NOT NULL
+                    UNION ALL
+                    SELECT w.start, e.parent, w.path || w.name
+                    FROM walk w
+                    JOIN edge e ON e.child = w.name
+                    WHERE NOT w.name = ANY(w.path)
+                )
+                SELECT start FROM walk WHERE name = start
+            )"""),
+        ("Родительская франшиза не найдена",
+         """i.parent_name IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM franchise f WHERE f.name = i.parent_name)
+            AND NOT EXISTS (SELECT 1 FROM import_franchise o WHERE o.name = i.parent_name)"""),
+        ("В БД несколько франшиз с названием родительской",
+         "i.parent_name IS NOT NULL AND (SELECT COUNT(*) FROM franchise f WHERE f.name = i.parent_name) > 1"),
+    ],
+    [
+        """
+        UPDATE franchise f
+        SET address = i.address, contact_phone = i.contact_phone, email = i.email,
+            is_active = COALESCE(i.is_active, TRUE), updated_at = CURRENT_TIMESTAMP
+        FROM import_franchise i
+        WHERE f.name = i.name
+        RETURNING FALSE
+        """,
+        """
+        INSERT INTO franchise (name, address, contact_phone, email, is_active)
+        SELECT i.name, i.address, i.contact_phone, i.email, COALESCE(i.is_active, TRUE)
+        FROM import_franchise i
+        WHERE NOT EXISTS (SELECT 1 FROM franchise f WHERE f.name = i.name)
+        ORDER BY i.row_number
+        RETURNING TRUE
+        """,
+        # Родители ставятся после вставки: они могут быть в том же файле.
+        # Пустой parent_name оставляет прежнего родителя
+        """
+        UPDATE franchise f
+        SET parent_id = p.franchise_id
+        FROM import_franchise i
+        JOIN franchise p ON p.name = i.parent_name
+        WHERE f.name = i.name AND f.parent_id IS DISTINCT FROM p.franchise_id
+        """,
+    ]
+)
+
+# Локация по паре (название франшизы, название локации)
+LOCATION_IMPORT = Entity(
+    "location", "Локации",
+    [
+        ("franchise_name", "VARCHAR(100)", text(100, required=True)),
+        ("name", "VARCHAR(100)", text(100, required=True)),
+        ("address", "TEXT", text()),
+        ("room_number", "VARCHAR(20)", text(20)),
+        ("is_active", "BOOLEAN", boolean),
+    ],
+    [
+        ("Локация с таким названием у этой франшизы уже встречалась в файле",
+         """EXISTS (SELECT 1 FROM import_location o
+                    WHERE o.franchise_name = i.franchise_name AND o.name = i.name
+                      AND o.row_number < i.row_number)"""),
+        ("Франшиза не найдена",
+         "NOT EXISTS (SELECT 1 FROM franchise f WHERE f.name = i.franchise_name)"),
+        ("В БД несколько франшиз с таким названием",
+         "(SELECT COUNT(*) FROM franchise f WHERE f.name = i.franchise_name) > 1"),
+        ("У франшизы несколько локаций с таким названием",
+         """(SELECT COUNT(*) FROM location l JOIN franchise f ON l.franchise_id = f.franchise_id
+             WHERE f.name = i.franchise_name AND l.name = i.name) > 1"""),
+    ],
+    [
+        """
+        UPDATE location l
+        SET address = i.address, room_number = i.room_number,
+            is_active = COALESCE(i.is_active, TRUE)
+        FROM import_location i
+        JOIN franchise f ON f.name = i.franchise_name
+        WHERE l.franchise_id = f.franchise_id AND l.name = i.name
+        RETURNING FALSE
+        """,
+        """
+        INSERT INTO location (franchise_id, name, address, room_number, is_active)
+        SELECT f.franchise_id, i.name, i.address, i.room_number, COALESCE(i.is_active, TRUE)
+        FROM import_location i
+        JOIN franchise f ON f.name = i.franchise_name
+        WHERE NOT EXISTS (
+            SELECT 1 FROM location l WHERE l.franchise_id = f.franchise_id AND l.name = i.name
+        )
+        ORDER BY i.row_number
+        RETURNING TRUE
+        """,
+    ]
+)
+
+# Устройство по инвентарному номеру (уникален в device)
+DEVICE_IMPORT = Entity(
+    "device", "Устройства",
+    [
+        ("inventory_number", "VARCHAR(50)", text(50, required=True)),
+        ("name", "VARCHAR(100)", text(100)),
+        ("device_type", "VARCHAR(50)", text(50, required=True)),
+        ("franchise_name", "VARCHAR(100)", text(100, required=True)),
+        ("location_name", "VARCHAR(100)", text(100)),
+        ("status", "VARCHAR(20)", status),
+        ("purchase_date", "DATE", date),
+        ("warranty_expiry", "DATE", date),
+        ("purchase_price", "DECIMAL(10,2)", price),
+        ("notes", "TEXT", text()),
+    ],
+    [
+        ("Устройство с таким инвентарным номером уже встречалось в файле",
+         """EXISTS (SELECT 1 FROM import_device o
+                    WHERE o.inventory_number = i.inventory_number AND o.row_number < i.row_number)"""),
+        ("Тип устройства не найден",
+         "NOT EXISTS (SELECT 1 FROM device_type t WHERE t.name = i.device_type)"),
+        ("В БД несколько типов устройств с таким названием",
+         "(SELECT COUNT(*) FROM device_type t WHERE t.name = i.device_type) > 1"),
+        ("Франшиза не найдена",
+         "NOT EXISTS (SELECT 1 FROM franchise f WHERE f.name = i.franchise_name)"),
+        ("В БД несколько франшиз с таким названием",
+         "(SELECT COUNT(*) FROM franchise f WHERE f.name = i.franchise_name) > 1"),
+        ("Локация не найдена у указанной франшизы",
+         """i.location_name IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM location l JOIN franchise f ON l.franchise_id = f.franchise_id
+                WHERE f.name = i.franchise_name AND l.name = i.location_name)"""),
+        ("У франшизы несколько локаций с таким названием",
+         """(SELECT COUNT(*) FROM location l JOIN franchise f ON l.franchise_id = f.franchise_id
+             WHERE f.name = i.franchise_name AND l.name = i.location_name) > 1"""),
+    ],
+    [
+        # Пустые необязательные ячейки оставляют прежние значения, как
+        # пустой parent_name у франшиз. Статус active - только для новых
+        """
+        UPDATE device d
+        SET name = COALESCE(i.name, d.name), device_type_id = t.device_type_id,
+            franchise_id = f.franchise_id, location_id = l.location_id,
+            status = COALESCE(i.status, d.status),
+            purchase_date = COALESCE(i.purchase_date, d.purchase_date),
+            warranty_expiry = COALESCE(i.warranty_expiry, d.warranty_expiry),
+            purchase_price = COALESCE(i.purchase_price, d.purchase_price),
+            notes = COALESCE(i.notes, d.notes),
+            updated_at = CURRENT_TIMESTAMP
+        FROM import_device i
+        JOIN device_type t ON t.name = i.device_type
+        JOIN franchise f ON f.name = i.franchise_name
+        LEFT JOIN location l ON l.franchise_id = f.franchise_id AND l.name = i.location_name
+        WHERE d.inventory_number = i.inventory_number
+        RETURNING FALSE
+        """,
+        """
+        INSERT INTO device (
+            inventory_number, name, device_type_id, franchise_id, location_id, status,
+            purchase_date, warranty_expiry, purchase_price, notes
+        )
+        SELECT i.inventory_number, i.name, t.device_type_id, f.franchise_id, l.location_id,
+               COALESCE(i.status, 'active'), i.purchase_date, i.warranty_expiry,
+               i.purchase_price, i.notes
+        FROM import_device i
+        JOIN device_type t ON t.name = i.device_type
+        JOIN franchise f ON f.name = i.franchise_name
+        LEFT JOIN location l ON l.franchise_id = f.franchise_id AND l.name = i.location_name
+        WHERE NOT EXISTS (SELECT 1 FROM device d WHERE d.inventory_number = i.inventory_number)
+        ORDER BY i.row_number
+        RETURNING TRUE
+        """,
+    ]
+)
+
+IMPORT_ENTITIES = [FRANCHISE_IMPORT, LOCATION_IMPORT, DEVICE_IMPORT]
+
+# Сколько строк файла проверяется и передается в БД за раз
+BATCH_SIZE = 5000
+
+
+def read_rows(path):
+    """Строки файла CSV или XLSX: (номер строки, {столбец: значение})
+
+    Первая строка файла - названия столбцов, номера строк считаются
+    как в табличном редакторе: заголовок - строка 1.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        rows = _read_xlsx(path)
+    elif extension in (".csv", ".txt"):
+        rows = _read_csv(path)
+    else:
+        raise ImportFileError(f"Неподдерживаемый формат файла: {extension or path}")
+
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ImportFileError("Файл пуст")
+    header = [str(name).strip().lower() if name is not None else "" for name in header]
+
+    for row_number, values in enumerate(rows, 2):
+        if not any(value not in (None, "") for value in values):
+            continue
+        yield row_number, dict(zip(header, values))
+
+
+def _read_csv(path):
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            sample = file.read(64 * 1024)
+            file.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(file, dialect)
+    except UnicodeDecodeError:
+        raise ImportFileError("Файл CSV должен быть в кодировке UTF-8")
+
+
+def _read_xlsx(path):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFileError("Для импорта XLSX нужен пакет openpyxl")
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def import_file(connection, entity, path, progress=None):
+    """Импорт файла в таблицу entity одной транзакцией
+
+    Строки проверяются и копируются в промежуточную таблицу пачками
+    через COPY, затем отбрасываются строки с неразрешимыми ссылками,
+    а остальные переносятся в целевую таблицу set-based запросами.
+    progress(прочитано строк) вызывается после каждой пачки.
+    """
+    result = ImportResult()
+    names = [name for name, _, _ in entity.columns]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TEMP TABLE {entity.staging} (
+                row_number INTEGER PRIMARY KEY,
+                {", ".join(f"{name} {sql_type}" for name, sql_type, _ in entity.columns)}
+            ) ON COMMIT DROP
+        """)
+
+        rows = read_rows(path)
+        first = next(rows, None)
+        if first is None:
+            raise ImportFileError("В файле нет строк данных")
+        missing = [name for name in names if name not in first[1]]
+        if missing:
+            raise ImportFileError(f"В файле нет столбцов: {', '.join(missing)}")
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        pending = 0
+        read = 0
+        for row_number, values in _chain(first, rows):
+            read += 1
+            parsed = [row_number]
+            problems = []
+            for name, _, parse in entity.columns:
+                try:
+                    parsed.append(parse(values.get(name)))
+                except ValueError as e:
+                    problems.append(f"{name}: {e}")
+            if problems:
+                result.errors.append((row_number, "; ".join(problems)))
+            else:
+                writer.writerow(_copy_value(value) for value in parsed)
+                pending += 1
+
+            if pending >= BATCH_SIZE:
+                _copy(cursor, entity, buffer)
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+            if progress is not None and read % BATCH_SIZE == 0:
+                progress(read)
+
+        if pending:
+            _copy(cursor, entity, buffer)
+        if progress is not None:
+            progress(read)
+
+        cursor.execute(f"ANALYZE {entity.staging}")
+        for message, condition in entity.checks:
+            cursor.execute(f"""
+                DELETE FROM {entity.staging} i
+                WHERE {condition}
+                RETURNING i.row_number
+            """)
+            result.errors.extend((row_number, message) for row_number, in cursor.fetchall())
+
+        for statement in entity.merge:
+            cursor.execute(statement)
+            if cursor.description is None:
+                continue
+            for inserted, in cursor.fetchall():
+                if inserted:
+                    result.inserted += 1
+                else:
+                    result.updated += 1
+
+    connection.commit()
+    result.errors.sort()
+    return result
+
+
+def _chain(first, rows):
+    yield first
+    yield from rows
+
+
+def _copy(cursor, entity, buffer):
+    names = ", ".join(["row_number"] + [name for name, _, _ in entity.columns])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {entity.staging} ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def _copy_value(value):
+    # В формате csv команды COPY пустое значение без кавычек - NULL
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def write_report(path, errors):
+    """Сохранение отчета об ошибках импорта в CSV"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(["Строка", "Ошибка"])
+        writer.writerows(errors)
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import os
+import sys
+
+import psycopg2
+
+from db import DatabaseSettings, connect
+from exporter import EXPORTS, export_csv
+from importer import ImportFileError, read_rows
+from repository import (
+    ARCHIVE_SEARCH_LIMIT, ARCHIVE_TABLES, BATCH_SIZE, SIMILARITY_THRESHOLD, ArchiveRepository,
+    DashboardRepository, DeviceRepository, FranchiseRepository, LocationRepository, RepositoryError,
+    SpecRepository
+)
+from snapshot import SNAPSHOT_MAX_AGE
+from specs import SpecCatalog, SpecQueryError
+
+
+def deactivate_locations(connection, args):
+    """Деактивация локаций франшизы и всех ее дочерних франшиз"""
+    location_ids = LocationRepository(connection).deactivate_subtree(args.franchise_id)
+    return f"Деактивировано локаций: {len(location_ids)}"
+
+
+def read_moves(path):
+    """Пары (инвентарный номер, id локации) из файла со столбцами inventory_number, location_id"""
+    moves = []
+    for row_number, values in read_rows(path):
+        inventory_number = str(values.get("inventory_number") or "").strip()
+        try:
+            location_id = int(values.get("location_id"))
+        except (TypeError, ValueError):
+            raise ImportFileError(f"Строка {row_number}: некорректный location_id")
+        if not inventory_number:
+            raise ImportFileError(f"Строка {row_number}: не указан inventory_number")
+        moves.append((inventory_number, location_id))
+    return moves
+
+
+def move_devices(connection, args):
+    """Перемещение устройств из локации в локацию или по списку из файла"""
+    devices = DeviceRepository(connection)
+    if args.file:
+        moves = read_moves(args.file)
+        device_ids = devices.move_by_inventory_number(moves)
+        return f"Перемещено устройств: {len(device_ids)} из {len(moves)}"
+    if args.from_location is None or args.to_location is None:
+        raise RepositoryError("Нужно указать --file или обе локации --from-location и --to-location")
+    device_ids = devices.move_from_location(args.from_location, args.to_location)
+    return f"Перемещено устройств: {len(device_ids)}"
+
+
+def export_reports(connection, args):
+    """Выгрузка отчетов в CSV-файлы каталога"""
+    os.makedirs(args.output_dir, exist_ok=True)
+    names = set(args.only.split(",")) if args.only else None
+    lines = []
+    for export in EXPORTS:
+        if names is not None and export.name not in names:
+            continue
+        path = os.path.join(args.output_dir, f"{export.name}.csv")
+        rows = export_csv(connection, export, path)
+        lines.append(f"{export.title}: {rows} строк -> {path}")
+    return "\n".join(lines)
+
+
+def rebuild_dashboard(connection, args):
+    """Полный пересчет сводки для панели показателей"""
+    DashboardRepository(connection).rebuild()
+    return "Сводка пересчитана"
+
+
+def find_duplicates(connection, args):
+    """Группы похожих франшиз или локаций в CSV на stdout"""
+    repository = FranchiseRepository if args.table == "franchise" else LocationRepository
+    rows = repository(connection).duplicates(args.threshold)
+    connection.rollback()
+    csv.writer(sys.stdout).writerows(rows)
+    return f"Групп: {len({row[0] for row in rows})}, записей в них: {len(rows)}"
+
+
+def archive(connection, args):
+    """Перенос старых записей в архив и очистка архива по срокам хранения
+
+    В отличие от других команд, каждая пачка - отдельная транзакция:
+    прерванный перенос сохраняет уже перенесенное, а пользователи не
+    ждут конца всего переноса. С --dry-run откатываются все пачки.
+    Заодно удаляются записи об удаленных строках, которые уже не нужны
+    локальным снимкам приложения.
+    """
+    repository = ArchiveRepository(connection)
+
+    def run_batches(step, table_name):
+        total = 0
+        while count := step(table_name, args.batch_size):
+            total += count
+            if not args.dry_run:
+                connection.commit()
+        return total
+
+    lines = []
+    for table_name in ARCHIVE_TABLES:
+        moved = run_batches(repository.archive_batch, table_name)
+        purged = run_batches(repository.purge_batch, table_name)
+        lines.append(f"{table_name}: перенесено в архив {moved}, удалено из архива {purged}")
+    # Перенос в архив удаляет строки, и записи о них копятся в deleted_row
+    purged = repository.purge_deleted_rows(SNAPSHOT_MAX_AGE)
+    lines.append(f"deleted_row: удалено записей старше {SNAPSHOT_MAX_AGE}: {purged}")
+    return "\n".join(lines)
+
+
+def archive_policy(connection, args):
+    """Показ или изменение сроков архивации и хранения в архиве"""
+    repository = ArchiveRepository(connection)
+    if args.table:
+        current = {row[0]: row[1:] for row in repository.policy()}
+        archive_after, purge_after = current[args.table]
+        if args.archive_after is not None:
+            archive_after = args.archive_after
+        if args.purge_after is not None:
+            purge_after = None if args.purge_after == "never" else args.purge_after
+        repository.set_policy(args.table, archive_after, purge_after)
+    return "\n".join(
+        f"{table_name}: в архив через {archive_after}, хранить в архиве {purge_after or 'бессрочно'}"
+        for table_name, archive_after, purge_after in repository.policy()
+    )
+
+
+def archive_search(connection, args):
+    """Записи архива в CSV на stdout"""
+    rows = ArchiveRepository(connection).search(args.table, args.text, args.franchise, args.limit)
+    connection.rollback()
+    csv.writer(sys.stdout).writerows(rows)
+    return f"Найдено в архиве: {len(rows)}"
+
+
+def archive_restore(connection, args):
+    """Восстановление записей из архива"""
+    count = ArchiveRepository(connection).restore(args.table, args.ids)
+    return f"Восстановлено: {count} из {len(args.ids)}"
+
+
+def spec_search(connection, args):
+    """Устройства, подходящие под запрос по характеристикам, в CSV на stdout"""
+    rows = SpecRepository(connection, SpecCatalog()).search(args.query, args.franchise, not args.no_subtree)
+    writer = csv.writer(sys.stdout)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    connection.rollback()
+    return f"Найдено устройств: {count}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Массовые операции над БД FCAS без запуска окна программы"
+    )
+    parser.add_argument("--dsn", help="строка подключения (по умолчанию FCAS_DSN)")
+    parser.add_argument("--dry-run", action="store_true", help="выполнить и откатить изменения")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("deactivate-locations",
+                                  help="деактивировать локации франшизы и ее дочерних франшиз")
+    command.add_argument("franchise_id", type=int)
+    command.set_defaults(run=deactivate_locations)
+
+    command = commands.add_parser("move-devices", help="переместить устройства в другую локацию")
+    command.add_argument("--from-location", type=int, help="все устройства этой локации")
+    command.add_argument("--to-location", type=int, help="локация назначения")
+    command.add_argument("--file", help="CSV или XLSX со столбцами inventory_number, location_id")
+    command.set_defaults(run=move_devices)
+
+    command = commands.add_parser("export", help="выгрузить отчеты в CSV")
+    command.add_argument("--output-dir", default=".", help="каталог для файлов")
+    command.add_argument("--only", help="выгрузки через запятую: " + ",".join(e.name for e in EXPORTS))
+    command.set_defaults(run=export_reports)
+
+    command = commands.add_parser("rebuild-dashboard", help="пересчитать сводку панели показателей")
+    command.set_defaults(run=rebuild_dashboard)
+
+    command = commands.add_parser("find-duplicates", help="найти группы похожих франшиз или локаций")
+    command.add_argument("table", choices=["franchise", "location"])
+    command.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD,
+                         help=f"похожесть названий и адресов от 0 до 1 (по умолчанию {SIMILARITY_THRESHOLD})")
+    command.set_defaults(run=find_duplicates)
+
+    command = commands.add_parser("archive", help="перенести старые записи в архив и очистить архив")
+    command.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                         help=f"записей в одной транзакции (по умолчанию {BATCH_SIZE})")
+    command.set_defaults(run=archive)
+
+    command = commands.add_parser("archive-policy", help="показать или изменить сроки архивации")
+    command.add_argument("table", nargs="?", choices=ARCHIVE_TABLES)
+    command.add_argument("--archive-after", help='срок до переноса в архив, например "180 days"')
+    command.add_argument("--purge-after", help='срок хранения в архиве, например "5 years", или never')
+    command.set_defaults(run=archive_policy)
+
+    command = commands.add_parser("archive-search", help="найти записи в архиве")
+    command.add_argument("table", choices=ARCHIVE_TABLES)
+    command.add_argument("text", nargs="?", default="", help="часть названия, адреса или инв. номера")
+    command.add_argument("--franchise", type=int, help="только записи франшизы")
+    command.add_argument("--limit", type=int, default=ARCHIVE_SEARCH_LIMIT)
+    command.set_defaults(run=archive_search)
+
+    command = commands.add_parser("archive-restore", help="восстановить записи из архива")
+    command.add_argument("table", choices=ARCHIVE_TABLES)
+    command.add_argument("ids", type=int, nargs="+")
+    command.set_defaults(run=archive_restore)
+
+    command = commands.add_parser("spec-search", help="найти устройства по характеристикам")
+    command.add_argument("query", help='например "RAM Size >= 16 AND CPU Cores >= 8"')
+    command.add_argument("--franchise", type=int, help="только франшиза с дочерними")
+    command.add_argument("--no-subtree", action="store_true", help="без дочерних франшиз")
+    command.set_defaults(run=spec_search)
+
+    args = parser.parse_args()
+
+    settings = DatabaseSettings.from_env()
+    if args.dsn:
+        settings.dsn = args.dsn
+    try:
+        connection = connect(settings, application_name="fcas-maintenance")
+    except psycopg2.Error as e:
+        print(f"Ошибка подключения: {e}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        # Каждая команда - одна транзакция
+        message = args.run(connection, args)
+        if args.dry_run:
+            connection.rollback()
+            message += " (изменения откачены)"
+        else:
+            connection.commit()
+        print(message, file=sys.stderr)
+    except (psycopg2.Error, RepositoryError, ImportFileError, SpecQueryError, OSError) as e:
+        connection.rollback()
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
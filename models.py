@@ -0,0 +1,404 @@
+from PyQt6.QtCore import Qt, QAbstractItemModel, QAbstractTableModel, QModelIndex, pyqtSignal
+
+
+class LazyQueryModel(QAbstractTableModel):
+    """Табличная модель, подгружающая строки страницами по мере прокрутки
+
+    Страницы читаются запросом KeysetQuery через исполнитель запросов,
+    поэтому прокрутка не блокирует GUI-поток ожиданием БД. Сортировка
+    по столбцу выполняется на сервере повторной загрузкой.
+
+    Первый элемент строки - ключ записи. Строка может содержать больше
+    значений, чем столбцов: хвостовые значения не отображаются.
+    Изменения записей применяются к модели точечно, без перезагрузки.
+    """
+
+    PAGE_SIZE = 256
+
+    error = pyqtSignal(object)
+    # Все страницы запроса прочитаны
+    loaded = pyqtSignal()
+
+    def __init__(self, headers, executor, parent=None):
+        super().__init__(parent)
+        self._headers = list(headers)
+        self._executor = executor
+        self._key = f"model_{id(self)}"
+        # Строки храним кортежами, как их вернул запрос
+        self._rows = []
+        self._positions = {}
+        # Добавленные записи, которые покажем после последней страницы
+        self._pending_inserts = []
+        self._query = None
+        # Последняя прочитанная из БД строка - граница следующей страницы
+        self._last_row = None
+        self._exhausted = True
+        self._fetching = False
+        self._fetch_all = False
+        self._sort_column = 0
+        self._descending = False
+
+    def reset(self, query):
+        """Загрузка первой страницы нового запроса"""
+        self.clear()
+        self._query = query
+        self._exhausted = False
+        self.fetchMore(QModelIndex())
+
+    def show_rows(self, rows):
+        """Показ готового списка строк без запроса к БД, например из локального снимка
+
+        Такой список сортируется в памяти, точечные перечитывания
+        записей к нему не применяются.
+        """
+        self.clear()
+        self._query = None
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._sort_rows()
+        self.endResetModel()
+
+    def reload(self):
+        """Повторная загрузка текущего запроса"""
+        if self._query is not None:
+            self.reset(self._query)
+
+    def clear(self):
+        """Очистка модели"""
+        self._executor.cancel(self._key)
+        self.beginResetModel()
+        self._rows = []
+        self._positions = {}
+        self._pending_inserts = []
+        self._last_row = None
+        self._exhausted = True
+        self._fetching = False
+        self._fetch_all = False
+        self.endResetModel()
+
+    def is_loading(self):
+        """Не все страницы запроса еще прочитаны"""
+        return not self._exhausted
+
+    def fetch_all(self):
+        """Чтение всех оставшихся страниц, по окончании - сигнал loaded"""
+        if self._exhausted:
+            self.loaded.emit()
+            return
+        self._fetch_all = True
+        self.fetchMore(QModelIndex())
+
+    def find_row(self, key):
+        """Номер строки с ключом key или -1"""
+        if self._positions is None:
+            self._positions = {row[0]: i for i, row in enumerate(self._rows)}
+        return self._positions.get(key, -1)
+
+    def insert_row(self, row):
+        """Добавление новой записи в конец таблицы"""
+        if self.is_loading():
+            # Запись может прийти и с одной из следующих страниц,
+            # иначе добавим ее после последней
+            self._pending_inserts.append(row)
+            return
+        self._append_rows([row])
+
+    def update_row(self, row):
+        """Замена записи с тем же ключом"""
+        position = self.find_row(row[0])
+        if position >= 0:
+            self._rows[position] = row
+            self.dataChanged.emit(
+                self.index(position, 0), self.index(position, self.columnCount() - 1)
+            )
+
+    def remove_row(self, key):
+        """Удаление записи по ключу"""
+        self._pending_inserts = [row for row in self._pending_inserts if row[0] != key]
+        position = self.find_row(key)
+        if position >= 0:
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self._rows[position]
+            self._positions = None
+            self.endRemoveRows()
+
+    def keys(self, predicate=None):
+        """Ключи загруженных строк, для которых predicate(row) истинно"""
+        return [row[0] for row in self._rows if predicate is None or predicate(row)]
+
+    def refresh_rows(self, keys):
+        """Перечитывание записей по ключам, например после изменения в другом окне
+
+        Записи, подходящие под условия запроса, обновляются или
+        добавляются, остальные (удаленные или больше не подходящие)
+        убираются из модели.
+        """
+        keys = set(keys)
+        if self._query is None or not keys:
+            return
+        query = self._query
+        sql, params = query.rows(keys)
+
+        def fetch(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+
+        def done(rows):
+            if self._query is not query:
+                # Пока читали, модель переключилась на другой запрос
+                return
+            for row in rows:
+                keys.discard(row[0])
+                if self.find_row(row[0]) >= 0:
+                    self.update_row(row)
+                else:
+                    self.insert_row(row)
+            for key in keys:
+                self.remove_row(key)
+
+        self._executor.submit(
+            fetch, on_result=done, on_error=self.error.emit, caller=self._caller("refresh_rows")
+        )
+
+    def patch_rows(self, patch):
+        """Применение patch(row) к загруженным строкам
+
+        patch возвращает новую строку или None, если строку менять не нужно.
+        Следующие страницы читаются из БД и уже содержат изменения.
+        """
+        for position, row in enumerate(self._rows):
+            patched = patch(row)
+            if patched is not None:
+                self._rows[position] = patched
+                self.dataChanged.emit(
+                    self.index(position, 0), self.index(position, self.columnCount() - 1)
+                )
+
+    def _rows_fetched(self, rows):
+        self._fetching = False
+        if rows:
+            self._last_row = rows[-1]
+        if len(rows) < self.PAGE_SIZE:
+            self._exhausted = True
+            rows = rows + self._pending_inserts
+            self._pending_inserts = []
+        self._append_rows(rows)
+
+        if self._exhausted:
+            self._fetch_all = False
+            self.loaded.emit()
+        elif self._fetch_all:
+            self.fetchMore(QModelIndex())
+
+    def _append_rows(self, rows):
+        # Измененная запись может сместиться в еще не прочитанную часть
+        # выборки и прийти повторно, такие строки пропускаем
+        rows = [row for row in rows if self.find_row(row[0]) < 0]
+        if not rows:
+            return
+
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        for i, row in enumerate(rows, first):
+            self._positions[row[0]] = i
+        self.endInsertRows()
+
+    def _fetch_failed(self, error):
+        self._fetching = False
+        self._exhausted = True
+        self._fetch_all = False
+        self.error.emit(error)
+
+    def row(self, row):
+        """Кортеж значений строки"""
+        return self._rows[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._headers)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return not self._exhausted and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        self._fetching = True
+        sql, params = self._query.page(
+            self._last_row, self.PAGE_SIZE, self._sort_column, self._descending
+        )
+
+        def fetch_page(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+
+        self._executor.submit(
+            fetch_page, on_result=self._rows_fetched, on_error=self._fetch_failed,
+            key=self._key, caller=self._caller("fetchMore")
+        )
+
+    def _caller(self, action):
+        # В статистике запросов модели различаются по objectName
+        name = self.objectName()
+        return f"LazyQueryModel({name}).{action}" if name else None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        descending = order == Qt.SortOrder.DescendingOrder
+        if (column, descending) == (self._sort_column, self._descending):
+            return
+        self._sort_column = column
+        self._descending = descending
+        if self._query is None:
+            self.beginResetModel()
+            self._sort_rows()
+            self.endResetModel()
+        else:
+            self.reload()
+
+    def _sort_rows(self):
+        column = self._sort_column
+        # NULL при сортировке идут первыми, как пустые строки на сервере
+        self._rows.sort(
+            key=lambda row: (row[column] is not None, row[column] if row[column] is not None else 0),
+            reverse=self._descending
+        )
+        self._positions = None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self._rows[index.row()][index.column()]
+        return str(value) if value is not None else ""
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+
+class TreeNode:
+    """Узел дерева: значения столбцов и дочерние узлы"""
+
+    __slots__ = ("key", "values", "parent", "children", "row")
+
+    def __init__(self, key, values, parent=None):
+        self.key = key
+        self.values = values
+        self.parent = parent
+        self.children = []
+        self.row = 0
+
+
+class TreeModel(QAbstractItemModel):
+    """Древовидная модель, строящаяся по списку строк (ключ, ключ родителя, значения...)
+
+    Строки, родитель которых отсутствует или недостижим от корня
+    (например, из-за цикла в данных), показываются на верхнем уровне.
+    """
+
+    def __init__(self, headers, parent=None):
+        super().__init__(parent)
+        self._headers = list(headers)
+        self._root = TreeNode(None, ())
+        self._nodes = {}
+
+    def reset(self, rows):
+        """Построение дерева из строк (key, parent_key, *values)"""
+        self.beginResetModel()
+        self._root = TreeNode(None, ())
+        self._nodes = {key: TreeNode(key, tuple(values)) for key, _, *values in rows}
+
+        attached = set()
+        for key, parent_key, *_ in rows:
+            node = self._nodes[key]
+            parent = self._nodes.get(parent_key)
+            if parent is None:
+                self._attach(self._root, node)
+                attached.add(key)
+            else:
+                node.parent = parent
+
+        # Узлы, достижимые от корня, привязываем к родителям сверху вниз
+        children = {}
+        for node in self._nodes.values():
+            if node.key not in attached:
+                children.setdefault(node.parent.key, []).append(node)
+        stack = list(self._root.children)
+        while stack:
+            node = stack.pop()
+            for child in children.pop(node.key, ()):
+                self._attach(node, child)
+                stack.append(child)
+
+        # Оставшиеся узлы образуют циклы
+        for orphans in children.values():
+            for node in orphans:
+                self._attach(self._root, node)
+        self.endResetModel()
+
+    def _attach(self, parent, node):
+        node.parent = parent
+        node.row = len(parent.children)
+        parent.children.append(node)
+
+    def keys(self):
+        """Ключи всех узлов"""
+        return self._nodes.keys()
+
+    def node(self, index):
+        """Узел по индексу модели"""
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index_of(self, key):
+        """Индекс узла по ключу"""
+        node = self._nodes.get(key)
+        if node is None:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def index(self, row, column, parent=QModelIndex()):
+        parent_node = self.node(parent)
+        if not (0 <= row < len(parent_node.children)) or not (0 <= column < len(self._headers)):
+            return QModelIndex()
+        return self.createIndex(row, column, parent_node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self._headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = index.internalPointer().values[index.column()]
+        return str(value) if value is not None else ""
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return None
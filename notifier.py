@@ -0,0 +1,116 @@
+import json
+import select
+import threading
+
+import psycopg2
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+# Канал уведомлений, в который пишут триггеры notify_changes()
+CHANNEL = "fcas_changes"
+
+# Сколько копить уведомления перед применением, мс
+CHANGE_DELAY = 250
+
+# Пауза перед повторным подключением после разрыва, с
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+
+class ChangeListener(QObject):
+    """Прием уведомлений об изменениях на отдельном соединении
+
+    Соединение слушает канал в фоновом потоке и не берется из пула.
+    После разрыва оно восстанавливается; уведомления, пришедшие за
+    время разрыва, потеряны, поэтому испускается сигнал reconnected.
+    """
+
+    # Таблица, операция (I, U, D) и id измененных строк
+    changed = pyqtSignal(str, str, list)
+    reconnected = pyqtSignal()
+
+    def __init__(self, settings, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fcas-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        connected_before = False
+        failures = 0
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(
+                    self.settings.dsn, application_name="fcas-listener",
+                    connect_timeout=self.settings.connect_timeout
+                )
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                if connected_before:
+                    self.reconnected.emit()
+                connected_before = True
+                failures = 0
+                self._listen(connection)
+            except psycopg2.Error:
+                delay = RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)]
+                failures += 1
+                self._stopping.wait(delay)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _listen(self, connection):
+        while not self._stopping.is_set():
+            # Ждем с таймаутом, чтобы вовремя заметить остановку
+            if select.select([connection], [], [], 1.0) == ([], [], []):
+                continue
+            connection.poll()
+            while connection.notifies:
+                notify = connection.notifies.pop(0)
+                try:
+                    payload = json.loads(notify.payload)
+                    self.changed.emit(payload["table"], payload["op"], payload["ids"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+
+class ChangeBatcher(QObject):
+    """Накопление уведомлений и применение их пачкой
+
+    За время CHANGE_DELAY уведомления по одной таблице объединяются
+    в одно множество id, так что серия изменений одной записи или
+    групповая операция приводят к одному перечитыванию.
+    """
+
+    # {таблица: множество id}
+    flushed = pyqtSignal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._changes = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(CHANGE_DELAY)
+        self._timer.timeout.connect(self.flush)
+
+    def add(self, table, op, ids):
+        self._changes.setdefault(table, set()).update(ids)
+        # Таймер не перезапускается: при непрерывном потоке изменений
+        # они все равно применяются не реже раза за CHANGE_DELAY
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        changes, self._changes = self._changes, {}
+        if changes:
+            self.flushed.emit(changes)
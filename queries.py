@@ -0,0 +1,98 @@
+# Статусы устройства (ограничение CHECK таблицы device) и их названия
+DEVICE_STATUSES = [
+    ("active", "Активно"),
+    ("in_repair", "В ремонте"),
+    ("decommissioned", "Списано"),
+    ("lost", "Утеряно"),
+]
+
+
+def like_pattern(text):
+    """Шаблон ILIKE для поиска подстроки с экранированием спецсимволов"""
+    return f"%{like_escape(text)}%"
+
+
+def like_prefix(text):
+    """Шаблон LIKE для поиска по началу строки; такой поиск использует индекс"""
+    return f"{like_escape(text)}%"
+
+
+def like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class KeysetQuery:
+    """Запрос списка, читаемый страницами по ключу (keyset pagination)
+
+    Следующая страница выбирается условием (значение сортировки, ключ) >
+    (значения последней прочитанной строки), поэтому ее стоимость не
+    зависит от того, сколько строк уже прочитано, в отличие от OFFSET.
+
+    select - значения строки, первое из них - ключ записи.
+    sort_expressions - по одному на отображаемый столбец: SQL-выражение
+    сортировки без NULL и значение, которым в нем заменяется NULL.
+    source_params - параметры, встречающиеся в source.
+    """
+
+    def __init__(self, select, source, key, sort_expressions, source_params=()):
+        self.select = select
+        self.source = source
+        self.key = key
+        self.sort_expressions = sort_expressions
+        self.source_params = list(source_params)
+        self.conditions = []
+        self.params = []
+
+    def join(self, clause, *params):
+        """Добавление соединения к источнику строк"""
+        self.source = f"{self.source}\n{clause}"
+        self.source_params.extend(params)
+        return self
+
+    def where(self, condition, *params):
+        """Добавление условия фильтра"""
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def page(self, after, limit, column=0, descending=False):
+        """SQL и параметры страницы, следующей за строкой after"""
+        conditions = list(self.conditions)
+        params = self.source_params + self.params
+        direction = "DESC" if descending else "ASC"
+        compare = "<" if descending else ">"
+
+        expression, null_value = self.sort_expressions[column]
+        if expression == self.key:
+            order = f"{self.key} {direction}"
+            if after is not None:
+                conditions.append(f"{self.key} {compare} %s")
+                params.append(after[0])
+        else:
+            order = f"{expression} {direction}, {self.key} {direction}"
+            if after is not None:
+                conditions.append(f"({expression}, {self.key}) {compare} (%s, %s)")
+                value = after[column]
+                params.extend((null_value if value is None else value, after[0]))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"""
+            SELECT {self.select}
+            {self.source}
+            {where}
+            ORDER BY {order}
+            LIMIT %s
+        """
+        params.append(limit)
+        return sql, params
+
+    def rows(self, keys):
+        """SQL и параметры для чтения записей с ключами keys с учетом условий"""
+        conditions = self.conditions + [f"{self.key} = ANY(%s)"]
+        params = self.source_params + self.params + [list(keys)]
+        sql = f"""
+            SELECT {self.select}
+            {self.source}
+            WHERE {' AND '.join(conditions)}
+        """
+        return sql, params
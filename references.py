@@ -0,0 +1,171 @@
+import threading
+from bisect import bisect_left
+
+
+# Запросы справочников: первые два столбца - id и название
+REFERENCE_QUERIES = {
+    "franchise": "SELECT franchise_id, name FROM franchise",
+    "device_type": "SELECT device_type_id, name FROM device_type",
+    "component_type": "SELECT component_type_id, name FROM component_type",
+    "spec_attribute": "SELECT spec_attribute_id, name, data_type, unit FROM spec_attribute",
+}
+
+# Сколько совпадений показывать при поиске по названию
+MATCH_LIMIT = 50
+
+
+class ReferenceList:
+    """Неизменяемый список строк справочника по алфавиту с индексом поиска
+
+    Строки начинаются с id и названия. Префикс названия ищется делением
+    пополам по отсортированному списку, короткий запрос - еще и по
+    началам слов, запрос от трех символов - как подстрока через индекс
+    триграмм. Индекс строится при первом поиске или в prepare().
+    """
+
+    def __init__(self, rows, version=None):
+        self.rows = sorted(rows, key=lambda row: ((row[1] or "").casefold(), row[0]))
+        self.version = version
+        self._keys = [(row[1] or "").casefold() for row in self.rows]
+        self._positions = {row[0]: position for position, row in enumerate(self.rows)}
+        self._words = None
+        self._trigrams = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, position):
+        return self.rows[position]
+
+    def position(self, row_id):
+        """Позиция строки по id или -1"""
+        return self._positions.get(row_id, -1)
+
+    def name(self, row_id):
+        position = self._positions.get(row_id)
+        return self.rows[position][1] if position is not None else None
+
+    def prepare(self):
+        """Построение индекса поиска, например в фоновом потоке"""
+        if self._trigrams is not None:
+            return
+        words = []
+        trigrams = {}
+        for position, key in enumerate(self._keys):
+            # Первое слово уже найдется по префиксу всего названия
+            words.extend((word, position) for word in key.split()[1:])
+            for gram in {key[i:i + 3] for i in range(len(key) - 2)}:
+                trigrams.setdefault(gram, []).append(position)
+        words.sort()
+        self._words = words
+        self._trigrams = trigrams
+
+    def search(self, text, limit=MATCH_LIMIT):
+        """Строки, название которых начинается с text или содержит его
+
+        Сначала идут совпадения с начала названия, затем остальные, те
+        и другие по алфавиту.
+        """
+        text = text.strip().casefold()
+        if not text:
+            return []
+        self.prepare()
+
+        start = bisect_left(self._keys, text)
+        end = start
+        while end < len(self._keys) and end - start < limit and self._keys[end].startswith(text):
+            end += 1
+        found = list(range(start, end))
+        if len(found) >= limit:
+            return [self.rows[position] for position in found]
+
+        if len(text) >= 3:
+            # Кандидаты - строки с самой редкой триграммой запроса
+            grams = [self._trigrams.get(text[i:i + 3], []) for i in range(len(text) - 2)]
+            candidates = min(grams, key=len)
+            others = [p for p in candidates if text in self._keys[p] and not start <= p < end]
+        else:
+            index = bisect_left(self._words, (text,))
+            others = set()
+            while index < len(self._words) and self._words[index][0].startswith(text):
+                position = self._words[index][1]
+                if not start <= position < end:
+                    others.add(position)
+                index += 1
+            others = sorted(others)
+        found.extend(others[:limit - len(found)])
+        return [self.rows[position] for position in found]
+
+    def with_row(self, row):
+        """Копия списка с добавленной или замененной строкой"""
+        return ReferenceList([r for r in self.rows if r[0] != row[0]] + [row], self.version)
+
+    def without(self, row_id):
+        """Копия списка без строки"""
+        return ReferenceList([r for r in self.rows if r[0] != row_id], self.version)
+
+
+class ReferenceCache:
+    """Справочники, общие для всех вкладок процесса
+
+    Перед выдачей списков кэш одним запросом сверяет их версии с таблицей
+    reference_version и перечитывает только изменившиеся. Пока версия
+    не изменилась, выдается тот же объект списка, поэтому выпадающие
+    списки могут не перестраиваться. Кэш используется из рабочих
+    потоков, списки неизменяемы, словарь защищен блокировкой.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lists = {}
+
+    def get(self, connection, *names):
+        """Актуальные списки справочников {название: ReferenceList}"""
+        with connection.cursor() as cursor:
+            # Версии читаются до строк: строки не могут оказаться старше версии
+            cursor.execute(
+                "SELECT table_name, version FROM reference_version WHERE table_name = ANY(%s)",
+                (list(names),)
+            )
+            versions = dict(cursor.fetchall())
+            result = {}
+            for name in names:
+                with self._lock:
+                    cached = self._lists.get(name)
+                version = versions.get(name)
+                if cached is None or version is None or cached.version != version:
+                    cursor.execute(REFERENCE_QUERIES[name])
+                    cached = ReferenceList(cursor.fetchall(), version)
+                    cached.prepare()
+                    with self._lock:
+                        self._lists[name] = cached
+                result[name] = cached
+        return result
+
+    def cached(self, name):
+        """Список из кэша без обращения к серверу или None"""
+        with self._lock:
+            return self._lists.get(name)
+
+    def replace(self, name, old, new):
+        """Замена списка измененной копией, если его не успели перечитать
+
+        Версия копии остается прежней, поэтому при следующем get() список
+        все равно сверится с сервером.
+        """
+        with self._lock:
+            if self._lists.get(name) is old:
+                self._lists[name] = new
+                return True
+            return False
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._lists.clear()
+            else:
+                self._lists.pop(name, None)
+
+
+# Общий кэш процесса
+REFERENCES = ReferenceCache()
@@ -0,0 +1,956 @@
+import threading
+import weakref
+from dataclasses import dataclass, fields, replace
+
+from psycopg2.extras import execute_values
+
+from diagnostics import register_prepared
+from queries import DEVICE_STATUSES, KeysetQuery, like_pattern
+from specs import apply_spec_conditions, parse_spec_query
+
+
+# Значения строки таблицы франшиз (f - франшиза, p - родитель).
+# Хвостовые значения не отображаются: строка хранит запись целиком,
+# чтобы форма заполнялась без обращения к БД
+FRANCHISE_ROW = """
+    f.franchise_id, f.name, p.name as parent_name,
+    f.contact_phone, f.is_active,
+    f.parent_id, f.address, f.email, f.version
+"""
+
+# Значения строки таблицы локаций (l - локация, f - франшиза)
+LOCATION_ROW = """
+    l.location_id, f.name as franchise_name,
+    l.name, l.address, l.is_active,
+    l.franchise_id, l.room_number, l.version
+"""
+
+# Выражения сортировки по столбцам таблиц и замена NULL в них
+FRANCHISE_SORT = [
+    ("f.franchise_id", None),
+    ("f.name", None),
+    ("COALESCE(p.name, '')", ""),
+    ("COALESCE(f.contact_phone, '')", ""),
+    ("COALESCE(f.is_active, FALSE)", False),
+]
+
+LOCATION_SORT = [
+    ("l.location_id", None),
+    ("f.name", None),
+    ("l.name", None),
+    ("COALESCE(l.address, '')", ""),
+    ("COALESCE(l.is_active, FALSE)", False),
+]
+
+# Проверка перед удалением франшизы: есть ли дочерние франшизы и
+# локации. EXISTS останавливается на первой найденной строке
+FRANCHISE_DELETE_CHECK = """
+    SELECT EXISTS (SELECT 1 FROM franchise WHERE parent_id = %(id)s),
+           EXISTS (SELECT 1 FROM location WHERE franchise_id = %(id)s)
+"""
+
+# Франшиза вместе со всеми дочерними
+FRANCHISE_SUBTREE_IDS = """
+    WITH RECURSIVE subtree AS (
+        SELECT %s::integer AS franchise_id
+        UNION
+        SELECT f.franchise_id FROM franchise f JOIN subtree s ON f.parent_id = s.franchise_id
+    )
+    SELECT franchise_id FROM subtree
+"""
+
+FRANCHISE_SUBTREE = f"d.franchise_id IN ({FRANCHISE_SUBTREE_IDS})"
+
+STATUS_NAME = "CASE d.status {} END".format(
+    " ".join(f"WHEN '{status}' THEN '{name}'" for status, name in DEVICE_STATUSES)
+)
+
+# Значения строки таблицы устройств (d - устройство, t - тип,
+# f - франшиза, l - локация). Хвостовые значения не отображаются
+DEVICE_ROW = f"""
+    d.device_id, d.inventory_number, d.name, t.name as type_name,
+    f.name as franchise_name, l.name as location_name,
+    {STATUS_NAME} as status_name,
+    d.device_type_id, d.franchise_id, d.location_id, d.status
+"""
+
+DEVICE_SOURCE = """
+    JOIN device_type t ON d.device_type_id = t.device_type_id
+    JOIN franchise f ON d.franchise_id = f.franchise_id
+    LEFT JOIN location l ON d.location_id = l.location_id
+"""
+
+# Выражения сортировки по столбцам таблицы и замена NULL в них
+DEVICE_SORT = [
+    ("d.device_id", None),
+    ("COALESCE(d.inventory_number, '')", ""),
+    ("COALESCE(d.name, '')", ""),
+    ("t.name", None),
+    ("f.name", None),
+    ("COALESCE(l.name, '')", ""),
+    (f"COALESCE({STATUS_NAME}, '')", ""),
+]
+
+# Значения строки результата поиска по характеристикам до значений
+# найденных характеристик
+SPEC_ROW = """
+    d.device_id, d.inventory_number, d.name, t.name as type_name,
+    f.name as franchise_name, l.name as location_name
+"""
+
+# Размер страницы при чтении всех строк запроса
+PAGE_SIZE = 5000
+
+# Сколько строк отправляется на сервер одним запросом execute_values
+BATCH_SIZE = 1000
+
+
+def franchise_query(search="", is_active=None):
+    """Запрос таблицы франшиз с учетом поиска и фильтра активности"""
+    query = KeysetQuery(
+        FRANCHISE_ROW,
+        "FROM franchise f LEFT JOIN franchise p ON f.parent_id = p.franchise_id",
+        "f.franchise_id", FRANCHISE_SORT
+    )
+    if search:
+        pattern = like_pattern(search)
+        query.where("(f.name ILIKE %s OR f.address ILIKE %s)", pattern, pattern)
+    if is_active is not None:
+        query.where("f.is_active = %s", is_active)
+    return query
+
+
+def location_query(search="", franchise_id=None, is_active=None):
+    """Запрос таблицы локаций с учетом поиска и фильтров"""
+    query = KeysetQuery(
+        LOCATION_ROW,
+        "FROM location l JOIN franchise f ON l.franchise_id = f.franchise_id",
+        "l.location_id", LOCATION_SORT
+    )
+    if search:
+        pattern = like_pattern(search)
+        query.where("(l.name ILIKE %s OR l.address ILIKE %s)", pattern, pattern)
+    if franchise_id is not None:
+        query.where("l.franchise_id = %s", franchise_id)
+    if is_active is not None:
+        query.where("l.is_active = %s", is_active)
+    return query
+
+
+def device_query(search="", franchise_id=None, location_id=None, status=None, type_id=None):
+    """Запрос таблицы устройств с учетом поиска и фильтров"""
+    query = KeysetQuery(DEVICE_ROW, f"FROM device d {DEVICE_SOURCE}", "d.device_id", DEVICE_SORT)
+    if search:
+        pattern = like_pattern(search)
+        query.where("(d.name ILIKE %s OR d.inventory_number ILIKE %s)", pattern, pattern)
+    if franchise_id is not None:
+        query.where("d.franchise_id = %s", franchise_id)
+    if location_id is not None:
+        query.where("d.location_id = %s", location_id)
+    if status is not None:
+        query.where("d.status = %s", status)
+    if type_id is not None:
+        query.where("d.device_type_id = %s", type_id)
+    return query
+
+
+def spec_query(conditions, franchise_id=None, subtree=True):
+    """Запрос устройств по условиям на характеристики, со значениями этих характеристик"""
+    query = KeysetQuery(SPEC_ROW, f"FROM device d {DEVICE_SOURCE}", "d.device_id", DEVICE_SORT[:6])
+    values = apply_spec_conditions(query, conditions)
+    query.select = ", ".join([SPEC_ROW] + values)
+    query.sort_expressions = query.sort_expressions + [(value, None) for value in values]
+
+    if franchise_id is not None:
+        if subtree:
+            query.where(FRANCHISE_SUBTREE, franchise_id)
+        else:
+            query.where("d.franchise_id = %s", franchise_id)
+    return query
+
+
+def query_rows(cursor, query, page_size=PAGE_SIZE):
+    """Все строки запроса по страницам: сервер не строит весь результат сразу"""
+    after = None
+    while True:
+        cursor.execute(*query.page(after, page_size))
+        rows = cursor.fetchall()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = rows[-1]
+
+
+class RepositoryError(Exception):
+    """Операция отклонена; текст - сообщение для пользователя"""
+
+
+class ConflictError(RepositoryError):
+    """Запись изменена другими после загрузки; current - ее текущая строка"""
+
+    def __init__(self, current):
+        super().__init__("Запись изменена другим пользователем")
+        self.current = current
+
+
+class PreparedStatement:
+    """Запрос, который разбирается и планируется сервером один раз на соединение
+
+    Текст запроса использует параметры $1, $2... Подготовленные на
+    соединении запросы запоминаются до его закрытия и не зависят от
+    отката транзакций.
+    """
+
+    # Имена запросов, подготовленных на каждом соединении
+    _prepared = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+
+    def __init__(self, name, sql, parameters):
+        self.name = name
+        self.sql = sql
+        self.parameters = parameters
+        register_prepared(name, sql)
+
+    def execute(self, cursor, *params):
+        with self._lock:
+            prepared = self._prepared.setdefault(cursor.connection, set())
+        if self.name not in prepared:
+            cursor.execute(f"PREPARE {self.name} AS {self.sql}")
+            prepared.add(self.name)
+        placeholders = ", ".join(["%s"] * self.parameters)
+        cursor.execute(f"EXECUTE {self.name} ({placeholders})", params)
+        return cursor
+
+
+# Сразу возвращаем строку для таблицы, чтобы не перезагружать ее
+FRANCHISE_INSERT = PreparedStatement("fcas_franchise_insert", f"""
+    WITH f AS (
+        INSERT INTO franchise (parent_id, name, address, contact_phone, email, is_active)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        RETURNING *
+    )
+    SELECT {FRANCHISE_ROW}
+    FROM f
+    LEFT JOIN franchise p ON f.parent_id = p.franchise_id
+""", 6)
+
+FRANCHISE_UPDATE = PreparedStatement("fcas_franchise_update", f"""
+    WITH f AS (
+        UPDATE franchise
+        SET parent_id = $1, name = $2, address = $3,
+            contact_phone = $4, email = $5, is_active = $6,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE franchise_id = $7 AND version = $8
+        RETURNING *
+    )
+    SELECT {FRANCHISE_ROW}
+    FROM f
+    LEFT JOIN franchise p ON f.parent_id = p.franchise_id
+""", 8)
+
+LOCATION_INSERT = PreparedStatement("fcas_location_insert", f"""
+    WITH l AS (
+        INSERT INTO location (franchise_id, name, address, room_number, is_active)
+        VALUES ($1, $2, $3, $4, $5)
+        RETURNING *
+    )
+    SELECT {LOCATION_ROW}
+    FROM l
+    JOIN franchise f ON l.franchise_id = f.franchise_id
+""", 5)
+
+LOCATION_UPDATE = PreparedStatement("fcas_location_update", f"""
+    WITH l AS (
+        UPDATE location
+        SET franchise_id = $1, name = $2, address = $3,
+            room_number = $4, is_active = $5
+        WHERE location_id = $6 AND version = $7
+        RETURNING *
+    )
+    SELECT {LOCATION_ROW}
+    FROM l
+    JOIN franchise f ON l.franchise_id = f.franchise_id
+""", 7)
+
+# Текущие строки таблиц для сравнения при конфликте изменений
+FRANCHISE_CURRENT = f"""
+    SELECT {FRANCHISE_ROW}
+    FROM franchise f
+    LEFT JOIN franchise p ON f.parent_id = p.franchise_id
+    WHERE f.franchise_id = %s
+"""
+
+LOCATION_CURRENT = f"""
+    SELECT {LOCATION_ROW}
+    FROM location l
+    JOIN franchise f ON l.franchise_id = f.franchise_id
+    WHERE l.location_id = %s
+"""
+
+# Порог похожести нормализованных названий и адресов (доля общих
+# триграмм) и сколько похожих записей показывать при вводе
+SIMILARITY_THRESHOLD = 0.5
+SIMILAR_LIMIT = 5
+
+# Записи, похожие на вводимую названием или адресом (оператор % по
+# GIN-индексам из 15_Поиск дубликатов.sql), самые похожие первыми
+FRANCHISE_SIMILAR = """
+    SELECT franchise_id, name, address, name_score, address_score
+    FROM (
+        SELECT f.franchise_id, f.name, f.address,
+               similarity(normalize_name(f.name), normalize_name(%(name)s)) AS name_score,
+               similarity(normalize_address(f.address), normalize_address(%(address)s)) AS address_score
+        FROM franchise f
+        WHERE (normalize_name(f.name) %% normalize_name(%(name)s)
+               OR normalize_address(f.address) %% normalize_address(%(address)s))
+          AND f.franchise_id IS DISTINCT FROM %(exclude_id)s
+    ) s
+    ORDER BY GREATEST(name_score, COALESCE(address_score, 0)) DESC, franchise_id
+    LIMIT %(limit)s
+"""
+
+# Для локаций название сравнивается в пределах франшизы, адрес - везде
+LOCATION_SIMILAR = """
+    SELECT location_id, franchise_name, name, address, name_score, address_score
+    FROM (
+        SELECT l.location_id, f.name AS franchise_name, l.name, l.address,
+               similarity(normalize_name(l.name), normalize_name(%(name)s)) AS name_score,
+               similarity(normalize_address(l.address), normalize_address(%(address)s)) AS address_score
+        FROM location l
+        JOIN franchise f ON l.franchise_id = f.franchise_id
+        WHERE ((l.franchise_id = %(franchise_id)s AND normalize_name(l.name) %% normalize_name(%(name)s))
+               OR normalize_address(l.address) %% normalize_address(%(address)s))
+          AND l.location_id IS DISTINCT FROM %(exclude_id)s
+    ) s
+    ORDER BY GREATEST(name_score, COALESCE(address_score, 0)) DESC, location_id
+    LIMIT %(limit)s
+"""
+
+
+def duplicate_clusters_sql(table, key, row, source, source_key):
+    """Запрос групп похожих записей таблицы за один проход
+
+    Пары - записи с похожими названиями и похожими адресами (или без
+    адреса у одной из них), пары ищутся соединением таблицы с собой по
+    триграммному индексу. Группа - связная компонента графа пар, ее
+    номер - наименьший id в ней. Строки: номер группы, затем row из
+    source; source_key - ключ таблицы в source вместе с псевдонимом.
+    """
+    return f"""
+        WITH RECURSIVE pairs AS (
+            SELECT a.{key} AS a_id, b.{key} AS b_id
+            FROM {table} a
+            JOIN {table} b
+              ON normalize_name(b.name) % normalize_name(a.name) AND b.{key} > a.{key}
+            WHERE a.address IS NULL OR b.address IS NULL
+               OR normalize_address(b.address) % normalize_address(a.address)
+        ),
+        edges AS (
+            SELECT a_id, b_id FROM pairs
+            UNION ALL
+            SELECT b_id, a_id FROM pairs
+        ),
+        reach (start_id, row_id) AS (
+            SELECT DISTINCT a_id, a_id FROM edges
+            UNION
+            SELECT r.start_id, e.b_id
+            FROM reach r
+            JOIN edges e ON e.a_id = r.row_id
+        ),
+        clusters AS (
+            SELECT start_id AS row_id, MIN(row_id) AS cluster_id
+            FROM reach
+            GROUP BY start_id
+        )
+        SELECT c.cluster_id, {row}
+        {source}
+        JOIN clusters c ON c.row_id = {source_key}
+        ORDER BY c.cluster_id, {source_key}
+    """
+
+
+FRANCHISE_DUPLICATES = duplicate_clusters_sql(
+    "franchise", "franchise_id", "f.franchise_id, f.name, f.address, f.is_active",
+    "FROM franchise f", "f.franchise_id"
+)
+
+LOCATION_DUPLICATES = duplicate_clusters_sql(
+    "location", "location_id", "l.location_id, f.name, l.name, l.address, l.is_active",
+    "FROM location l JOIN franchise f ON l.franchise_id = f.franchise_id", "l.location_id"
+)
+
+
+def set_similarity_threshold(cursor, threshold):
+    """Порог оператора % до конца транзакции"""
+    cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", (str(threshold),))
+
+
+LOCATION_CHOICES = PreparedStatement("fcas_location_choices", """
+    SELECT location_id, name
+    FROM location
+    WHERE franchise_id = $1
+    ORDER BY name
+""", 1)
+
+
+@dataclass
+class Franchise:
+    """Поля франшизы, которые задает пользователь"""
+
+    name: str
+    parent_id: int = None
+    address: str = None
+    contact_phone: str = None
+    email: str = None
+    is_active: bool = True
+
+    @classmethod
+    def from_row(cls, row):
+        """Поля из строки таблицы франшиз (FRANCHISE_ROW)"""
+        return cls(name=row[1], parent_id=row[5], address=row[6], contact_phone=row[3],
+                   email=row[7], is_active=bool(row[4]))
+
+
+@dataclass
+class Location:
+    """Поля локации, которые задает пользователь"""
+
+    franchise_id: int
+    name: str
+    address: str = None
+    room_number: str = None
+    is_active: bool = True
+
+    @classmethod
+    def from_row(cls, row):
+        """Поля из строки таблицы локаций (LOCATION_ROW)"""
+        return cls(franchise_id=row[5], name=row[2], address=row[3], room_number=row[6],
+                   is_active=bool(row[4]))
+
+
+def merge_changes(base, mine, theirs):
+    """Трехстороннее слияние полей записи (экземпляров одного dataclass)
+
+    base - поля при загрузке в форму, mine - из формы, theirs - текущие
+    в БД. Поле, измененное одной стороной, берется у нее. Возвращает
+    объединенные поля и имена полей, измененных обеими сторонами
+    по-разному; в них остается значение из формы.
+    """
+    merged = replace(mine)
+    conflicts = []
+    for field in fields(base):
+        name = field.name
+        base_value, my_value, their_value = (getattr(base, name), getattr(mine, name), getattr(theirs, name))
+        if their_value == base_value or their_value == my_value:
+            continue
+        if my_value == base_value:
+            setattr(merged, name, their_value)
+        else:
+            conflicts.append(name)
+    return merged, conflicts
+
+
+class FranchiseRepository:
+    """Чтение и изменение франшиз
+
+    Репозитории не завершают транзакцию: commit или rollback делает
+    вызывающий код, так что несколько операций можно объединить.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def choices(self, franchise_ids=None):
+        """Франшизы (id, название) по алфавиту, все или с заданными id"""
+        with self.connection.cursor() as cursor:
+            if franchise_ids is None:
+                cursor.execute("SELECT franchise_id, name FROM franchise ORDER BY name")
+            else:
+                cursor.execute(
+                    "SELECT franchise_id, name FROM franchise WHERE franchise_id = ANY(%s) ORDER BY name",
+                    (list(franchise_ids),)
+                )
+            return cursor.fetchall()
+
+    def similar(self, name, address, exclude_id=None, threshold=SIMILARITY_THRESHOLD):
+        """Франшизы, похожие названием или адресом
+
+        Строки: id, название, адрес, похожесть названия и адреса.
+        """
+        with self.connection.cursor() as cursor:
+            set_similarity_threshold(cursor, threshold)
+            cursor.execute(FRANCHISE_SIMILAR, {
+                "name": name, "address": address, "exclude_id": exclude_id, "limit": SIMILAR_LIMIT,
+            })
+            return cursor.fetchall()
+
+    def duplicates(self, threshold=SIMILARITY_THRESHOLD):
+        """Группы похожих франшиз: (группа, id, название, адрес, активна)"""
+        with self.connection.cursor() as cursor:
+            set_similarity_threshold(cursor, threshold)
+            cursor.execute(FRANCHISE_DUPLICATES)
+            return cursor.fetchall()
+
+    def subtree(self, franchise_id):
+        """Id франшизы и всех ее дочерних франшиз"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(FRANCHISE_SUBTREE_IDS, (franchise_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def insert(self, franchise):
+        """Добавление франшизы; возвращает строку таблицы франшиз"""
+        with self.connection.cursor() as cursor:
+            return FRANCHISE_INSERT.execute(cursor, *self._values(franchise)).fetchone()
+
+    def update(self, franchise_id, franchise, version):
+        """Изменение франшизы той версии, что была загружена
+
+        Возвращает строку таблицы или None, если франшизы нет. Если
+        версия в БД другая, выбрасывается ConflictError с текущей
+        строкой. Цикл в иерархии отклоняется триггером с ошибкой
+        CheckViolation.
+        """
+        with self.connection.cursor() as cursor:
+            row = FRANCHISE_UPDATE.execute(cursor, *self._values(franchise), franchise_id, version).fetchone()
+            if row is None:
+                cursor.execute(FRANCHISE_CURRENT, (franchise_id,))
+                current = cursor.fetchone()
+                if current is not None:
+                    raise ConflictError(current)
+            return row
+
+    def delete(self, franchise_id):
+        """Удаление франшизы без дочерних франшиз и локаций"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(FRANCHISE_DELETE_CHECK, {"id": franchise_id})
+            has_children, has_locations = cursor.fetchone()
+            if has_children:
+                raise RepositoryError("Нельзя удалить франшизу, у которой есть дочерние франшизы!")
+            if has_locations:
+                raise RepositoryError("Нельзя удалить франшизу, у которой есть локации!")
+            cursor.execute("DELETE FROM franchise WHERE franchise_id = %s", (franchise_id,))
+
+    @staticmethod
+    def _values(franchise):
+        return (franchise.parent_id, franchise.name, franchise.address or None,
+                franchise.contact_phone or None, franchise.email or None, franchise.is_active)
+
+
+class LocationRepository:
+    """Чтение и изменение локаций"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def choices(self, franchise_id):
+        """Локации франшизы (id, название) по алфавиту"""
+        with self.connection.cursor() as cursor:
+            return LOCATION_CHOICES.execute(cursor, franchise_id).fetchall()
+
+    def insert(self, location):
+        """Добавление локации; возвращает строку таблицы локаций"""
+        with self.connection.cursor() as cursor:
+            return LOCATION_INSERT.execute(cursor, *self._values(location)).fetchone()
+
+    def update(self, location_id, location, version):
+        """Изменение локации той версии, что была загружена
+
+        Возвращает строку таблицы или None, если локации нет; при другой
+        версии в БД - ConflictError с текущей строкой.
+        """
+        with self.connection.cursor() as cursor:
+            row = LOCATION_UPDATE.execute(cursor, *self._values(location), location_id, version).fetchone()
+            if row is None:
+                cursor.execute(LOCATION_CURRENT, (location_id,))
+                current = cursor.fetchone()
+                if current is not None:
+                    raise ConflictError(current)
+            return row
+
+    def delete(self, location_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute("DELETE FROM location WHERE location_id = %s", (location_id,))
+
+    def similar(self, franchise_id, name, address, exclude_id=None, threshold=SIMILARITY_THRESHOLD):
+        """Локации франшизы с похожим названием и любые локации с похожим адресом
+
+        Строки: id, франшиза, название, адрес, похожесть названия и адреса.
+        """
+        with self.connection.cursor() as cursor:
+            set_similarity_threshold(cursor, threshold)
+            cursor.execute(LOCATION_SIMILAR, {
+                "franchise_id": franchise_id, "name": name, "address": address,
+                "exclude_id": exclude_id, "limit": SIMILAR_LIMIT,
+            })
+            return cursor.fetchall()
+
+    def duplicates(self, threshold=SIMILARITY_THRESHOLD):
+        """Группы похожих локаций: (группа, id, франшиза, название, адрес, активна)"""
+        with self.connection.cursor() as cursor:
+            set_similarity_threshold(cursor, threshold)
+            cursor.execute(LOCATION_DUPLICATES)
+            return cursor.fetchall()
+
+    def deactivate_subtree(self, franchise_id):
+        """Деактивация всех локаций франшизы и ее дочерних франшиз одним запросом
+
+        Возвращает id деактивированных локаций; уже неактивные не меняются.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE location
+                SET is_active = FALSE
+                WHERE franchise_id IN ({FRANCHISE_SUBTREE_IDS}) AND is_active
+                RETURNING location_id
+            """, (franchise_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _values(location):
+        return (location.franchise_id, location.name, location.address or None,
+                location.room_number or None, location.is_active)
+
+
+class DeviceRepository:
+    """Чтение и массовое изменение устройств"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def set_status(self, device_ids, status):
+        """Смена статуса устройств одним запросом; возвращает измененные строки таблицы"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH d AS (
+                    UPDATE device
+                    SET status = %s, updated_at = CURRENT_TIMESTAMP
+                    WHERE device_id = ANY(%s) AND status IS DISTINCT FROM %s
+                    RETURNING *
+                )
+                SELECT {DEVICE_ROW}
+                FROM d {DEVICE_SOURCE}
+            """, (status, list(device_ids), status))
+            return cursor.fetchall()
+
+    def move(self, device_ids, location_id):
+        """Перемещение устройств в локацию одним запросом; возвращает измененные строки
+
+        Устройство переходит и во франшизу новой локации.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH d AS (
+                    UPDATE device d
+                    SET location_id = nl.location_id, franchise_id = nl.franchise_id,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM location nl
+                    WHERE nl.location_id = %s AND d.device_id = ANY(%s)
+                      AND d.location_id IS DISTINCT FROM nl.location_id
+                    RETURNING d.*
+                )
+                SELECT {DEVICE_ROW}
+                FROM d {DEVICE_SOURCE}
+            """, (location_id, list(device_ids)))
+            return cursor.fetchall()
+
+    def move_from_location(self, source_location_id, location_id):
+        """Перемещение всех устройств одной локации в другую; возвращает их id"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE device d
+                SET location_id = nl.location_id, franchise_id = nl.franchise_id,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM location nl
+                WHERE nl.location_id = %s AND d.location_id = %s
+                  AND d.location_id IS DISTINCT FROM nl.location_id
+                RETURNING d.device_id
+            """, (location_id, source_location_id))
+            return [row[0] for row in cursor.fetchall()]
+
+    def move_by_inventory_number(self, moves):
+        """Перемещение устройств по парам (инвентарный номер, id локации)
+
+        Пары отправляются пачками по BATCH_SIZE в одном запросе
+        UPDATE ... FROM (VALUES ...), а не запросом на устройство.
+        Возвращает id перемещенных устройств; номера, которых нет,
+        и несуществующие локации пропускаются.
+        """
+        with self.connection.cursor() as cursor:
+            rows = execute_values(cursor, """
+                UPDATE device d
+                SET location_id = nl.location_id, franchise_id = nl.franchise_id,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS m (inventory_number, location_id)
+                JOIN location nl ON nl.location_id = m.location_id::integer
+                WHERE d.inventory_number = m.inventory_number
+                  AND d.location_id IS DISTINCT FROM nl.location_id
+                RETURNING d.device_id
+            """, list(moves), page_size=BATCH_SIZE, fetch=True)
+            return [row[0] for row in rows]
+
+
+class SpecRepository:
+    """Поиск устройств по характеристикам"""
+
+    def __init__(self, connection, catalog):
+        self.connection = connection
+        # Описания атрибутов (specs.SpecCatalog); читаются при первом поиске
+        self.catalog = catalog
+
+    def search(self, text, franchise_id=None, subtree=True):
+        """Все устройства, подходящие под запрос; строки SPEC_ROW и значения атрибутов
+
+        Ошибка в тексте запроса - SpecQueryError.
+        """
+        if not self.catalog.is_loaded():
+            self.catalog.load(self.connection)
+        conditions = parse_spec_query(text, self.catalog)
+        return self._rows(spec_query(conditions, franchise_id, subtree))
+
+    def _rows(self, query):
+        with self.connection.cursor() as cursor:
+            yield from query_rows(cursor, query)
+
+
+@dataclass
+class Dashboard:
+    """Показатели панели; списки пар (подпись, значение) для графиков"""
+
+    device_count: int
+    total_price: object
+    by_status: list
+    by_type: list
+    # Франшизы, а при выбранной франшизе - ее локации, с наибольшей стоимостью
+    value_by_unit: list
+    # Устройства, гарантия которых истекла до текущего месяца
+    warranty_expired: int
+    # По месяцам окончания гарантии, начиная с текущего
+    warranty_by_month: list
+    # Изменения устройств по дням за последние дни, по всей базе
+    changes_by_day: list
+
+
+class DashboardRepository:
+    """Показатели панели из сводных таблиц (sql/12)
+
+    Запросы читают только сводку, поэтому их время зависит от числа
+    франшиз и локаций, но не от числа устройств.
+    """
+
+    # Сколько франшиз или локаций показывать на графике стоимости
+    TOP_UNITS = 10
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def load(self, franchise_id=None, months=12, days=30):
+        """Показатели всех устройств или франшизы вместе с дочерними"""
+        if franchise_id is None:
+            scope, params = "TRUE", []
+        else:
+            scope, params = f"s.franchise_id IN ({FRANCHISE_SUBTREE_IDS})", [franchise_id]
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT COALESCE(SUM(device_count), 0)::bigint, COALESCE(SUM(total_price), 0)
+                FROM device_summary s WHERE {scope}
+            """, params)
+            device_count, total_price = cursor.fetchone()
+
+            cursor.execute(f"""
+                SELECT status, SUM(device_count)::bigint
+                FROM device_summary s WHERE {scope}
+                GROUP BY status HAVING SUM(device_count) > 0
+                ORDER BY status
+            """, params)
+            by_status = cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT t.name, SUM(s.device_count)::bigint
+                FROM device_summary s
+                JOIN device_type t ON s.device_type_id = t.device_type_id
+                WHERE {scope}
+                GROUP BY t.name HAVING SUM(s.device_count) > 0
+                ORDER BY 2 DESC, 1
+            """, params)
+            by_type = cursor.fetchall()
+
+            if franchise_id is None:
+                cursor.execute("""
+                    SELECT f.name, SUM(s.total_price)
+                    FROM device_summary s
+                    JOIN franchise f ON s.franchise_id = f.franchise_id
+                    GROUP BY f.franchise_id, f.name HAVING SUM(s.total_price) > 0
+                    ORDER BY 2 DESC, 1
+                    LIMIT %s
+                """, (self.TOP_UNITS,))
+            else:
+                cursor.execute(f"""
+                    SELECT COALESCE(l.name, 'Без локации'), SUM(s.total_price)
+                    FROM device_summary s
+                    LEFT JOIN location l ON s.location_id = l.location_id
+                    WHERE {scope}
+                    GROUP BY s.location_id, l.name HAVING SUM(s.total_price) > 0
+                    ORDER BY 2 DESC, 1
+                    LIMIT %s
+                """, params + [self.TOP_UNITS])
+            value_by_unit = cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT COALESCE(SUM(device_count), 0)::bigint
+                FROM warranty_summary s
+                WHERE {scope} AND expiry_month < date_trunc('month', CURRENT_DATE)
+            """, params)
+            warranty_expired = cursor.fetchone()[0]
+
+            cursor.execute(f"""
+                SELECT m.month::date, COALESCE(SUM(s.device_count), 0)::bigint
+                FROM generate_series(
+                    date_trunc('month', CURRENT_DATE),
+                    date_trunc('month', CURRENT_DATE) + (%s - 1) * interval '1 month',
+                    interval '1 month'
+                ) AS m (month)
+                LEFT JOIN warranty_summary s ON s.expiry_month = m.month::date AND {scope}
+                GROUP BY m.month
+                ORDER BY m.month
+            """, [months] + params)
+            warranty_by_month = cursor.fetchall()
+
+            cursor.execute("""
+                SELECT d.day::date, COALESCE(SUM(s.change_count), 0)::bigint
+                FROM generate_series(CURRENT_DATE - (%s - 1), CURRENT_DATE, interval '1 day') AS d (day)
+                LEFT JOIN history_summary s ON s.day = d.day::date
+                GROUP BY d.day
+                ORDER BY d.day
+            """, (days,))
+            changes_by_day = cursor.fetchall()
+
+        return Dashboard(
+            device_count, total_price, by_status, by_type, value_by_unit,
+            warranty_expired, warranty_by_month, changes_by_day
+        )
+
+    def rebuild(self):
+        """Полный пересчет сводки; устройства блокируются до конца транзакции"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT rebuild_device_summary()")
+
+
+# Таблицы архива (sql/16) в порядке переноса: локацию и франшизу можно
+# перенести только после их устройств, франшизу - после локаций
+ARCHIVE_TABLES = ["device", "location", "franchise"]
+
+# Сколько записей архива показывать при поиске
+ARCHIVE_SEARCH_LIMIT = 500
+
+# Поиск в архиве подстроки в названиях, адресах и инвентарных номерах.
+# Франшизы и локации, на которые ссылаются архивные записи, могут быть
+# как в рабочих таблицах, так и в архиве
+ARCHIVE_SEARCH = {
+    "device": f"""
+        SELECT d.device_id, d.inventory_number, d.name, t.name,
+               COALESCE(f.name, af.name), COALESCE(l.name, al.name),
+               {STATUS_NAME}, d.archived_at
+        FROM archive.device d
+        LEFT JOIN device_type t ON d.device_type_id = t.device_type_id
+        LEFT JOIN franchise f ON d.franchise_id = f.franchise_id
+        LEFT JOIN archive.franchise af ON d.franchise_id = af.franchise_id
+        LEFT JOIN location l ON d.location_id = l.location_id
+        LEFT JOIN archive.location al ON d.location_id = al.location_id
+        WHERE (d.inventory_number ILIKE %(pattern)s OR d.name ILIKE %(pattern)s)
+          AND (%(franchise_id)s::integer IS NULL OR d.franchise_id = %(franchise_id)s)
+        ORDER BY d.archived_at DESC, d.device_id
+        LIMIT %(limit)s
+    """,
+    "location": """
+        SELECT a.location_id, COALESCE(f.name, af.name), a.name, a.address, a.archived_at
+        FROM archive.location a
+        LEFT JOIN franchise f ON a.franchise_id = f.franchise_id
+        LEFT JOIN archive.franchise af ON a.franchise_id = af.franchise_id
+        WHERE (a.name ILIKE %(pattern)s OR a.address ILIKE %(pattern)s)
+          AND (%(franchise_id)s::integer IS NULL OR a.franchise_id = %(franchise_id)s)
+        ORDER BY a.archived_at DESC, a.location_id
+        LIMIT %(limit)s
+    """,
+    "franchise": """
+        SELECT a.franchise_id, a.name, COALESCE(p.name, ap.name), a.address, a.contact_phone, a.archived_at
+        FROM archive.franchise a
+        LEFT JOIN franchise p ON a.parent_id = p.franchise_id
+        LEFT JOIN archive.franchise ap ON a.parent_id = ap.franchise_id
+        WHERE (a.name ILIKE %(pattern)s OR a.address ILIKE %(pattern)s)
+          AND (%(franchise_id)s::integer IS NULL OR a.parent_id = %(franchise_id)s)
+        ORDER BY a.archived_at DESC, a.franchise_id
+        LIMIT %(limit)s
+    """,
+}
+
+
+class ArchiveRepository:
+    """Перенос старых записей в архив, поиск в нем и восстановление (sql/16)
+
+    Перенос и очистка идут пачками: вызывающий код фиксирует
+    транзакцию после каждой пачки, пока пачка не окажется пустой.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def policy(self):
+        """Сроки по таблицам: (таблица, срок до архивации, срок хранения в архиве или None)"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT table_name, archive_after::text, purge_after::text
+                FROM archive_policy
+                ORDER BY array_position(%s, table_name::text)
+            """, (ARCHIVE_TABLES,))
+            return cursor.fetchall()
+
+    def set_policy(self, table_name, archive_after, purge_after):
+        """Новые сроки таблицы; интервалы - строки вида '180 days', purge_after None - хранить бессрочно"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE archive_policy
+                SET archive_after = %s::interval, purge_after = %s::interval
+                WHERE table_name = %s
+            """, (archive_after, purge_after, table_name))
+            if cursor.rowcount == 0:
+                raise RepositoryError(f"Таблица {table_name} не архивируется")
+
+    def archive_batch(self, table_name, batch_size=BATCH_SIZE):
+        """Перенос в архив одной пачки; возвращает число перенесенных записей"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT archive_batch(%s, %s)", (table_name, batch_size))
+            return cursor.fetchone()[0]
+
+    def purge_batch(self, table_name, batch_size=BATCH_SIZE):
+        """Удаление из архива одной пачки записей старше срока хранения"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT purge_archive_batch(%s, %s)", (table_name, batch_size))
+            return cursor.fetchone()[0]
+
+    def purge_deleted_rows(self, max_age):
+        """Удаление записей об удаленных строках старше max_age, например '30 days'"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT purge_deleted_rows(%s::interval)", (max_age,))
+            return cursor.fetchone()[0]
+
+    def restore(self, table_name, ids):
+        """Восстановление записей с прежними id вместе с тем, на что они ссылаются
+
+        Возвращает число восстановленных записей таблицы.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT restore_archived(%s, %s::integer[])", (table_name, list(ids)))
+            return cursor.fetchone()[0]
+
+    def search(self, table_name, text="", franchise_id=None, limit=ARCHIVE_SEARCH_LIMIT):
+        """Записи архива, последние перенесенные первыми
+
+        franchise_id ограничивает устройства и локации франшизой,
+        а франшизы - дочерними франшизами.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute(ARCHIVE_SEARCH[table_name], {
+                "pattern": like_pattern(text.strip()), "franchise_id": franchise_id, "limit": limit,
+            })
+            return cursor.fetchall()
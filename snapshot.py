@@ -0,0 +1,233 @@
+import os
+import sqlite3
+
+
+class SnapshotTable:
+    """Таблица сервера, копия которой хранится в локальном снимке"""
+
+    def __init__(self, name, key, columns):
+        self.name = name
+        self.key = key
+        # Столбцы с типами SQLite; тип BOOLEAN читается обратно как bool
+        self.columns = columns
+
+    @property
+    def column_names(self):
+        return [self.key] + [name for name, _ in self.columns]
+
+
+SNAPSHOT_TABLES = [
+    SnapshotTable("franchise", "franchise_id", [
+        ("parent_id", "INTEGER"), ("name", "TEXT"), ("address", "TEXT"),
+        ("contact_phone", "TEXT"), ("email", "TEXT"), ("is_active", "BOOLEAN"),
+        ("version", "INTEGER"),
+    ]),
+    SnapshotTable("location", "location_id", [
+        ("franchise_id", "INTEGER"), ("name", "TEXT"), ("address", "TEXT"),
+        ("room_number", "TEXT"), ("is_active", "BOOLEAN"), ("version", "INTEGER"),
+    ]),
+    SnapshotTable("device_type", "device_type_id", [
+        ("name", "TEXT"), ("description", "TEXT"),
+    ]),
+    SnapshotTable("component_type", "component_type_id", [
+        ("name", "TEXT"), ("description", "TEXT"),
+    ]),
+    SnapshotTable("spec_attribute", "spec_attribute_id", [
+        ("spec_category_id", "INTEGER"), ("name", "TEXT"), ("data_type", "TEXT"),
+        ("unit", "TEXT"), ("is_required", "BOOLEAN"),
+    ]),
+]
+
+# Номер формата снимка; снимок другого формата создается заново
+SNAPSHOT_SCHEMA = "2"
+
+# updated_at - время начала транзакции, поэтому строка, закоммиченная
+# после синхронизации, может оказаться старше отметки. Изменения
+# перечитываются с запасом, повторное применение строки безвредно
+SYNC_OVERLAP = "5 minutes"
+
+# Снимок старше этого перечитывается целиком: записи об удаленных
+# строках (deleted_row) хранятся на сервере столько же, их удаляет
+# maintenance.py archive через purge_deleted_rows
+SNAPSHOT_MAX_AGE = "30 days"
+
+# Строки таблиц франшиз и локаций в том же виде, что FRANCHISE_ROW и LOCATION_ROW
+FRANCHISE_ROWS = """
+    SELECT f.franchise_id, f.name, p.name, f.contact_phone, f.is_active,
+           f.parent_id, f.address, f.email, f.version
+    FROM franchise f
+    LEFT JOIN franchise p ON f.parent_id = p.franchise_id
+"""
+
+LOCATION_ROWS = """
+    SELECT l.location_id, f.name, l.name, l.address, l.is_active,
+           l.franchise_id, l.room_number, l.version
+    FROM location l
+    JOIN franchise f ON l.franchise_id = f.franchise_id
+"""
+
+sqlite3.register_converter("BOOLEAN", lambda value: value == b"1")
+
+
+def default_snapshot_path():
+    """Путь к снимку в каталоге кэша пользователя"""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "fcas", "snapshot.sqlite3")
+
+
+def _casefold(value):
+    return value.casefold() if value is not None else None
+
+
+class Snapshot:
+    """Локальный снимок франшиз, локаций и справочников в файле SQLite
+
+    Из снимка окно заполняется при запуске, не дожидаясь сервера, и
+    показывает данные, если сервер недоступен. Снимок привязан к строке
+    подключения: данные другой базы не показываются. Соединение SQLite
+    можно использовать только в открывшем его потоке.
+    """
+
+    def __init__(self, path, dsn):
+        self.dsn = dsn
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.create_function("casefold", 1, _casefold, deterministic=True)
+        # Запись из фонового потока не мешает чтению из GUI-потока
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if self.meta("schema") != SNAPSHOT_SCHEMA:
+                # Без отметки синхронизации таблицы перечитаются целиком
+                for table in SNAPSHOT_TABLES:
+                    self._db.execute(f"DROP TABLE IF EXISTS {table.name}")
+                self._db.execute("DELETE FROM meta")
+                self._db.execute("INSERT INTO meta VALUES ('schema', ?)", (SNAPSHOT_SCHEMA,))
+            for table in SNAPSHOT_TABLES:
+                columns = ", ".join(f"{name} {type_}" for name, type_ in table.columns)
+                self._db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table.name} ({table.key} INTEGER PRIMARY KEY, {columns})"
+                )
+
+    def close(self):
+        self._db.close()
+
+    def meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def is_current(self):
+        """Снимок сделан с той же базы и хотя бы раз синхронизирован"""
+        return self.meta("dsn") == self.dsn and self.meta("watermark") is not None
+
+    def synced_at(self):
+        """Локальное время последней синхронизации или None"""
+        return self.meta("synced_at") if self.is_current() else None
+
+    def select(self, sql, params=()):
+        if not self.is_current():
+            return []
+        return self._db.execute(sql, params).fetchall()
+
+    def franchise_rows(self, search, is_active):
+        """Строки таблицы франшиз с учетом поиска и фильтра активности"""
+        sql, params = FRANCHISE_ROWS + " WHERE 1 = 1", []
+        if search:
+            sql += " AND (instr(casefold(f.name), ?) OR instr(casefold(f.address), ?))"
+            params += [search.casefold()] * 2
+        if is_active is not None:
+            sql += " AND f.is_active = ?"
+            params.append(is_active)
+        return self.select(sql + " ORDER BY f.franchise_id", params)
+
+    def location_rows(self, search, franchise_id, is_active):
+        """Строки таблицы локаций с учетом поиска и фильтров"""
+        sql, params = LOCATION_ROWS + " WHERE 1 = 1", []
+        if search:
+            sql += " AND (instr(casefold(l.name), ?) OR instr(casefold(l.address), ?))"
+            params += [search.casefold()] * 2
+        if franchise_id is not None:
+            sql += " AND l.franchise_id = ?"
+            params.append(franchise_id)
+        if is_active is not None:
+            sql += " AND l.is_active = ?"
+            params.append(is_active)
+        return self.select(sql + " ORDER BY l.location_id", params)
+
+    def franchise_choices(self):
+        """Франшизы (id, название) по алфавиту для комбобоксов"""
+        return self.select("SELECT franchise_id, name FROM franchise ORDER BY casefold(name)")
+
+    def reference(self, table):
+        """Строки справочника (ключ, столбцы...) по порядку ключа"""
+        table = next(t for t in SNAPSHOT_TABLES if t.name == table)
+        return self.select(f"SELECT {', '.join(table.column_names)} FROM {table.name} ORDER BY {table.key}")
+
+
+def synchronize(connection, path, dsn):
+    """Дочитывание в снимок строк, измененных после прошлой синхронизации
+
+    Выполняется в фоновом потоке. Если снимок сделан с другой базы или
+    слишком стар, таблицы перечитываются целиком. Возвращает число
+    полученных строк.
+    """
+    snapshot = Snapshot(path, dsn)
+    try:
+        watermark = snapshot.meta("watermark") if snapshot.meta("dsn") == dsn else None
+        with connection.cursor() as cursor:
+            # Все таблицы читаются из одного снимка данных сервера
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cursor.execute(
+                "SELECT transaction_timestamp(), "
+                "%s::timestamptz > transaction_timestamp() - %s::interval",
+                (watermark, SNAPSHOT_MAX_AGE)
+            )
+            now, fresh = cursor.fetchone()
+            full = not fresh
+
+            changes = []
+            for table in SNAPSHOT_TABLES:
+                columns = ", ".join(table.column_names)
+                if full:
+                    cursor.execute(f"SELECT {columns} FROM {table.name}")
+                    changes.append((table, cursor.fetchall(), []))
+                    continue
+                cursor.execute(
+                    f"SELECT {columns} FROM {table.name} "
+                    f"WHERE updated_at > %s::timestamptz - %s::interval",
+                    (watermark, SYNC_OVERLAP)
+                )
+                rows = cursor.fetchall()
+                cursor.execute(
+                    "SELECT DISTINCT row_id FROM deleted_row "
+                    "WHERE table_name = %s AND deleted_at > %s::timestamptz - %s::interval",
+                    (table.name, watermark, SYNC_OVERLAP)
+                )
+                changes.append((table, rows, [row_id for row_id, in cursor.fetchall()]))
+        connection.rollback()
+
+        db = snapshot._db
+        with db:
+            for table, rows, deleted in changes:
+                if full:
+                    db.execute(f"DELETE FROM {table.name}")
+                else:
+                    # Удаленный и вставленный заново id вернется со строками
+                    db.executemany(
+                        f"DELETE FROM {table.name} WHERE {table.key} = ?", [(key,) for key in deleted]
+                    )
+                placeholders = ", ".join("?" * len(table.column_names))
+                db.executemany(
+                    f"INSERT OR REPLACE INTO {table.name} ({', '.join(table.column_names)}) "
+                    f"VALUES ({placeholders})",
+                    rows
+                )
+            db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("dsn", dsn), ("watermark", now.isoformat()),
+                ("synced_at", now.astimezone().strftime("%d.%m.%Y %H:%M")),
+            ])
+        return sum(len(rows) for _, rows, _ in changes)
+    finally:
+        snapshot.close()
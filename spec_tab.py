@@ -0,0 +1,126 @@
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+    QCheckBox, QTableView, QAbstractItemView, QMessageBox
+)
+from PyQt6.QtCore import Qt
+
+from choice_box import ChoiceBox
+from models import LazyQueryModel
+from references import REFERENCES
+from repository import spec_query
+from specs import SpecCatalog, SpecQueryError, parse_spec_query
+
+
+SPEC_HEADERS = ["ID", "Инв. номер", "Название", "Тип", "Франшиза", "Локация"]
+
+
+class SpecSearchTab(QWidget):
+    """Вкладка поиска устройств по характеристикам"""
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.catalog = SpecCatalog()
+        self.stale = True
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        query_layout = QHBoxLayout()
+        layout.addLayout(query_layout)
+
+        self.query = QLineEdit()
+        self.query.setPlaceholderText("Например: RAM Size >= 16 AND CPU Cores >= 8")
+        self.query.returnPressed.connect(self.search)
+        query_layout.addWidget(self.query)
+
+        self.franchise_filter = ChoiceBox("Все франшизы")
+        query_layout.addWidget(self.franchise_filter)
+
+        self.subtree = QCheckBox("С дочерними")
+        self.subtree.setChecked(True)
+        query_layout.addWidget(self.subtree)
+
+        self.search_btn = QPushButton("Найти")
+        self.search_btn.clicked.connect(self.search)
+        query_layout.addWidget(self.search_btn)
+
+        # Подсказка со списком атрибутов и их типов
+        self.attributes_label = QLabel()
+        self.attributes_label.setWordWrap(True)
+        layout.addWidget(self.attributes_label)
+
+        self.model = None
+        self.table = QTableView()
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        layout.addWidget(self.table)
+
+    def invalidate(self):
+        """Отметка о том, что франшизы изменились"""
+        self.stale = True
+        if self.isVisible():
+            self.load()
+
+    def load_if_stale(self):
+        if self.stale:
+            self.load()
+
+    def load(self, then=None):
+        """Загрузка франшиз и описаний атрибутов"""
+        self.stale = False
+
+        def fetch(connection):
+            self.catalog.load(connection)
+            return REFERENCES.get(connection, "franchise")["franchise"]
+
+        def done(franchises):
+            self.fill_choices(franchises)
+            if then is not None:
+                then()
+
+        self.executor.submit(
+            fetch, on_result=done,
+            on_error=lambda e: self.show_error("Ошибка при загрузке атрибутов", e),
+            key="spec_choices"
+        )
+
+    def fill_choices(self, franchises):
+        self.franchise_filter.set_references(franchises)
+
+        attributes = ", ".join(
+            f"{attribute.title} ({attribute.data_type})" for attribute in self.catalog.attributes()
+        )
+        self.attributes_label.setText(f"Атрибуты: {attributes}")
+
+    def search(self):
+        """Поиск устройств по условиям на характеристики"""
+        if not self.catalog.is_loaded():
+            # Условия проверяются по описаниям атрибутов, сначала загрузим их
+            self.load(then=self.search)
+            return
+
+        try:
+            conditions = parse_spec_query(self.query.text(), self.catalog)
+        except SpecQueryError as e:
+            QMessageBox.warning(self, "Ошибка", str(e))
+            return
+
+        query = spec_query(conditions, self.franchise_filter.currentData(), self.subtree.isChecked())
+
+        # Набор столбцов зависит от запроса, поэтому модель каждый раз новая
+        headers = SPEC_HEADERS + [condition.attribute.title for condition in conditions]
+        old_model = self.model
+        self.model = LazyQueryModel(headers, self.executor, self)
+        self.model.setObjectName("spec_devices")
+        self.model.error.connect(lambda e: self.show_error("Ошибка при поиске устройств", e))
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
+        if old_model is not None:
+            old_model.clear()
+            old_model.deleteLater()
+        self.model.reset(query)
+
+    def show_error(self, message, error):
+        QMessageBox.critical(self, "Ошибка", f"{message}:\n{str(error)}")
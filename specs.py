@@ -0,0 +1,186 @@
+import re
+import threading
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+from queries import like_pattern
+from references import REFERENCES
+from values import boolean, date
+
+
+# Столбец device_spec со значением для каждого типа данных атрибута
+VALUE_COLUMNS = {
+    "string": "value_string",
+    "integer": "value_integer",
+    "decimal": "value_decimal",
+    "boolean": "value_boolean",
+    "date": "value_date",
+}
+
+# Допустимые операторы сравнения для типов данных; ~ - подстрока
+ORDERED_OPERATORS = ("=", "!=", ">=", "<=", ">", "<")
+OPERATORS = {
+    "string": ("=", "!=", "~"),
+    "integer": ORDERED_OPERATORS,
+    "decimal": ORDERED_OPERATORS,
+    "boolean": ("=", "!="),
+    "date": ORDERED_OPERATORS,
+}
+
+CONDITION_RE = re.compile(r"^(.+?)\s*(>=|<=|!=|<>|=|>|<|~)\s*(.*)$")
+AND_RE = re.compile(r"\s+(?:AND|И)\s+", re.IGNORECASE)
+
+
+class SpecQueryError(ValueError):
+    """Ошибка в тексте запроса по характеристикам"""
+
+
+@dataclass(frozen=True)
+class SpecAttribute:
+    """Описание атрибута характеристики из spec_attribute"""
+
+    spec_attribute_id: int
+    name: str
+    data_type: str
+    unit: str = None
+
+    @property
+    def column(self):
+        return VALUE_COLUMNS[self.data_type]
+
+    @property
+    def title(self):
+        return f"{self.name}, {self.unit}" if self.unit else self.name
+
+
+@dataclass(frozen=True)
+class SpecCondition:
+    """Условие на значение одного атрибута"""
+
+    attribute: SpecAttribute
+    operator: str
+    value: object
+
+
+class SpecCatalog:
+    """Кэш описаний атрибутов характеристик
+
+    Описания берутся из общего кэша справочников и разбираются заново,
+    только если список атрибутов на сервере изменился. Условия запроса
+    строятся и проверяются без обращения к серверу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._references = None
+        self._attributes = None
+
+    def is_loaded(self):
+        return self._attributes is not None
+
+    def load(self, connection):
+        """Чтение описаний атрибутов, если они изменились"""
+        references = REFERENCES.get(connection, "spec_attribute")["spec_attribute"]
+        connection.rollback()
+        with self._lock:
+            if references is not self._references:
+                self._references = references
+                self._attributes = {row[1].casefold(): SpecAttribute(*row) for row in references}
+
+    def invalidate(self):
+        with self._lock:
+            self._references = None
+            self._attributes = None
+
+    def attributes(self):
+        """Все атрибуты в порядке названий"""
+        with self._lock:
+            return list(self._attributes.values()) if self._attributes else []
+
+    def find(self, name):
+        """Атрибут по названию без учета регистра или None"""
+        with self._lock:
+            return (self._attributes or {}).get(name.strip().casefold())
+
+
+def parse_spec_query(text, catalog):
+    """Разбор запроса вида "RAM Size >= 16 AND CPU Cores >= 8"
+
+    Значения приводятся к типу атрибута, поэтому ошибки в запросе
+    обнаруживаются до обращения к БД.
+    """
+    conditions = []
+    for part in AND_RE.split(text.strip()):
+        if not part:
+            continue
+        match = CONDITION_RE.match(part)
+        if match is None:
+            raise SpecQueryError(f"Не понято условие \"{part}\": ожидается <атрибут> <оператор> <значение>")
+        name, operator, value = match.groups()
+        if operator == "<>":
+            operator = "!="
+
+        attribute = catalog.find(name)
+        if attribute is None:
+            raise SpecQueryError(f"Неизвестный атрибут \"{name.strip()}\"")
+        if operator not in OPERATORS[attribute.data_type]:
+            raise SpecQueryError(
+                f"Для атрибута \"{attribute.name}\" допустимы операторы: "
+                f"{' '.join(OPERATORS[attribute.data_type])}"
+            )
+        conditions.append(SpecCondition(attribute, operator, _parse_value(attribute, value)))
+
+    if not conditions:
+        raise SpecQueryError("Запрос пуст")
+    return conditions
+
+
+def _parse_value(attribute, value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        value = value[1:-1]
+    if not value:
+        raise SpecQueryError(f"Не указано значение для атрибута \"{attribute.name}\"")
+
+    try:
+        if attribute.data_type == "integer":
+            return int(value)
+        if attribute.data_type == "decimal":
+            return Decimal(value.replace(",", "."))
+        if attribute.data_type == "boolean":
+            return boolean(value)
+        if attribute.data_type == "date":
+            return date(value)
+        return value
+    except (ValueError, InvalidOperation):
+        raise SpecQueryError(
+            f"Значение \"{value}\" не подходит для атрибута \"{attribute.name}\" ({attribute.data_type})"
+        )
+
+
+def apply_spec_conditions(query, conditions):
+    """Добавление условий к запросу устройств d: по соединению на атрибут
+
+    Каждое соединение с device_spec выбирает одну строку по уникальному
+    ключу (device_id, spec_attribute_id), а условие на значение позволяет
+    планировщику начать с самого избирательного атрибута по индексу
+    (spec_attribute_id, value_*). Возвращает выражения значений
+    атрибутов для столбцов результата.
+    """
+    values = []
+    for i, condition in enumerate(conditions):
+        alias = f"s{i}"
+        attribute = condition.attribute
+        column = f"{alias}.{attribute.column}"
+        query.join(
+            f"JOIN device_spec {alias} ON {alias}.device_id = d.device_id"
+            f" AND {alias}.spec_attribute_id = %s",
+            attribute.spec_attribute_id
+        )
+        if condition.operator == "~":
+            query.where(f"{column} ILIKE %s", like_pattern(condition.value))
+        else:
+            query.where(f"{column} {condition.operator} %s", condition.value)
+        values.append(column)
+    return values
+
@@ -0,0 +1,57 @@
+-- Уведомления клиентов об изменениях франшиз, локаций и устройств.
+-- На команду отправляется одно уведомление в канал fcas_changes на
+-- каждые 500 измененных строк: {"table": ..., "op": "I|U|D", "ids": [...]}
+-- Размер уведомления ограничен 8000 байтами, поэтому id передаются
+-- пачками, а сами строки клиенты перечитывают сами
+CREATE OR REPLACE FUNCTION notify_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    FOR payload IN EXECUTE format(
+        'SELECT json_build_object(''table'', %L, ''op'', %L, ''ids'', json_agg(id))::text
+         FROM (SELECT %I AS id, (row_number() OVER () - 1) / 500 AS chunk FROM changed_rows) c
+         GROUP BY chunk',
+        TG_TABLE_NAME, left(TG_OP, 1), TG_ARGV[0]
+    ) LOOP
+        PERFORM pg_notify('fcas_changes', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_franchise_notify_insert AFTER INSERT ON franchise
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('franchise_id');
+
+CREATE TRIGGER trg_franchise_notify_update AFTER UPDATE ON franchise
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('franchise_id');
+
+CREATE TRIGGER trg_franchise_notify_delete AFTER DELETE ON franchise
+REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('franchise_id');
+
+CREATE TRIGGER trg_location_notify_insert AFTER INSERT ON location
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('location_id');
+
+CREATE TRIGGER trg_location_notify_update AFTER UPDATE ON location
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('location_id');
+
+CREATE TRIGGER trg_location_notify_delete AFTER DELETE ON location
+REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('location_id');
+
+CREATE TRIGGER trg_device_notify_insert AFTER INSERT ON device
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('device_id');
+
+CREATE TRIGGER trg_device_notify_update AFTER UPDATE ON device
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('device_id');
+
+CREATE TRIGGER trg_device_notify_delete AFTER DELETE ON device
+REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_changes('device_id');
@@ -0,0 +1,84 @@
+-- Приложение хранит локальный снимок франшиз, локаций и справочников
+-- и при запуске дочитывает только строки, измененные после отметки
+-- времени прошлой синхронизации. Для этого updated_at ведется
+-- триггером при любом изменении, а удаленные строки запоминаются
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_franchise_touch BEFORE UPDATE ON franchise
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE TRIGGER trg_location_touch BEFORE UPDATE ON location
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE TRIGGER trg_device_type_touch BEFORE UPDATE ON device_type
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE TRIGGER trg_component_type_touch BEFORE UPDATE ON component_type
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE TRIGGER trg_spec_attribute_touch BEFORE UPDATE ON spec_attribute
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE INDEX idx_franchise_updated_at ON franchise(updated_at);
+CREATE INDEX idx_location_updated_at ON location(updated_at);
+
+-- Удаленные строки. Записи старше 30 дней удаляет purge_deleted_rows:
+-- снимок, синхронизированный раньше, приложение перечитывает целиком
+CREATE TABLE deleted_row (
+    table_name VARCHAR(50) NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_deleted_row_deleted_at ON deleted_row(deleted_at);
+
+CREATE OR REPLACE FUNCTION remember_deleted_rows()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format(
+        'INSERT INTO deleted_row (table_name, row_id) SELECT %L, %I FROM deleted_rows',
+        TG_TABLE_NAME, TG_ARGV[0]
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_franchise_deleted AFTER DELETE ON franchise
+REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE FUNCTION remember_deleted_rows('franchise_id');
+
+CREATE TRIGGER trg_location_deleted AFTER DELETE ON location
+REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE FUNCTION remember_deleted_rows('location_id');
+
+CREATE TRIGGER trg_device_type_deleted AFTER DELETE ON device_type
+REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE FUNCTION remember_deleted_rows('device_type_id');
+
+CREATE TRIGGER trg_component_type_deleted AFTER DELETE ON component_type
+REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE FUNCTION remember_deleted_rows('component_type_id');
+
+CREATE TRIGGER trg_spec_attribute_deleted AFTER DELETE ON spec_attribute
+REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE FUNCTION remember_deleted_rows('spec_attribute_id');
+
+-- Удаление записей об удаленных строках старше max_age. Срок не меньше
+-- SNAPSHOT_MAX_AGE в snapshot.py, иначе снимок, еще не устаревший для
+-- приложения, пропустит удаления. Возвращает число удаленных записей
+CREATE OR REPLACE FUNCTION purge_deleted_rows(max_age INTERVAL DEFAULT '30 days')
+RETURNS INTEGER AS $$
+DECLARE
+    purged INTEGER;
+BEGIN
+    DELETE FROM deleted_row WHERE deleted_at < CURRENT_TIMESTAMP - max_age;
+    GET DIAGNOSTICS purged = ROW_COUNT;
+    RETURN purged;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,173 @@
+-- Сводка для панели показателей. Считать ее по device при каждом
+-- открытии дорого, поэтому итоги хранятся в таблицах и меняются
+-- триггерами на дельту каждой команды: чтение сводки не зависит от
+-- числа устройств, а изменение устройства обновляет несколько строк.
+-- Строки с нулевыми итогами не удаляются, на суммы они не влияют,
+-- rebuild_device_summary() пересчитывает все заново
+
+-- Число и стоимость устройств. location_id = 0 - без локации,
+-- status = '' - статус не задан
+CREATE TABLE device_summary (
+    franchise_id INTEGER NOT NULL,
+    location_id INTEGER NOT NULL,
+    device_type_id INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    device_count BIGINT NOT NULL,
+    total_price NUMERIC NOT NULL,
+    PRIMARY KEY (franchise_id, location_id, device_type_id, status)
+);
+
+-- Гарантии работающих устройств (active, in_repair) по месяцам окончания
+CREATE TABLE warranty_summary (
+    franchise_id INTEGER NOT NULL,
+    expiry_month DATE NOT NULL,
+    device_count BIGINT NOT NULL,
+    PRIMARY KEY (franchise_id, expiry_month)
+);
+
+CREATE INDEX idx_warranty_summary_month ON warranty_summary(expiry_month);
+
+-- Изменения устройств по дням и новым статусам, из истории
+CREATE TABLE history_summary (
+    day DATE NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    change_count BIGINT NOT NULL,
+    PRIMARY KEY (day, status)
+);
+
+-- Дельта команды: новые строки со знаком +1, старые со знаком -1.
+-- Изменение, не затрагивающее сгруппированные столбцы, дает нулевую
+-- дельту и не пишет в сводку. Строки вставляются в порядке ключа,
+-- чтобы параллельные команды блокировали их в одном порядке
+CREATE OR REPLACE FUNCTION update_device_summary()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta TEXT;
+BEGIN
+    delta := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT *, 1 AS sign FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT *, -1 AS sign FROM old_rows'
+        ELSE 'SELECT *, 1 AS sign FROM new_rows UNION ALL SELECT *, -1 AS sign FROM old_rows'
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO device_summary AS s
+        SELECT franchise_id, COALESCE(location_id, 0), device_type_id, COALESCE(status, ''),
+               SUM(sign), SUM(sign * COALESCE(purchase_price, 0))
+        FROM (%s) d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(sign) <> 0 OR SUM(sign * COALESCE(purchase_price, 0)) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (franchise_id, location_id, device_type_id, status) DO UPDATE
+        SET device_count = s.device_count + EXCLUDED.device_count,
+            total_price = s.total_price + EXCLUDED.total_price
+    $sql$, delta);
+
+    EXECUTE format($sql$
+        INSERT INTO warranty_summary AS s
+        SELECT franchise_id, date_trunc('month', warranty_expiry)::date, SUM(sign)
+        FROM (%s) d
+        WHERE warranty_expiry IS NOT NULL AND status IN ('active', 'in_repair')
+        GROUP BY 1, 2
+        HAVING SUM(sign) <> 0
+        ORDER BY 1, 2
+        ON CONFLICT (franchise_id, expiry_month) DO UPDATE
+        SET device_count = s.device_count + EXCLUDED.device_count
+    $sql$, delta);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_device_summary_insert AFTER INSERT ON device
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION update_device_summary();
+
+CREATE TRIGGER trg_device_summary_update AFTER UPDATE ON device
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION update_device_summary();
+
+CREATE TRIGGER trg_device_summary_delete AFTER DELETE ON device
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION update_device_summary();
+
+CREATE OR REPLACE FUNCTION update_history_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO history_summary AS s
+        SELECT changed_at::date, COALESCE(status, ''), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (day, status) DO UPDATE
+        SET change_count = s.change_count + EXCLUDED.change_count;
+    ELSE
+        UPDATE history_summary s
+        SET change_count = s.change_count - d.change_count
+        FROM (
+            SELECT changed_at::date AS day, COALESCE(status, '') AS status, COUNT(*) AS change_count
+            FROM old_rows
+            GROUP BY 1, 2
+        ) d
+        WHERE s.day = d.day AND s.status = d.status;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_history_summary_insert AFTER INSERT ON device_history
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION update_history_summary();
+
+CREATE TRIGGER trg_history_summary_delete AFTER DELETE ON device_history
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION update_history_summary();
+
+-- TRUNCATE не вызывает триггеры удаления, сводка очищается отдельно
+CREATE OR REPLACE FUNCTION truncate_device_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'device' THEN
+        TRUNCATE device_summary, warranty_summary;
+    ELSE
+        TRUNCATE history_summary;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_device_summary_truncate AFTER TRUNCATE ON device
+FOR EACH STATEMENT EXECUTE FUNCTION truncate_device_summary();
+
+CREATE TRIGGER trg_history_summary_truncate AFTER TRUNCATE ON device_history
+FOR EACH STATEMENT EXECUTE FUNCTION truncate_device_summary();
+
+-- Полный пересчет сводки, например после восстановления из резервной
+-- копии. Устройства и история блокируются от изменений до конца
+-- транзакции, чтение не блокируется
+CREATE OR REPLACE FUNCTION rebuild_device_summary()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE device, device_history IN SHARE MODE;
+    TRUNCATE device_summary, warranty_summary, history_summary;
+
+    INSERT INTO device_summary
+    SELECT franchise_id, COALESCE(location_id, 0), device_type_id, COALESCE(status, ''),
+           COUNT(*), COALESCE(SUM(purchase_price), 0)
+    FROM device
+    GROUP BY 1, 2, 3, 4;
+
+    INSERT INTO warranty_summary
+    SELECT franchise_id, date_trunc('month', warranty_expiry)::date, COUNT(*)
+    FROM device
+    WHERE warranty_expiry IS NOT NULL AND status IN ('active', 'in_repair')
+    GROUP BY 1, 2;
+
+    INSERT INTO history_summary
+    SELECT changed_at::date, COALESCE(status, ''), COUNT(*)
+    FROM device_history
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_device_summary();
@@ -0,0 +1,18 @@
+-- Оптимистичная блокировка франшиз и локаций. Каждое изменение строки
+-- увеличивает version, а приложение меняет строку, только если ее
+-- версия совпадает с загруженной в форму. Иначе строку успели изменить
+-- другие, и пользователь сравнивает изменения перед сохранением.
+-- Версию ведет триггер, поэтому ее учитывают и импорт, и скрипты
+CREATE OR REPLACE FUNCTION bump_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_franchise_version BEFORE UPDATE ON franchise
+FOR EACH ROW EXECUTE FUNCTION bump_version();
+
+CREATE TRIGGER trg_location_version BEFORE UPDATE ON location
+FOR EACH ROW EXECUTE FUNCTION bump_version();
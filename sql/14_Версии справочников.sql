@@ -0,0 +1,69 @@
+-- Версии справочников для кэша приложения. Списки франшиз, типов
+-- устройств и компонентов и атрибутов характеристик читаются один раз
+-- на процесс, а перед использованием кэш сверяет с этой таблицей
+-- только номера версий и перечитывает изменившиеся списки.
+-- Версия меняется в той же транзакции, что и данные, поэтому новая
+-- версия не бывает видна раньше новых строк
+CREATE TABLE reference_version (
+    table_name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+INSERT INTO reference_version (table_name)
+VALUES ('franchise'), ('device_type'), ('component_type'), ('spec_attribute');
+
+-- Аргументы триггера: ключ таблицы и столбцы, которые попадают в кэш.
+-- Изменение других столбцов, например активности франшизы, версию
+-- не меняет
+CREATE OR REPLACE FUNCTION bump_reference_version()
+RETURNS TRIGGER AS $$
+DECLARE
+    new_columns TEXT;
+    old_columns TEXT;
+    changed BOOLEAN := TRUE;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        SELECT string_agg(format('n.%I', TG_ARGV[i]), ', '),
+               string_agg(format('o.%I', TG_ARGV[i]), ', ')
+        INTO new_columns, old_columns
+        FROM generate_series(1, TG_NARGS - 1) i;
+        EXECUTE format(
+            'SELECT EXISTS (SELECT 1 FROM new_rows n JOIN old_rows o ON n.%1$I = o.%1$I
+                            WHERE ROW(%2$s) IS DISTINCT FROM ROW(%3$s))',
+            TG_ARGV[0], new_columns, old_columns
+        ) INTO changed;
+    END IF;
+    IF changed THEN
+        UPDATE reference_version SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_franchise_reference AFTER INSERT OR DELETE OR TRUNCATE ON franchise
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('franchise_id', 'name');
+
+CREATE TRIGGER trg_franchise_reference_update AFTER UPDATE ON franchise
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('franchise_id', 'name');
+
+CREATE TRIGGER trg_device_type_reference AFTER INSERT OR DELETE OR TRUNCATE ON device_type
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('device_type_id', 'name');
+
+CREATE TRIGGER trg_device_type_reference_update AFTER UPDATE ON device_type
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('device_type_id', 'name');
+
+CREATE TRIGGER trg_component_type_reference AFTER INSERT OR DELETE OR TRUNCATE ON component_type
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('component_type_id', 'name');
+
+CREATE TRIGGER trg_component_type_reference_update AFTER UPDATE ON component_type
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('component_type_id', 'name');
+
+CREATE TRIGGER trg_spec_attribute_reference AFTER INSERT OR DELETE OR TRUNCATE ON spec_attribute
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('spec_attribute_id', 'name', 'data_type', 'unit');
+
+CREATE TRIGGER trg_spec_attribute_reference_update AFTER UPDATE ON spec_attribute
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION bump_reference_version('spec_attribute_id', 'name', 'data_type', 'unit');
@@ -0,0 +1,53 @@
+-- Поиск похожих франшиз и локаций. Названия и адреса сравниваются
+-- после нормализации: регистр, ё, знаки препинания и лишние пробелы
+-- не важны, в адресах отбрасываются сокращения вроде "ул." и "д.".
+-- Похожесть - доля общих триграмм (расширение pg_trgm), поиск по
+-- оператору % идет по GIN-индексам нормализованных значений
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- pg_trgm считает буквами только то, что считает буквами локаль базы:
+-- при LC_CTYPE C или POSIX кириллица в триграммы не попадает, и
+-- похожие русские названия не находятся. Нужна локаль вроде
+-- ru_RU.UTF-8 или C.UTF-8
+DO $$
+BEGIN
+    IF (SELECT datctype FROM pg_database WHERE datname = current_database()) IN ('C', 'POSIX') THEN
+        RAISE WARNING 'LC_CTYPE базы % не различает кириллицу, поиск дубликатов по русским названиям работать не будет',
+            (SELECT datctype FROM pg_database WHERE datname = current_database());
+    END IF;
+END;
+$$;
+
+-- Сами функции от локали не зависят: строчные буквы и допустимые
+-- символы (цифры, латиница без диакритики и кириллица) заданы явно,
+-- а не через lower() и [:alnum:]
+CREATE OR REPLACE FUNCTION normalize_name(value TEXT)
+RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(
+        lower(translate(
+            value,
+            'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё',
+            'абвгдеежзийклмнопрстуфхцчшщъыьэюяе'
+        )),
+        '[^0-9a-zа-я]+', ' ', 'g'
+    ))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- После normalize_name слова разделены одиночными пробелами, поэтому
+-- граница слова - пробел или край строки
+CREATE OR REPLACE FUNCTION normalize_address(value TEXT)
+RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(
+        regexp_replace(
+            normalize_name(value),
+            '(?<![^ ])(г|город|ул|улица|пр|просп|проспект|пер|переулок|ш|шоссе|бульвар|пл|площадь|наб|набережная|д|дом|корп|корпус|к|стр|строение|оф|офис|пом|помещение)(?![^ ])',
+            ' ', 'g'
+        ),
+        ' +', ' ', 'g'
+    ))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE INDEX idx_franchise_name_norm_trgm ON franchise USING GIN (normalize_name(name) gin_trgm_ops);
+CREATE INDEX idx_franchise_address_norm_trgm ON franchise USING GIN (normalize_address(address) gin_trgm_ops);
+CREATE INDEX idx_location_name_norm_trgm ON location USING GIN (normalize_name(name) gin_trgm_ops);
+CREATE INDEX idx_location_address_norm_trgm ON location USING GIN (normalize_address(address) gin_trgm_ops);
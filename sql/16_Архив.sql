@@ -0,0 +1,278 @@
+-- Архив неактивных франшиз и локаций и списанных или утерянных
+-- устройств. Такие записи переносятся из рабочих таблиц в таблицы
+-- той же структуры в схеме archive вместе с историей, компонентами и
+-- характеристиками устройств: списки, соединения и индексы рабочих
+-- таблиц не платят за них. В архиве записи ищутся по запросу и могут
+-- быть восстановлены с прежними id.
+-- Перенос идет пачками: каждая пачка - отдельная транзакция, строки,
+-- заблокированные пользователями, пропускаются до следующего запуска
+CREATE SCHEMA archive;
+
+-- Срок, после которого запись переносится в архив, и срок хранения в
+-- архиве. purge_after NULL - хранить бессрочно. Для франшиз и локаций
+-- срок считается от последнего изменения (updated_at), для устройств -
+-- от последней смены статуса или перемещения
+CREATE TABLE archive_policy (
+    table_name VARCHAR(50) PRIMARY KEY CHECK (table_name IN ('franchise', 'location', 'device')),
+    archive_after INTERVAL NOT NULL,
+    purge_after INTERVAL
+);
+
+INSERT INTO archive_policy (table_name, archive_after)
+VALUES ('device', '180 days'), ('location', '1 year'), ('franchise', '1 year');
+
+-- Архивные таблицы повторяют рабочие без ограничений и значений по
+-- умолчанию: ссылки в архиве могут указывать как на рабочие, так и на
+-- архивные строки. archived_at - время переноса
+CREATE TABLE archive.franchise (
+    LIKE franchise,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (franchise_id)
+);
+
+CREATE TABLE archive.location (
+    LIKE location,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (location_id)
+);
+
+CREATE TABLE archive.device (
+    LIKE device,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (device_id)
+);
+
+CREATE TABLE archive.device_history (
+    LIKE device_history,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (history_id, changed_at)
+);
+
+CREATE TABLE archive.component (
+    LIKE component,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (component_id)
+);
+
+CREATE TABLE archive.device_spec (
+    LIKE device_spec,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (device_spec_id)
+);
+
+-- Связи внутри архива для восстановления и очистки и поиск подстроки
+CREATE INDEX idx_archive_franchise_parent ON archive.franchise(parent_id);
+CREATE INDEX idx_archive_franchise_archived_at ON archive.franchise(archived_at);
+CREATE INDEX idx_archive_location_franchise ON archive.location(franchise_id);
+CREATE INDEX idx_archive_location_archived_at ON archive.location(archived_at);
+CREATE INDEX idx_archive_device_franchise ON archive.device(franchise_id);
+CREATE INDEX idx_archive_device_location ON archive.device(location_id);
+CREATE INDEX idx_archive_device_archived_at ON archive.device(archived_at);
+CREATE INDEX idx_archive_device_history_device ON archive.device_history(device_id);
+CREATE INDEX idx_archive_device_history_franchise ON archive.device_history(franchise_id);
+CREATE INDEX idx_archive_device_history_location ON archive.device_history(location_id);
+CREATE INDEX idx_archive_component_device ON archive.component(device_id);
+CREATE INDEX idx_archive_device_spec_device ON archive.device_spec(device_id);
+CREATE INDEX idx_archive_franchise_name_trgm ON archive.franchise USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_archive_franchise_address_trgm ON archive.franchise USING GIN (address gin_trgm_ops);
+CREATE INDEX idx_archive_location_name_trgm ON archive.location USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_archive_location_address_trgm ON archive.location USING GIN (address gin_trgm_ops);
+CREATE INDEX idx_archive_device_inventory_trgm ON archive.device USING GIN (inventory_number gin_trgm_ops);
+CREATE INDEX idx_archive_device_name_trgm ON archive.device USING GIN (name gin_trgm_ops);
+
+-- Проверка ссылок истории на франшизу при ее удалении из рабочей
+-- таблицы без этого индекса читает всю историю
+CREATE INDEX idx_device_history_franchise ON device_history(franchise_id);
+
+-- Перенос строк с key = ANY(ids) из таблицы source в target одной
+-- командой DELETE ... RETURNING. Столбцы берутся из рабочей таблицы
+-- work, поэтому archived_at при переносе в архив получает значение по
+-- умолчанию, а при восстановлении отбрасывается
+CREATE OR REPLACE FUNCTION move_rows(work REGCLASS, source TEXT, target TEXT, key TEXT, ids INTEGER[])
+RETURNS INTEGER AS $$
+DECLARE
+    columns TEXT;
+    moved INTEGER;
+BEGIN
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum)
+    INTO columns
+    FROM pg_attribute
+    WHERE attrelid = work AND attnum > 0 AND NOT attisdropped;
+
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %s WHERE %I = ANY($1) RETURNING %s)
+         INSERT INTO %s (%s) SELECT %s FROM moved',
+        source, key, columns, target, columns, columns
+    ) USING ids;
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Перенос в архив не больше batch_size записей таблицы table_name
+-- (device, location или franchise) старше срока из archive_policy.
+-- Локация и франшиза переносятся, только когда на них не ссылаются
+-- рабочие устройства, история, локации и дочерние франшизы, поэтому
+-- устройства нужно архивировать первыми, а франшизы последними.
+-- Возвращает число перенесенных записей, 0 - переносить больше нечего
+CREATE OR REPLACE FUNCTION archive_batch(table_name TEXT, batch_size INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    cutoff TIMESTAMP WITH TIME ZONE;
+    ids INTEGER[];
+BEGIN
+    SELECT CURRENT_TIMESTAMP - p.archive_after INTO cutoff
+    FROM archive_policy p WHERE p.table_name = archive_batch.table_name;
+    IF cutoff IS NULL THEN
+        RAISE EXCEPTION 'Нет срока архивации для таблицы %', table_name;
+    END IF;
+
+    IF table_name = 'device' THEN
+        ids := ARRAY(
+            SELECT device_id FROM device
+            WHERE status IN ('decommissioned', 'lost') AND COALESCE(updated_at, created_at) < cutoff
+            ORDER BY device_id
+            LIMIT batch_size
+            FOR UPDATE SKIP LOCKED
+        );
+        PERFORM move_rows('device_spec', 'device_spec', 'archive.device_spec', 'device_id', ids);
+        PERFORM move_rows('component', 'component', 'archive.component', 'device_id', ids);
+        PERFORM move_rows('device_history', 'device_history', 'archive.device_history', 'device_id', ids);
+        RETURN move_rows('device', 'device', 'archive.device', 'device_id', ids);
+    ELSIF table_name = 'location' THEN
+        ids := ARRAY(
+            SELECT l.location_id FROM location l
+            WHERE NOT l.is_active AND l.updated_at < cutoff
+              AND NOT EXISTS (SELECT 1 FROM device d WHERE d.location_id = l.location_id)
+              AND NOT EXISTS (SELECT 1 FROM device_history h WHERE h.location_id = l.location_id)
+            ORDER BY l.location_id
+            LIMIT batch_size
+            FOR UPDATE SKIP LOCKED
+        );
+        RETURN move_rows('location', 'location', 'archive.location', 'location_id', ids);
+    ELSIF table_name = 'franchise' THEN
+        ids := ARRAY(
+            SELECT f.franchise_id FROM franchise f
+            WHERE NOT f.is_active AND f.updated_at < cutoff
+              AND NOT EXISTS (SELECT 1 FROM franchise c WHERE c.parent_id = f.franchise_id)
+              AND NOT EXISTS (SELECT 1 FROM location l WHERE l.franchise_id = f.franchise_id)
+              AND NOT EXISTS (SELECT 1 FROM device d WHERE d.franchise_id = f.franchise_id)
+              AND NOT EXISTS (SELECT 1 FROM device_history h WHERE h.franchise_id = f.franchise_id)
+            ORDER BY f.franchise_id
+            LIMIT batch_size
+            FOR UPDATE SKIP LOCKED
+        );
+        RETURN move_rows('franchise', 'franchise', 'archive.franchise', 'franchise_id', ids);
+    END IF;
+    RAISE EXCEPTION 'Таблица % не архивируется', table_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Восстановление записей из архива с прежними id. Вместе с записью
+-- восстанавливается то, на что она ссылается: родительские франшизы,
+-- франшиза локации, франшизы и локации устройства и его истории.
+-- updated_at восстановленных франшиз и локаций обновляется, чтобы
+-- локальные снимки приложения их дочитали.
+-- Возвращает число восстановленных записей самой таблицы table_name
+CREATE OR REPLACE FUNCTION restore_archived(table_name TEXT, ids INTEGER[])
+RETURNS INTEGER AS $$
+DECLARE
+    parents INTEGER[];
+BEGIN
+    IF table_name = 'device' THEN
+        -- Массивы без NULL: иначе сравнения с ANY и ALL неопределенны
+        PERFORM restore_archived('franchise', ARRAY(
+            SELECT franchise_id FROM archive.device
+            WHERE device_id = ANY(ids) AND franchise_id IS NOT NULL
+            UNION
+            SELECT franchise_id FROM archive.device_history
+            WHERE device_id = ANY(ids) AND franchise_id IS NOT NULL
+        ));
+        PERFORM restore_archived('location', ARRAY(
+            SELECT location_id FROM archive.device
+            WHERE device_id = ANY(ids) AND location_id IS NOT NULL
+            UNION
+            SELECT location_id FROM archive.device_history
+            WHERE device_id = ANY(ids) AND location_id IS NOT NULL
+        ));
+        ids := ARRAY(SELECT device_id FROM archive.device WHERE device_id = ANY(ids) FOR UPDATE);
+        PERFORM move_rows('device', 'archive.device', 'device', 'device_id', ids);
+        PERFORM move_rows('device_history', 'archive.device_history', 'device_history', 'device_id', ids);
+        PERFORM move_rows('component', 'archive.component', 'component', 'device_id', ids);
+        PERFORM move_rows('device_spec', 'archive.device_spec', 'device_spec', 'device_id', ids);
+        RETURN cardinality(ids);
+    ELSIF table_name = 'location' THEN
+        PERFORM restore_archived('franchise', ARRAY(
+            SELECT franchise_id FROM archive.location WHERE location_id = ANY(ids)
+        ));
+        UPDATE archive.location SET updated_at = CURRENT_TIMESTAMP WHERE location_id = ANY(ids);
+        RETURN move_rows('location', 'archive.location', 'location', 'location_id', ids);
+    ELSIF table_name = 'franchise' THEN
+        parents := ARRAY(
+            SELECT parent_id FROM archive.franchise
+            WHERE franchise_id = ANY(ids) AND parent_id IS NOT NULL AND parent_id <> ALL(ids)
+        );
+        IF cardinality(parents) > 0 THEN
+            PERFORM restore_archived('franchise', parents);
+        END IF;
+        -- Родители, выбранные вместе с дочерними, вставляются той же
+        -- командой: внешние ключи проверяются в конце команды
+        UPDATE archive.franchise SET updated_at = CURRENT_TIMESTAMP WHERE franchise_id = ANY(ids);
+        RETURN move_rows('franchise', 'archive.franchise', 'franchise', 'franchise_id', ids);
+    END IF;
+    RAISE EXCEPTION 'Таблица % не архивируется', table_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Удаление из архива не больше batch_size записей, хранящихся дольше
+-- purge_after. Устройства удаляются вместе с историей, компонентами и
+-- характеристиками. Локация и франшиза удаляются, только когда на них
+-- не ссылается ничего в архиве, иначе восстановление устройства стало
+-- бы невозможным. Возвращает число удаленных записей
+CREATE OR REPLACE FUNCTION purge_archive_batch(table_name TEXT, batch_size INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    cutoff TIMESTAMP WITH TIME ZONE;
+    ids INTEGER[];
+BEGIN
+    SELECT CURRENT_TIMESTAMP - p.purge_after INTO cutoff
+    FROM archive_policy p WHERE p.table_name = purge_archive_batch.table_name;
+    IF cutoff IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    IF table_name = 'device' THEN
+        ids := ARRAY(
+            SELECT device_id FROM archive.device WHERE archived_at < cutoff
+            ORDER BY device_id LIMIT batch_size FOR UPDATE SKIP LOCKED
+        );
+        DELETE FROM archive.device_spec WHERE device_id = ANY(ids);
+        DELETE FROM archive.component WHERE device_id = ANY(ids);
+        DELETE FROM archive.device_history WHERE device_id = ANY(ids);
+        DELETE FROM archive.device WHERE device_id = ANY(ids);
+    ELSIF table_name = 'location' THEN
+        ids := ARRAY(
+            SELECT l.location_id FROM archive.location l
+            WHERE l.archived_at < cutoff
+              AND NOT EXISTS (SELECT 1 FROM archive.device d WHERE d.location_id = l.location_id)
+              AND NOT EXISTS (SELECT 1 FROM archive.device_history h WHERE h.location_id = l.location_id)
+            ORDER BY l.location_id LIMIT batch_size FOR UPDATE SKIP LOCKED
+        );
+        DELETE FROM archive.location WHERE location_id = ANY(ids);
+    ELSIF table_name = 'franchise' THEN
+        ids := ARRAY(
+            SELECT f.franchise_id FROM archive.franchise f
+            WHERE f.archived_at < cutoff
+              AND NOT EXISTS (SELECT 1 FROM archive.franchise c WHERE c.parent_id = f.franchise_id)
+              AND NOT EXISTS (SELECT 1 FROM archive.location l WHERE l.franchise_id = f.franchise_id)
+              AND NOT EXISTS (SELECT 1 FROM archive.device d WHERE d.franchise_id = f.franchise_id)
+              AND NOT EXISTS (SELECT 1 FROM archive.device_history h WHERE h.franchise_id = f.franchise_id)
+            ORDER BY f.franchise_id LIMIT batch_size FOR UPDATE SKIP LOCKED
+        );
+        DELETE FROM archive.franchise WHERE franchise_id = ANY(ids);
+    ELSE
+        RAISE EXCEPTION 'Таблица % не архивируется', table_name;
+    END IF;
+    RETURN cardinality(ids);
+END;
+$$ LANGUAGE plpgsql;
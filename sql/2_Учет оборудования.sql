@@ -1,7 +1,8 @@
 CREATE TABLE device_type (
     device_type_id SERIAL PRIMARY KEY,
     name VARCHAR(50) NOT NULL,
-    description TEXT
+    description TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE device (
@@ -20,13 +21,20 @@ CREATE TABLE device (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- История изменений устройств секционирована по месяцам (changed_at):
+-- старые месяцы не замедляют запросы к свежим данным и удаляются
+-- целыми секциями. Секции создает create_device_history_partitions(),
+-- строки вне созданных секций попадают в секцию по умолчанию
 CREATE TABLE device_history (
-    history_id SERIAL PRIMARY KEY,
+    history_id SERIAL,
     device_id INTEGER NOT NULL REFERENCES device(device_id),
     franchise_id INTEGER REFERENCES franchise(franchise_id),
     location_id INTEGER REFERENCES location(location_id),
     status VARCHAR(20),
     notes TEXT,
-    changed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    changed_by VARCHAR(50)
-);
\ No newline at end of file
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    changed_by VARCHAR(50),
+    PRIMARY KEY (history_id, changed_at)
+) PARTITION BY RANGE (changed_at);
+
+CREATE TABLE device_history_default PARTITION OF device_history DEFAULT;
\ No newline at end of file
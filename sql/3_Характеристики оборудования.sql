@@ -1,7 +1,8 @@
 CREATE TABLE component_type (
     component_type_id SERIAL PRIMARY KEY,
     name VARCHAR(50) NOT NULL,
-    description TEXT
+    description TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE component (
@@ -26,7 +27,8 @@ CREATE TABLE spec_attribute (
     name VARCHAR(50) NOT NULL,
     data_type VARCHAR(20) NOT NULL CHECK (data_type IN ('string', 'integer', 'decimal', 'boolean', 'date')),
     unit VARCHAR(20),
-    is_required BOOLEAN DEFAULT FALSE
+    is_required BOOLEAN DEFAULT FALSE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE device_spec (
@@ -1,7 +1,26 @@
 CREATE INDEX idx_device_franchise ON device(franchise_id);
 CREATE INDEX idx_device_location ON device(location_id);
 CREATE INDEX idx_device_status ON device(status);
-CREATE INDEX idx_device_history_device ON device_history(device_id);
 CREATE INDEX idx_component_device ON component(device_id);
 CREATE INDEX idx_device_spec_device ON device_spec(device_id);
-CREATE INDEX idx_device_spec_attribute ON device_spec(spec_attribute_id);
\ No newline at end of file
+CREATE INDEX idx_device_spec_attribute ON device_spec(spec_attribute_id);
+
+-- Индексы для списков франшиз и локаций: постраничная выборка
+-- по ключу при сортировке по названию, фильтр по франшизе и
+-- проверка дочерних франшиз
+CREATE INDEX idx_franchise_parent ON franchise(parent_id);
+CREATE INDEX idx_franchise_name ON franchise(name, franchise_id);
+CREATE INDEX idx_location_franchise ON location(franchise_id, location_id);
+CREATE INDEX idx_location_name ON location(name, location_id);
+
+-- Триграммные индексы для поиска подстроки (ILIKE '%...%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_franchise_name_trgm ON franchise USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_franchise_address_trgm ON franchise USING GIN (address gin_trgm_ops);
+CREATE INDEX idx_location_name_trgm ON location USING GIN (name gin_trgm_ops);
+CREATE INDEX idx_location_address_trgm ON location USING GIN (address gin_trgm_ops);
+
+-- Хронология изменений устройства и локации: последние изменения
+-- читаются по индексу в каждой секции без сортировки
+CREATE INDEX idx_device_history_device ON device_history(device_id, changed_at, history_id);
+CREATE INDEX idx_device_history_location ON device_history(location_id, changed_at, history_id);
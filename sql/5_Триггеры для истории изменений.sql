@@ -1,21 +1,74 @@
+-- Создание месячных секций device_history от самого раннего месяца
+-- в секции по умолчанию до months_ahead месяцев вперед. Строки,
+-- попавшие в секцию по умолчанию, переносятся в созданные секции.
+-- Функцию нужно запускать регулярно, например раз в месяц
+CREATE OR REPLACE FUNCTION create_device_history_partitions(months_ahead INTEGER DEFAULT 12)
+RETURNS INTEGER AS $$
+DECLARE
+    current_month DATE := date_trunc('month', CURRENT_DATE)::date;
+    month_start DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    SELECT LEAST(date_trunc('month', MIN(changed_at))::date, current_month)
+    INTO month_start
+    FROM device_history_default;
+    month_start := COALESCE(month_start, current_month);
+
+    WHILE month_start <= current_month + make_interval(months => months_ahead) LOOP
+        partition_name := 'device_history_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE device_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                partition_name
+            );
+            EXECUTE format(
+                'WITH moved AS (
+                     DELETE FROM device_history_default
+                     WHERE changed_at >= %L AND changed_at < %L
+                     RETURNING *
+                 )
+                 INSERT INTO %I SELECT * FROM moved',
+                month_start, month_start + interval '1 month', partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE device_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_start + interval '1 month'
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + interval '1 month';
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_device_history_partitions();
+
+-- История пишется одним запросом на всю команду UPDATE: при групповой
+-- смене статуса или локации это одна вставка вместо вставки на строку.
+-- Автор изменения берется из настройки сеанса fcas.user, которую
+-- приложение задает при подключении
 CREATE OR REPLACE FUNCTION update_device_history()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF OLD.franchise_id IS DISTINCT FROM NEW.franchise_id OR 
-       OLD.location_id IS DISTINCT FROM NEW.location_id OR
-       OLD.status IS DISTINCT FROM NEW.status THEN
-       
-        INSERT INTO device_history (
-            device_id, franchise_id, location_id, status, changed_at
-        ) VALUES (
-            NEW.device_id, NEW.franchise_id, NEW.location_id, NEW.status, CURRENT_TIMESTAMP
-        );
-    END IF;
-    RETURN NEW;
+    INSERT INTO device_history (
+        device_id, franchise_id, location_id, status, changed_at, changed_by
+    )
+    SELECT n.device_id, n.franchise_id, n.location_id, n.status, CURRENT_TIMESTAMP,
+           left(COALESCE(NULLIF(current_setting('fcas.user', TRUE), ''), session_user), 50)
+    FROM new_rows n
+    JOIN old_rows o ON o.device_id = n.device_id
+    WHERE o.franchise_id IS DISTINCT FROM n.franchise_id OR
+          o.location_id IS DISTINCT FROM n.location_id OR
+          o.status IS DISTINCT FROM n.status;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_device_update
 AFTER UPDATE ON device
-FOR EACH ROW
-EXECUTE FUNCTION update_device_history();
\ No newline at end of file
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_device_history();
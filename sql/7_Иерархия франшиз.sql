@@ -0,0 +1,29 @@
+-- Запрет циклов в иерархии франшиз: новый родитель не может быть
+-- самой франшизой или ее потомком
+CREATE OR REPLACE FUNCTION check_franchise_cycle()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.parent_id IS NOT NULL AND EXISTS (
+        WITH RECURSIVE ancestors AS (
+            SELECT franchise_id, parent_id
+            FROM franchise
+            WHERE franchise_id = NEW.parent_id
+            UNION
+            SELECT f.franchise_id, f.parent_id
+            FROM franchise f
+            JOIN ancestors a ON f.franchise_id = a.parent_id
+        )
+        SELECT 1 FROM ancestors WHERE franchise_id = NEW.franchise_id
+    ) THEN
+        RAISE EXCEPTION 'Франшиза % не может быть потомком самой себя', NEW.franchise_id
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_franchise_cycle
+BEFORE UPDATE OF parent_id ON franchise
+FOR EACH ROW
+WHEN (NEW.parent_id IS DISTINCT FROM OLD.parent_id)
+EXECUTE FUNCTION check_franchise_cycle();
@@ -0,0 +1,15 @@
+-- Индексы для поиска устройств по значениям характеристик.
+-- В строке device_spec заполнен только один столбец value_*,
+-- поэтому индексы частичные: в каждый попадают только строки
+-- своего типа. device_id в конце индекса позволяет найти устройства
+-- по диапазону значений атрибута сканированием одного индекса
+CREATE INDEX idx_device_spec_string ON device_spec(spec_attribute_id, value_string, device_id)
+    WHERE value_string IS NOT NULL;
+CREATE INDEX idx_device_spec_integer ON device_spec(spec_attribute_id, value_integer, device_id)
+    WHERE value_integer IS NOT NULL;
+CREATE INDEX idx_device_spec_decimal ON device_spec(spec_attribute_id, value_decimal, device_id)
+    WHERE value_decimal IS NOT NULL;
+CREATE INDEX idx_device_spec_boolean ON device_spec(spec_attribute_id, value_boolean, device_id)
+    WHERE value_boolean IS NOT NULL;
+CREATE INDEX idx_device_spec_date ON device_spec(spec_attribute_id, value_date, device_id)
+    WHERE value_date IS NOT NULL;
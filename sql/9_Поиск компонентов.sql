@@ -0,0 +1,7 @@
+-- Поиск компонентов по характеристикам: вхождение (@>) и выражения
+-- jsonpath (@?, @@). Класс jsonb_path_ops компактнее стандартного
+-- и поддерживает именно эти операторы
+CREATE INDEX idx_component_specifications ON component USING GIN (specifications jsonb_path_ops);
+
+-- Поиск по началу названия модели без учета регистра
+CREATE INDEX idx_component_model ON component (lower(model) text_pattern_ops);
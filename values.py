@@ -0,0 +1,84 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from queries import DEVICE_STATUSES
+
+
+# Преобразователи значений, введенных пользователем: ячеек файла импорта
+# и условий поиска по характеристикам. Пустое значение - None,
+# некорректное - ValueError с текстом для пользователя
+
+def text(max_length=None, required=False):
+    def parse(value):
+        value = "" if value is None else str(value).strip()
+        if not value:
+            if required:
+                raise ValueError("обязательное поле не заполнено")
+            return None
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f"длиннее {max_length} символов")
+        return value
+    return parse
+
+
+TRUE_VALUES = {"1", "true", "t", "yes", "y", "да", "д", "+"}
+FALSE_VALUES = {"0", "false", "f", "no", "n", "нет", "н", "-"}
+
+
+def boolean(value):
+    if isinstance(value, bool):
+        return value
+    value = "" if value is None else str(value).strip().casefold()
+    if not value:
+        return None
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"ожидается да/нет, получено \"{value}\"")
+
+
+def date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    value = "" if value is None else str(value).strip()
+    if not value:
+        return None
+    for date_format in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"ожидается дата ГГГГ-ММ-ДД или ДД.ММ.ГГГГ, получено \"{value}\"")
+
+
+def price(value):
+    value = "" if value is None else str(value).strip().replace(" ", "").replace(",", ".")
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"ожидается число, получено \"{value}\"")
+    # Столбец DECIMAL(10,2)
+    if not number.is_finite() or abs(number) >= Decimal("1e8"):
+        raise ValueError(f"значение \"{value}\" вне допустимого диапазона")
+    return number.quantize(Decimal("0.01"))
+
+
+STATUS_CODES = {}
+for _status, _name in DEVICE_STATUSES:
+    STATUS_CODES[_status] = _status
+    STATUS_CODES[_name.casefold()] = _status
+
+
+def status(value):
+    value = "" if value is None else str(value).strip()
+    if not value:
+        return None
+    try:
+        return STATUS_CODES[value.casefold()]
+    except KeyError:
+        raise ValueError(f"неизвестный статус \"{value}\"")